@@ -0,0 +1,448 @@
+""" Benchmarks of the object store utility against a local S3 compatible
+server.
+
+Starts a moto server (pip install "moto[server]") or a MinIO binary, uses
+the object store described by the OBJ_STORE_* env vars, or runs on the in
+memory / local file system backends (no server, measures the overhead of the
+library itself), and measures:
+
+    put_object / get_object   - throughput of single file transfers
+    list_objects              - objects listed per second, sequential and
+                                sharded
+    delete_directory          - objects deleted per second
+    update_ostore_dir         - end to end sync of a directory
+    calc_etags                - md5 / multipart etag hashing speed (local)
+    import                    - time to import the package in a fresh
+                                interpreter, best of three
+
+for every combination of the --file-counts and --file-sizes matrices.  The
+results are written as json so they can be compared between releases.
+
+usage:
+    python benchmarks/bench_ostore.py --server moto --output results.json
+    python benchmarks/bench_ostore.py --server memory --output results.json
+    python benchmarks/bench_ostore.py --server minio --minio-binary ./minio \\
+        --file-counts 10,100 --file-sizes 4K,1M,32M
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+# lib path
+libpath = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.insert(0, libpath)
+import NRUtil.__about__  # noqa: E402
+import NRUtil.backends  # noqa: E402
+import NRUtil.client_pool  # noqa: E402
+import NRUtil.NRObjStoreUtil  # noqa: E402
+
+LOGGER = logging.getLogger(__name__)
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(size):
+    """converts a size like 4K, 1M or 123 to a number of bytes"""
+    size = size.strip().upper().rstrip("B")
+    unit = size[-1] if size and size[-1] in SIZE_UNITS else ""
+    return int(float(size[: len(size) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def parse_list(values, convert):
+    return [convert(value) for value in values.split(",") if value.strip()]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("localhost", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"server didn't start listening on port {port}")
+
+
+@contextlib.contextmanager
+def moto_server():
+    """runs a moto server in a thread, yields the connection parameters"""
+    from moto.server import ThreadedMotoServer
+
+    port = free_port()
+    server = ThreadedMotoServer(port=port, verbose=False)
+    server.start()
+    try:
+        wait_for_port(port)
+        yield {"host": f"localhost:{port}", "user": "testing", "secret": "testing"}
+    finally:
+        server.stop()
+
+
+@contextlib.contextmanager
+def minio_server(minio_binary):
+    """runs a MinIO server in a subprocess, yields the connection
+    parameters
+    """
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix="bench_minio_")
+    env = dict(os.environ)
+    env["MINIO_ROOT_USER"] = "benchmark"
+    env["MINIO_ROOT_PASSWORD"] = "benchmark-secret"
+    proc = subprocess.Popen(
+        [minio_binary, "server", data_dir, "--address", f"localhost:{port}", "--quiet"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        yield {
+            "host": f"localhost:{port}",
+            "user": env["MINIO_ROOT_USER"],
+            "secret": env["MINIO_ROOT_PASSWORD"],
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def local_backend(server_name):
+    """yields a memory or local file system backend instead of a server"""
+    if server_name == "memory":
+        yield {"backend": NRUtil.backends.MemoryBackend()}
+        return
+    root = tempfile.mkdtemp(prefix="bench_local_")
+    try:
+        yield {"backend": NRUtil.backends.LocalBackend(root)}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def external_server():
+    """uses the object store described by the OBJ_STORE_* env vars"""
+    yield {
+        "host": os.environ["OBJ_STORE_HOST"],
+        "user": os.environ["OBJ_STORE_USER"],
+        "secret": os.environ["OBJ_STORE_SECRET"],
+        "bucket": os.environ["OBJ_STORE_BUCKET"],
+        "secure": True,
+    }
+
+
+def write_files(directory, count, size):
+    """creates count files of size random bytes in directory, spread over a
+    few sub directories
+    """
+    chunk = os.urandom(min(size, 1048576))
+    paths = []
+    for cnt in range(count):
+        sub_dir = os.path.join(directory, f"d{cnt % 10}")
+        os.makedirs(sub_dir, exist_ok=True)
+        path = os.path.join(sub_dir, f"f{cnt}.bin")
+        with open(path, "wb") as fh:
+            remaining = size
+            while remaining:
+                fh.write(chunk[:remaining])
+                remaining -= min(remaining, len(chunk))
+        paths.append(path)
+    return paths
+
+
+def result(benchmark, seconds, operations, num_bytes=0, **params):
+    """builds a single benchmark result record"""
+    record = {
+        "benchmark": benchmark,
+        "seconds": seconds,
+        "operations": operations,
+        "ops_per_second": operations / seconds if seconds else None,
+        "bytes": num_bytes,
+        "mb_per_second": num_bytes / 1048576 / seconds if seconds else None,
+    }
+    record.update(params)
+    return record
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_transfers(ostore, paths, prefix, size, workers):
+    """uploads then downloads every file, workers files at a time"""
+    keys = [f"{prefix}/{os.path.basename(path)}" for path in paths]
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        seconds = timed(
+            lambda: list(executor.map(ostore.put_object, keys, paths)),
+        )
+        results.append(
+            result("put_object", seconds, len(keys), len(keys) * size, workers=workers)
+        )
+        download_dir = tempfile.mkdtemp(prefix="bench_get_")
+        try:
+            local_paths = [
+                os.path.join(download_dir, os.path.basename(key)) for key in keys
+            ]
+            seconds = timed(
+                lambda: list(executor.map(ostore.get_object, keys, local_paths)),
+            )
+        finally:
+            shutil.rmtree(download_dir)
+        results.append(
+            result("get_object", seconds, len(keys), len(keys) * size, workers=workers)
+        )
+    return results
+
+
+def bench_listing(ostore, prefix, count, workers):
+    """lists the prefix sequentially and sharded"""
+    results = []
+    for list_workers in [None, workers]:
+        names = []
+        seconds = timed(
+            lambda: names.extend(
+                ostore.list_objects(
+                    objstore_dir=f"{prefix}/",
+                    return_file_names_only=True,
+                    iterator=True,
+                    workers=list_workers,
+                )
+            )
+        )
+        assert len(names) >= count, f"listed {len(names)} of {count} objects"
+        results.append(
+            result("list_objects", seconds, len(names), workers=list_workers or 1)
+        )
+    return results
+
+
+def bench_delete(ostore, prefix, count, workers):
+    delete_result = []
+    seconds = timed(
+        lambda: delete_result.append(
+            ostore.delete_directory(ostore_dir=f"{prefix}/", workers=workers)
+        )
+    )
+    assert delete_result[0].success, delete_result[0]
+    return [result("delete_directory", seconds, count, workers=workers)]
+
+
+def bench_sync(conn, bucket, pool_config, src_dir, prefix, count, size, workers):
+    """end to end sync of src_dir, including listing the destination"""
+    syncs = []
+
+    def run_sync():
+        sync = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+            src_dir,
+            prefix,
+            obj_store_host=conn.get("host"),
+            obj_store_user=conn.get("user"),
+            obj_store_secret=conn.get("secret"),
+            obj_store_bucket=bucket,
+            pool_config=pool_config,
+            backend=conn.get("backend"),
+        )
+        syncs.append(
+            sync.update_ostore_dir(
+                src_dir=src_dir,
+                dest_dir=prefix,
+                obj_store_bucket=bucket,
+                workers=workers,
+            )
+        )
+
+    seconds = timed(run_sync)
+    assert syncs[0].success and len(syncs[0].uploaded) == count, syncs[0]
+    return [result("update_ostore_dir", seconds, count, count * size, workers=workers)]
+
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import NRUtil.NRObjStoreUtil
+import NRUtil.async_ostore
+print(time.perf_counter() - start)
+"""
+
+
+def bench_import(repeat=3):
+    """times importing the package in fresh interpreters, the best of
+    `repeat` runs so a cold disk cache doesn't count
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([libpath, env.get("PYTHONPATH", "")])
+    timings = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        )
+        timings.append(float(proc.stdout))
+    return [result("import", min(timings), 1, file_count=0, file_size=0)]
+
+
+def bench_etags(paths, size):
+    """hashes the files for their md5 and 8MB / 15MB multipart etags"""
+    calc = NRUtil.NRObjStoreUtil.CalcETags()
+    partsizes = [None, 8388608, 15728640]
+    seconds = timed(lambda: [calc.calc_etags(path, partsizes) for path in paths])
+    return [result("calc_etags", seconds, len(paths), len(paths) * size)]
+
+
+def run(conn, file_counts, file_sizes, workers, server_name):
+    bucket = conn.get("bucket") or f"bench-{uuid.uuid4().hex[:12]}"
+    pool_config = NRUtil.client_pool.ConnectionPoolConfig(
+        pool_size=max(workers * 2, 10), secure=conn.get("secure", False)
+    )
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        obj_store_host=conn.get("host"),
+        obj_store_user=conn.get("user"),
+        obj_store_secret=conn.get("secret"),
+        obj_store_bucket=bucket,
+        pool_config=pool_config,
+        backend=conn.get("backend"),
+    )
+    created_bucket = False
+    if not ostore.backend.bucket_exists(bucket):
+        ostore.backend.make_bucket(bucket)
+        created_bucket = True
+
+    results = bench_import()
+    work_dir = tempfile.mkdtemp(prefix="bench_ostore_")
+    try:
+        for count in file_counts:
+            for size in file_sizes:
+                params = {"file_count": count, "file_size": size}
+                LOGGER.info(f"running benchmarks for {params}")
+                src_dir = os.path.join(work_dir, f"{count}_{size}")
+                paths = write_files(src_dir, count, size)
+                prefix = f"bench/{uuid.uuid4().hex[:8]}"
+
+                matrix_results = bench_etags(paths, size)
+                matrix_results += bench_transfers(ostore, paths, prefix, size, workers)
+                matrix_results += bench_listing(ostore, prefix, count, workers)
+                matrix_results += bench_delete(ostore, prefix, count, workers)
+                matrix_results += bench_sync(
+                    conn, bucket, pool_config, src_dir, prefix, count, size, workers
+                )
+                ostore.delete_directory(ostore_dir=f"{prefix}/", workers=workers)
+                shutil.rmtree(src_dir)
+                for record in matrix_results:
+                    record.update(params)
+                results += matrix_results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if created_bucket and ostore.minio_client is not None:
+            ostore.delete_directory(ostore_dir="", workers=workers)
+            ostore.minio_client.remove_bucket(bucket)
+
+    return {
+        "metadata": {
+            "version": NRUtil.__about__.__version__,
+            "server": server_name,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": workers,
+        },
+        "results": results,
+    }
+
+
+def print_summary(report):
+    print(
+        f"{'benchmark':<20}{'files':>8}{'size':>12}{'workers':>9}"
+        + f"{'seconds':>10}{'ops/s':>12}{'MB/s':>10}"
+    )
+    for record in report["results"]:
+        mb_per_second = record["mb_per_second"] if record["bytes"] else None
+        print(
+            f"{record['benchmark']:<20}{record['file_count']:>8}"
+            + f"{record['file_size']:>12}{record.get('workers') or '':>9}"
+            + f"{record['seconds']:>10.3f}{record['ops_per_second'] or 0:>12.1f}"
+            + (f"{mb_per_second:>10.1f}" if mb_per_second else f"{'':>10}")
+        )
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--server",
+        choices=["moto", "minio", "external", "memory", "local"],
+        default="moto",
+        help="the S3 compatible server to benchmark against",
+    )
+    parser.add_argument("--minio-binary", default="minio")
+    parser.add_argument(
+        "--file-counts",
+        default="10,100",
+        help="comma separated list of the number of files",
+    )
+    parser.add_argument(
+        "--file-sizes",
+        default="1K,256K,4M",
+        help="comma separated list of file sizes, eg 1K,4M,1G",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--output", help="json file the results are written to, default stdout"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = get_args(argv)
+    if args.server == "moto":
+        server = moto_server()
+    elif args.server == "minio":
+        server = minio_server(args.minio_binary)
+    elif args.server in ("memory", "local"):
+        server = local_backend(args.server)
+    else:
+        server = external_server()
+    with server as conn:
+        report = run(
+            conn,
+            parse_list(args.file_counts, int),
+            parse_list(args.file_sizes, parse_size),
+            args.workers,
+            args.server,
+        )
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print_summary(report)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for noisy in ["werkzeug", "urllib3", "botocore", "NRUtil"]:
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+    main()
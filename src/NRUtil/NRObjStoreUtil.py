@@ -7,26 +7,312 @@ OBJ_STORE_SECRET    - account secret access key (to access bucket)
 OBJ_STORE_USER      - account name / access key id
 OBJ_STORE_HOST      - object store host
 
+minio and boto3 are only imported when a client is first created, so that
+importing this module stays cheap for short lived jobs.
+
+The requests are made through a storage backend, by default minio (with boto3
+for the ACLs).  See the backends module for the alternatives, eg a local file
+system or in memory backend that needs no object store at all.
 """
 
-import glob
+import collections
+import concurrent.futures
+import fnmatch
+import functools
 import hashlib
+import io
 import logging
+import operator
 import os
 import pathlib
 import posixpath
+import queue
 import sys
-from datetime import timedelta
-
-import boto3
-import minio
-
-from . import constants
+import tempfile
+import threading
+import time
+
+from . import (
+    backends,
+    client_pool,
+    constants,
+    hash_cache,
+    instrumentation,
+    presign,
+    remote_index,
+    stat_cache,
+    sync_manifest,
+    walker,
+)
 
 LOGGER = logging.getLogger(__name__)
 
 name = __name__
 
+# comparison modes used by ObjectStoreDirectorySync to decide if a local file
+# needs to be uploaded
+#  exists     - only upload files that don't exist in object storage
+#  size       - also upload if the size of the object differs from the file
+#  size_mtime - also upload if the local file was modified after the object
+#  etag       - also upload if the md5 / multipart etag of the file differs
+COMPARE_EXISTS = "exists"
+COMPARE_SIZE = "size"
+COMPARE_SIZE_MTIME = "size_mtime"
+COMPARE_ETAG = "etag"
+COMPARE_MODES = (COMPARE_EXISTS, COMPARE_SIZE, COMPARE_SIZE_MTIME, COMPARE_ETAG)
+
+# outcomes of verifying a local file against object storage, the values are
+# the names of the VerifyReport lists the files are added to
+VERIFY_MATCHING = "matching"
+VERIFY_MISMATCHED = "mismatched"
+VERIFY_MISSING = "missing"
+
+# what a sync plan does with a local file, the values are the names of the
+# SyncPlan lists the files are added to
+#  uploads    - the object doesn't exist, the file is uploaded
+#  overwrites - the object differs from the file (see compare), it is replaced
+#  skips      - the object is the same as the file, nothing is transferred
+PLAN_UPLOAD = "uploads"
+PLAN_OVERWRITE = "overwrites"
+PLAN_SKIP = "skips"
+
+# public access states reported by ObjectStoreUtil.audit_public_permissions,
+# the values are the names of the AclReport lists the objects are added to
+#  public       - anyone can read the object
+#  private      - there is no public grant on the object
+#  inconsistent - there is a public grant other than a single READ, eg WRITE
+#                 or FULL_CONTROL, or several public grants
+ACL_PUBLIC = "public"
+ACL_PRIVATE = "private"
+ACL_INCONSISTENT = "inconsistent"
+
+# get_stream buffers objects up to this size in memory, larger objects spill
+# over to a temporary file in tmpfolder
+SPOOL_SIZE = 67108864
+
+# S3 multipart upload limits
+MAX_MULTIPART_PARTS = 10000
+MIN_PART_SIZE = 5242880
+MAX_PART_SIZE = 5368709120
+
+# the number of objects of each shard of a sharded listing that are buffered
+# ahead of the one being yielded, a page of a listing
+SHARD_BUFFER_SIZE = 1000
+
+
+def _iter_bounded(executor, func, items, max_in_flight):
+    """submits func(*item) to the executor for each item in items, keeping at
+    most max_in_flight calls queued or running at any one time.  Yields a
+    tuple of (item, future) as each call completes.
+
+    :param executor: a concurrent.futures.Executor
+    :param func: the callable to run
+    :param items: iterable of argument tuples for func, consumed lazily
+    :param max_in_flight: the maximum number of pending calls
+    """
+    max_in_flight = max(max_in_flight or 1, 1)
+    in_flight = {}
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            done, _ = concurrent.futures.wait(
+                in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield in_flight.pop(future), future
+        in_flight[executor.submit(func, *item)] = item
+    while in_flight:
+        done, _ = concurrent.futures.wait(in_flight)
+        for future in done:
+            yield in_flight.pop(future), future
+
+
+def _iter_batches(items, batch_size):
+    """yields lists of up to batch_size items from the items iterable"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_pwrite_lock = threading.Lock()
+
+
+def _pwrite(fh, data, offset):
+    """writes data at offset in the open file fh without moving the file
+    position, so it can be called by several threads at once.  Falls back to
+    a locked seek / write on platforms without os.pwrite
+    """
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fh.fileno(), view, offset)
+            view = view[written:]
+            offset += written
+        return
+    with _pwrite_lock:
+        fh.seek(offset)
+        fh.write(data)
+
+
+def _pread(fh, length, offset):
+    """reads length bytes at offset from the open file fh without moving the
+    file position, the counterpart of _pwrite
+    """
+    if hasattr(os, "pread"):
+        chunks = []
+        while length:
+            chunk = os.pread(fh.fileno(), length, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length -= len(chunk)
+            offset += len(chunk)
+        return b"".join(chunks)
+    with _pwrite_lock:
+        fh.seek(offset)
+        return fh.read(length)
+
+
+def multipart_part_size(file_size, min_part_size=15728640):
+    """returns the part size to use for a multipart upload of a file of
+    file_size bytes.  The part size is at least min_part_size, and is grown in
+    whole MiB steps for large files so the upload stays within the
+    MAX_MULTIPART_PARTS part limit.
+
+    :raises ValueError: raised if the file is too large to upload in
+        MAX_MULTIPART_PARTS parts of at most MAX_PART_SIZE bytes
+    """
+    part_size = max(min_part_size, MIN_PART_SIZE, -(-file_size // MAX_MULTIPART_PARTS))
+    # round up to a whole number of MiB
+    part_size = -(-part_size // 1048576) * 1048576
+    if part_size > MAX_PART_SIZE:
+        msg = f"{file_size} bytes is too large for a multipart upload"
+        raise ValueError(msg)
+    return part_size
+
+
+class _ShardStream:
+    """the objects of one shard of iter_objects_sharded.  They are listed on
+    a worker thread into a bounded queue, the listing pauses when the queue
+    is full so only `buffer_size` objects of the shard are held at a time.
+    """
+
+    _DONE = object()
+
+    def __init__(self, buffer_size, stop):
+        """
+        :param buffer_size: the maximum number of objects that are queued
+        :param stop: threading.Event that is set when the objects are no
+            longer wanted, the listing then ends
+        """
+        self._queue = queue.Queue(maxsize=max(buffer_size, 1))
+        self._stop = stop
+
+    def fill(self, objects):
+        """queues the objects, runs on the worker thread"""
+        for obj in objects:
+            if not self._put(obj):
+                return
+        self._put(self._DONE)
+
+    def fail(self, exc):
+        """queues an exception that is raised to the consumer"""
+        self._put(exc)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def _next_shard(pending):
+    """pops the first entry of the iter_objects_sharded queue and returns the
+    objects it holds, a _ShardStream is iterated as it is listed
+    """
+    entry = pending.popleft()
+    if isinstance(entry, _ShardStream):
+        return entry
+    return [entry]
+
+
+def _filter_objects(objects, pattern, min_size, max_size, modified_since):
+    """generator that yields the objects that match all of the filters that
+    are not None, see ObjectStoreUtil.list_objects.  Directory entries have no
+    size or modified time so they are dropped by the size / time filters.
+    """
+    for obj in objects:
+        if pattern is not None and not fnmatch.fnmatchcase(obj.object_name, pattern):
+            continue
+        if min_size is not None and (obj.size is None or obj.size < min_size):
+            continue
+        if max_size is not None and (obj.size is None or obj.size > max_size):
+            continue
+        if modified_since is not None and (
+            obj.last_modified is None or obj.last_modified < modified_since
+        ):
+            continue
+        yield obj
+
+
+class _ChunkStream(io.RawIOBase):
+    """read only file-like object over an iterable of bytes-like chunks, so
+    generators of data can be passed to the minio client
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer + b"".join(bytes(chunk) for chunk in self._chunks)
+            self._buffer = b""
+        else:
+            while len(self._buffer) < size:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buffer += bytes(chunk)
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self.bytes_read += len(data)
+        return data
+
+
+def _stream_length(stream):
+    """returns the number of bytes left in a seekable file-like object, or -1
+    if the length can't be determined without reading it
+    """
+    try:
+        if not stream.seekable():
+            return -1
+        pos = stream.tell()
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(pos)
+    except (AttributeError, OSError, ValueError):
+        return -1
+    return end - pos
+
 
 class ObjectStoreUtil:
     def __init__(
@@ -36,6 +322,10 @@ class ObjectStoreUtil:
         obj_store_secret=None,
         obj_store_bucket=None,
         tmpfolder=None,
+        pool_config=None,
+        presign_cache=None,
+        stat_cache=None,
+        backend=None,
     ):
         """[summary]
 
@@ -47,6 +337,26 @@ class ObjectStoreUtil:
         :type obj_store_user: [type], optional
         :param obj_store_secret: [description], defaults to None
         :type obj_store_secret: [type], optional
+        :param tmpfolder: the directory get_stream spills objects that are too
+            large to buffer in memory to, defaults to TMP_FOLDER or the
+            directory of this module
+        :type tmpfolder: str, optional
+        :param pool_config: the http connection pool settings (pool size,
+            keep alive, timeouts and retries), defaults to
+            client_pool.DEFAULT_POOL_CONFIG.  Clients are shared by all the
+            instances that use the same host, credentials and pool_config.
+        :type pool_config: client_pool.ConnectionPoolConfig, optional
+        :param presign_cache: optional cache that presigned urls are reused
+            from while they have enough validity left
+        :type presign_cache: presign.PresignedURLCache, optional
+        :param stat_cache: optional cache of object metadata used by
+            stat_object, entries are invalidated when this object writes,
+            deletes or changes the permissions of an object
+        :type stat_cache: stat_cache.StatCache, optional
+        :param backend: the storage backend the requests are made with,
+            defaults to a MinioBackend for obj_store_host.  When a backend is
+            provided the host / credentials aren't needed
+        :type backend: backends.StorageBackend, optional
         """
         self.obj_store_host = obj_store_host
         self.obj_store_user = obj_store_user
@@ -54,14 +364,19 @@ class ObjectStoreUtil:
         self.obj_store_bucket = obj_store_bucket
         self.tmpfolder = tmpfolder
 
-        if self.obj_store_host is None:
-            self.obj_store_host = constants.OBJ_STORE_HOST
-        if self.obj_store_user is None:
-            self.obj_store_user = constants.OBJ_STORE_USER
-        if self.obj_store_secret is None:
-            self.obj_store_secret = constants.OBJ_STORE_SECRET
-        if self.obj_store_bucket is None:
-            self.obj_store_bucket = constants.OBJ_STORE_BUCKET
+        if backend is None:
+            if self.obj_store_host is None:
+                self.obj_store_host = constants.OBJ_STORE_HOST
+            if self.obj_store_user is None:
+                self.obj_store_user = constants.OBJ_STORE_USER
+            if self.obj_store_secret is None:
+                self.obj_store_secret = constants.OBJ_STORE_SECRET
+            if self.obj_store_bucket is None:
+                self.obj_store_bucket = constants.OBJ_STORE_BUCKET
+        elif self.obj_store_bucket is None:
+            # the backend brings its own connection, the default bucket is
+            # still taken from the environment if it is set
+            self.obj_store_bucket = getattr(constants, "OBJ_STORE_BUCKET", None)
         # populate a temp folder variable.. if none is provided as an
         # arg or in a constants variable then just use the current
         # directory
@@ -71,12 +386,14 @@ class ObjectStoreUtil:
             else:
                 self.tmpfolder = os.path.dirname(__file__)
 
-        LOGGER.debug(f"obj store host: {self.obj_store_host}")
-        self.minio_client = minio.Minio(
-            self.obj_store_host,
-            self.obj_store_user,
-            self.obj_store_secret,
-        )
+        if pool_config is None:
+            pool_config = client_pool.DEFAULT_POOL_CONFIG
+        self.pool_config = pool_config
+        self.presign_cache = presign_cache
+        self.stat_cache = stat_cache
+        # instrumentation hooks, see add_hook
+        self.hooks = []
+
         # minio doesn't provide access to ACL's for buckets and objects
         # so using boto when that is required.  Methods that use the boto
         # client will create the object only when called
@@ -84,10 +401,36 @@ class ObjectStoreUtil:
         self.boto_session = None
         self.part_size = 15728640
 
-    def get_object(self, file_path, local_path, bucket_name=None):
+        self.minio_client = None
+        if backend is None:
+            LOGGER.debug(f"obj store host: {self.obj_store_host}")
+            self.minio_client = client_pool.get_minio_client(
+                self.obj_store_host,
+                self.obj_store_user,
+                self.obj_store_secret,
+                pool_config=self.pool_config,
+            )
+            backend = backends.MinioBackend(
+                self.minio_client, get_boto_client=self._get_boto_client
+            )
+        self.backend = backend
+
+    def get_object(
+        self,
+        file_path,
+        local_path,
+        bucket_name=None,
+        workers=None,
+        part_size=None,
+        retries=3,
+    ):
         """extracts an object from object store to a location on the
         filesystem where code is being run.
 
+        If `workers` is greater than 1 the object is split into byte ranges of
+        `part_size` bytes which are downloaded concurrently, see
+        get_object_ranged.
+
         :param filePath: path to an object in objectstore
         :type filePath: str, path
         :param localPath: The path where the object should be copied to on
@@ -97,20 +440,160 @@ class ObjectStoreUtil:
                            not provided uses the bucket that is identified in
                            the environment variable OBJ_STORE_BUCKET
         :type bucketName: str
+        :param workers: number of concurrent range requests, defaults to None
+            which downloads the object over a single connection
+        :type workers: int
+        :param part_size: the size of the byte ranges, defaults to part_size
+        :type part_size: int
+        :param retries: the number of times the ranges that failed are retried
+        :type retries: int
         """
         if not bucket_name:
             bucket_name = self.obj_store_bucket
-        retVal = self.minio_client.fget_object(
-            bucket_name=bucket_name, object_name=file_path, file_path=local_path
-        )
-        LOGGER.debug("object get response:" + f"{self.get_obj_props_as_dict(retVal)}")
+        if workers and workers > 1:
+            self.get_object_ranged(
+                file_path,
+                local_path,
+                bucket_name=bucket_name,
+                workers=workers,
+                part_size=part_size,
+                retries=retries,
+            )
+            return
+        with self._instrument("get_object", bucket_name, file_path) as op:
+            retVal = self.backend.get_object(bucket_name, file_path, local_path)
+            op.bytes = retVal.size
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(f"object get response: {self.get_obj_props_as_dict(retVal)}")
+
+    def get_object_ranged(
+        self,
+        file_path,
+        local_path,
+        bucket_name=None,
+        workers=4,
+        part_size=None,
+        retries=3,
+        verify=True,
+    ):
+        """downloads an object as concurrent byte range requests.
+
+        The ranges are written with positional writes into a temporary file,
+        preallocated to the size of the object, in the same directory as
+        local_path.  Ranges that fail are retried on their own, up to
+        `retries` times.  Once all the ranges are downloaded the file is
+        checked against the object's etag and renamed to local_path.  Every
+        range request is conditional on the etag, so an object that is
+        replaced during the download causes the download to fail rather than
+        produce a mix of the two versions.
+
+        :param file_path: path to an object in objectstore
+        :type file_path: str
+        :param local_path: The path where the object should be copied to
+        :type local_path: str
+        :param bucket_name: name of the bucket where the object is located
+        :type bucket_name: str
+        :param workers: number of concurrent range requests
+        :type workers: int
+        :param part_size: the size of the byte ranges, defaults to part_size
+        :type part_size: int
+        :param retries: the number of times the ranges that failed are retried
+        :type retries: int
+        :param verify: check the downloaded file against the etag
+        :type verify: bool
+        :raises ValueError: raised if the downloaded file doesn't match the
+            object's etag
+        """
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        if not part_size:
+            part_size = self.part_size
+        with self._instrument("get_object", bucket_name, file_path) as op:
+            stat = self.stat_object(object_name=file_path, bucket_name=bucket_name)
+            etag = stat.etag.strip('"') if stat.etag else stat.etag
+            op.bytes = stat.size
+            ranges = [
+                (offset, min(part_size, stat.size - offset))
+                for offset in range(0, stat.size, part_size)
+            ]
+            LOGGER.debug(f"downloading {file_path} as {len(ranges)} ranges")
+
+            local_dir = os.path.dirname(os.path.abspath(local_path))
+            os.makedirs(local_dir, exist_ok=True)
+            tmp_fd, tmp_file = backends.make_temp_file(
+                local_dir, prefix="." + os.path.basename(local_path)
+            )
+            try:
+                with os.fdopen(tmp_fd, "r+b") as fh:
+                    fh.truncate(stat.size)
+                    fetch = functools.partial(
+                        self._fetch_range, fh, bucket_name, file_path, etag
+                    )
+                    with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=max(workers or 1, 1)
+                    ) as executor:
+                        for attempt in range(retries + 1):
+                            if attempt:
+                                op.retries += len(ranges)
+                            failed = []
+                            for (offset, length), future in _iter_bounded(
+                                executor, fetch, ranges, max(workers or 1, 1) * 2
+                            ):
+                                exc = future.exception()
+                                if exc is not None:
+                                    LOGGER.warning(
+                                        f"range {offset}-{offset + length} of "
+                                        + f"{file_path} failed: {exc}"
+                                    )
+                                    failed.append(((offset, length), exc))
+                            if not failed:
+                                break
+                            ranges = [failed_range for failed_range, _ in failed]
+                        if failed:
+                            raise failed[0][1]
+                if verify and etag and not CalcETags().etag_matches(tmp_file, etag):
+                    msg = f"downloaded file for {file_path} doesn't match etag {etag}"
+                    LOGGER.error(msg)
+                    raise ValueError(msg)
+                os.replace(tmp_file, local_path)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+
+    def _fetch_range(self, fh, bucket_name, file_path, etag, offset, length):
+        """downloads a single byte range of an object and writes it at the
+        same offset of the open file fh
+        """
+        pos = offset
+        for chunk in self.backend.iter_object(
+            bucket_name, file_path, offset=offset, length=length, etag=etag
+        ):
+            _pwrite(fh, chunk, pos)
+            pos += len(chunk)
+        if pos != offset + length:
+            msg = f"expected {length} bytes at {offset}, got {pos - offset}"
+            raise IOError(msg)
 
     def get_object_properties(self, object_name, bucket_name=None):
         return self.stat_object(object_name=object_name, bucket_name=bucket_name)
 
-    def put_object(self, ostore_path, local_path, bucket_name=None, public=False):
-        """just a wrapper method around the minio fput.  Makes it a
-        little easier to call.
+    def put_object(
+        self,
+        ostore_path,
+        local_path,
+        bucket_name=None,
+        public=False,
+        workers=None,
+        part_size=None,
+        retries=3,
+    ):
+        """just a wrapper method around the backend's put (minio fput by
+        default).  Makes it a little easier to call.
+
+        If `workers` is greater than 1 and the file is larger than a single
+        part, the parts of the multipart upload are sent concurrently, see
+        put_object_multipart.
 
         :param localPath: the path to the file in the locally accessible file
                           system
@@ -120,51 +603,532 @@ class ObjectStoreUtil:
         :type destPath:
         :param bucketName: [], defaults to None
         :type bucketName: [type], optional
+        :param workers: number of parts uploaded concurrently, defaults to
+            None which uploads the parts one after the other
+        :type workers: int
+        :param part_size: the minimum part size, defaults to part_size.  The
+            part size is increased for large files, see multipart_part_size
+        :type part_size: int
+        :param retries: the number of times the parts that failed are retried,
+            only used by concurrent uploads
+        :type retries: int
         """
         if not bucket_name:
             bucket_name = self.obj_store_bucket
-        metadata = {}
-        if public:
-            metadata = {"x-amz-acl": "public-read"}
+        file_size = os.path.getsize(local_path)
+        part_size = multipart_part_size(file_size, part_size or self.part_size)
+        if workers and workers > 1 and file_size > part_size:
+            return self.put_object_multipart(
+                ostore_path,
+                local_path,
+                bucket_name=bucket_name,
+                public=public,
+                workers=workers,
+                part_size=part_size,
+                retries=retries,
+            )
+        with self._instrument("put_object", bucket_name, ostore_path) as op:
+            op.bytes = file_size
+            try:
+                ret_val = self.backend.put_object(
+                    bucket_name,
+                    ostore_path,
+                    local_path,
+                    part_size=part_size,
+                    acl="public-read" if public else None,
+                )
+            finally:
+                self._invalidate_stat(bucket_name, [ostore_path])
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            props = self.get_obj_props_as_dict(ret_val)
+            LOGGER.debug(f"object store returned: {props}")
+        return ret_val
 
-        ret_val = self.minio_client.fput_object(
-            bucket_name=bucket_name,
-            object_name=ostore_path,
-            file_path=local_path,
-            part_size=self.part_size,
-            metadata=metadata,
+    def put_object_multipart(
+        self,
+        ostore_path,
+        local_path,
+        bucket_name=None,
+        public=False,
+        workers=4,
+        part_size=None,
+        retries=3,
+    ):
+        """uploads a file as a multipart upload with the parts sent
+        concurrently.
+
+        Each part is read from the file with a positional read by the thread
+        that uploads it, and no more than `workers` parts are queued at once,
+        so at most workers * part_size bytes of the file are held in memory.
+        Parts that fail are retried on their own, up to `retries` times.  If
+        the upload can't be completed it is aborted so the parts that were
+        already uploaded don't linger in the bucket.
+
+        :param ostore_path: the path in the object storage where the file
+            should be written
+        :type ostore_path: str
+        :param local_path: the path to the file to upload
+        :type local_path: str
+        :param bucket_name: the bucket to upload to
+        :type bucket_name: str
+        :param public: make the object publicly readable
+        :type public: bool
+        :param workers: number of parts uploaded concurrently
+        :type workers: int
+        :param part_size: the minimum part size, defaults to part_size.  The
+            part size is increased for large files, see multipart_part_size
+        :type part_size: int
+        :param retries: the number of times the parts that failed are retried
+        :type retries: int
+        :return: the result of the upload
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        workers = max(workers or 1, 1)
+        file_size = os.path.getsize(local_path)
+        part_size = multipart_part_size(file_size, part_size or self.part_size)
+        parts = [
+            (part_number, offset, min(part_size, file_size - offset))
+            for part_number, offset in enumerate(
+                range(0, max(file_size, 1), part_size), start=1
+            )
+        ]
+        LOGGER.debug(f"uploading {local_path} as {len(parts)} parts of {part_size}")
+
+        with self._instrument("put_object", bucket_name, ostore_path) as op:
+            op.bytes = file_size
+            upload_id = self.backend.create_multipart_upload(
+                bucket_name, ostore_path, acl="public-read" if public else None
+            )
+            try:
+                etags = {}
+                with open(local_path, "rb") as fh:
+                    upload = functools.partial(
+                        self._upload_part, fh, bucket_name, ostore_path, upload_id
+                    )
+                    with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=workers
+                    ) as executor:
+                        for attempt in range(retries + 1):
+                            if attempt:
+                                op.retries += len(parts)
+                            failed = []
+                            for part, future in _iter_bounded(
+                                executor, upload, parts, workers
+                            ):
+                                exc = future.exception()
+                                if exc is not None:
+                                    LOGGER.warning(
+                                        f"part {part[0]} of {local_path} failed: {exc}"
+                                    )
+                                    failed.append((part, exc))
+                                else:
+                                    etags[part[0]] = future.result()
+                            if not failed:
+                                break
+                            parts = [failed_part for failed_part, _ in failed]
+                        if failed:
+                            raise failed[0][1]
+                result = self.backend.complete_multipart_upload(
+                    bucket_name,
+                    ostore_path,
+                    upload_id,
+                    sorted(etags.items()),
+                )
+            except BaseException:
+                LOGGER.error(f"aborting multipart upload of {local_path}")
+                try:
+                    self.backend.abort_multipart_upload(
+                        bucket_name, ostore_path, upload_id
+                    )
+                except Exception as exc:
+                    LOGGER.warning(f"failed to abort upload {upload_id}: {exc}")
+                raise
+            finally:
+                self._invalidate_stat(bucket_name, [ostore_path])
+        return result
+
+    def _upload_part(
+        self, fh, bucket_name, ostore_path, upload_id, part_number, offset, length
+    ):
+        """reads a single part from the open file fh and uploads it, returns
+        the etag of the part
+        """
+        data = _pread(fh, length, offset)
+        if len(data) != length:
+            msg = f"expected {length} bytes at {offset}, got {len(data)}"
+            raise IOError(msg)
+        return self.backend.upload_part(
+            bucket_name, ostore_path, upload_id, part_number, data
         )
-        LOGGER.debug(f"object store returned: {self.get_obj_props_as_dict(ret_val)}")
+
+    def put_stream(
+        self,
+        ostore_path,
+        data,
+        bucket_name=None,
+        public=False,
+        length=None,
+        part_size=None,
+        content_type="application/octet-stream",
+    ):
+        """uploads data that is held in memory or produced on the fly, without
+        writing it to the file system first.
+
+        :param ostore_path: the path in the object storage where the data
+            should be written
+        :type ostore_path: str
+        :param data: the data to upload, one of bytes / bytearray /
+            memoryview, a readable file-like object or an iterable of
+            bytes-like chunks
+        :param bucket_name: the bucket to upload to
+        :type bucket_name: str
+        :param public: make the object publicly readable
+        :type public: bool
+        :param length: the number of bytes in data, defaults to None which
+            works it out for buffers and seekable file-like objects.  Streams
+            of unknown length are uploaded as multipart uploads of part_size
+            parts
+        :type length: int
+        :param part_size: the minimum part size, defaults to part_size
+        :type part_size: int
+        :param content_type: the content type of the object
+        :type content_type: str
+        :return: the result of the upload
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = io.BytesIO(data)
+        elif not callable(getattr(data, "read", None)):
+            data = _ChunkStream(data)
+        if length is None:
+            length = _stream_length(data)
+        if length < 0 and not isinstance(data, _ChunkStream):
+            # wrapped so the number of bytes uploaded can be counted
+            data = _ChunkStream(iter(functools.partial(data.read, 1048576), b""))
+        part_size = part_size or self.part_size
+        if length >= 0:
+            part_size = multipart_part_size(length, part_size)
+        with self._instrument("put_object", bucket_name, ostore_path) as op:
+            try:
+                ret_val = self.backend.put_stream(
+                    bucket_name,
+                    ostore_path,
+                    data,
+                    length=length,
+                    part_size=part_size,
+                    content_type=content_type,
+                    acl="public-read" if public else None,
+                )
+            finally:
+                self._invalidate_stat(bucket_name, [ostore_path])
+                op.bytes = length if length >= 0 else data.bytes_read
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            props = self.get_obj_props_as_dict(ret_val)
+            LOGGER.debug(f"object store returned: {props}")
         return ret_val
 
+    def get_stream(
+        self,
+        file_path,
+        out=None,
+        bucket_name=None,
+        chunk_size=1048576,
+        spool_size=SPOOL_SIZE,
+    ):
+        """reads an object without writing it to a named file.
+
+        If `out` is provided the object is streamed into it, otherwise the
+        object is returned in a file-like object positioned at the start of
+        the data.  The returned object is held in memory until it grows past
+        `spool_size` bytes, after that it spills over to an anonymous
+        temporary file in tmpfolder.
+
+        :param file_path: path to an object in objectstore
+        :type file_path: str
+        :param out: a writable file-like object to stream the object into
+        :param bucket_name: name of the bucket where the object is located
+        :type bucket_name: str
+        :param chunk_size: the number of bytes read from the response at once
+        :type chunk_size: int
+        :param spool_size: the number of bytes buffered in memory before
+            spilling over to tmpfolder
+        :type spool_size: int
+        :return: the number of bytes written if out was provided, otherwise
+            the file-like object containing the object
+        """
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        dest = out
+        if dest is None:
+            dest = tempfile.SpooledTemporaryFile(
+                max_size=spool_size, dir=self.tmpfolder
+            )
+        written = 0
+        try:
+            with self._instrument("get_object", bucket_name, file_path) as op:
+                try:
+                    for chunk in self.backend.iter_object(
+                        bucket_name, file_path, chunk_size=chunk_size
+                    ):
+                        dest.write(chunk)
+                        written += len(chunk)
+                finally:
+                    op.bytes = written
+        except BaseException:
+            if out is None:
+                dest.close()
+            raise
+        LOGGER.debug(f"read {written} bytes from {file_path}")
+        if out is not None:
+            return written
+        dest.seek(0)
+        return dest
+
     def list_objects(
-        self, objstore_dir=None, recursive=True, return_file_names_only=False
+        self,
+        objstore_dir=None,
+        recursive=True,
+        return_file_names_only=False,
+        bucket_name=None,
+        iterator=False,
+        start_after=None,
+        delimiter=None,
+        pattern=None,
+        min_size=None,
+        max_size=None,
+        modified_since=None,
+        workers=None,
+        shard_depth=1,
     ):
         """lists the objects in the object store.  Run's recursive, if
         inDir arg is provided only lists objects that fall under that
         directory
 
+        The listing is streamed from the object store a page at a time, and
+        the pattern / size / modified filters are applied to each object as
+        it arrives, so the full listing is never held in memory unless a list
+        of names is asked for.
+
         :param inDir: The input directory who's objects are to be listed
                       if no value is provided will list all objects in the
                       bucket
         :type inDir: str
+        :param bucket_name: the bucket to list, defaults to the bucket that is
+            identified in the environment variable OBJ_STORE_BUCKET
+        :type bucket_name: str
+        :param iterator: when return_file_names_only is set, return a
+            generator of the names instead of building a list
+        :type iterator: bool
+        :param start_after: only list the objects whose names sort after this
+            key, evaluated by the object store
+        :type start_after: str
+        :param delimiter: group the keys that contain the delimiter after the
+            prefix into a single directory entry, evaluated by the object
+            store.  Overrides recursive, which is the same as a delimiter of
+            "/" when False
+        :type delimiter: str
+        :param pattern: fnmatch style pattern the full object name has to
+            match, eg "junky/*.txt"
+        :type pattern: str
+        :param min_size: only list objects of at least this many bytes
+        :type min_size: int
+        :param max_size: only list objects of at most this many bytes
+        :type max_size: int
+        :param modified_since: only list objects modified at or after this
+            time (timezone aware)
+        :type modified_since: datetime.datetime
+        :param workers: if greater than 1 a recursive listing is split into
+            shards by sub-prefix which are listed concurrently by this many
+            threads, see iter_objects_sharded.  Ignored when start_after or
+            delimiter are used
+        :type workers: int
+        :param shard_depth: the number of directory levels below objstore_dir
+            used to split the listing into shards
+        :type shard_depth: int
         :return: list of the object names in the bucket
         :rtype: list
         """
-        objects = self.minio_client.list_objects(
-            self.obj_store_bucket,
-            recursive=recursive,
-            prefix=objstore_dir,
-            use_url_encoding_type=False,
-        )
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        if (
+            workers
+            and workers > 1
+            and recursive
+            and delimiter is None
+            and start_after is None
+        ):
+            objects = self.iter_objects_sharded(
+                objstore_dir,
+                bucket_name=bucket_name,
+                workers=workers,
+                shard_depth=shard_depth,
+            )
+        else:
+            if delimiter is None and not recursive:
+                delimiter = "/"
+            objects = self.backend.list_objects(
+                bucket_name,
+                prefix=objstore_dir,
+                delimiter=delimiter,
+                start_after=start_after,
+            )
+        if (
+            pattern is not None
+            or min_size is not None
+            or max_size is not None
+            or modified_since is not None
+        ):
+            objects = _filter_objects(
+                objects, pattern, min_size, max_size, modified_since
+            )
         retVal = objects
         if return_file_names_only:
-            retVal = []
-            for obj in objects:
-                retVal.append(obj.object_name)
+            retVal = (obj.object_name for obj in objects)
+            if not iterator:
+                retVal = list(retVal)
 
         return retVal
 
+    def iter_objects_sharded(
+        self,
+        objstore_dir=None,
+        bucket_name=None,
+        workers=8,
+        shard_depth=1,
+        buffer_size=SHARD_BUFFER_SIZE,
+    ):
+        """generator that lists all the objects under objstore_dir
+        recursively, with the listing split into shards that are listed
+        concurrently.
+
+        A single prefix can only be listed one page after another, so the
+        sub-prefixes of objstore_dir are first discovered with "/" delimited
+        listings, `shard_depth` levels deep, and each sub-prefix is then
+        listed on its own thread.  The shards don't overlap and are listed in
+        key order, so the objects are yielded in the same order as a
+        sequential listing.
+
+        At most 2 * workers shards are listed ahead of the one being yielded
+        and each of them streams its objects through a queue of
+        `buffer_size`, so the memory used doesn't depend on the size of the
+        shards.  The exception is the objects found directly in the levels
+        above shard_depth, they are held until the prefixes are discovered.
+
+        :param objstore_dir: the prefix to list, defaults to the whole bucket
+        :type objstore_dir: str
+        :param bucket_name: the bucket to list
+        :type bucket_name: str
+        :param workers: the number of shards listed concurrently
+        :type workers: int
+        :param shard_depth: the number of directory levels below objstore_dir
+            used to split the listing into shards
+        :type shard_depth: int
+        :param buffer_size: the number of objects of each shard that are
+            listed ahead of the one being yielded
+        :type buffer_size: int
+        :return: yields minio Object's
+        """
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        workers = max(workers or 1, 1)
+        list_shard = functools.partial(self._list_shard, bucket_name)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            # a prefix (str) still to be listed or an object (minio Object)
+            # that was found while discovering the prefixes, in key order
+            entries = [objstore_dir or ""]
+            for _ in range(max(shard_depth, 0)):
+                prefixes = [entry for entry in entries if isinstance(entry, str)]
+                if not prefixes:
+                    break
+                children = dict(
+                    zip(
+                        prefixes,
+                        executor.map(
+                            functools.partial(list_shard, delimiter="/"), prefixes
+                        ),
+                    )
+                )
+                expanded = []
+                for entry in entries:
+                    if not isinstance(entry, str):
+                        expanded.append(entry)
+                        continue
+                    # the objects and the common prefixes are returned as
+                    # separate lists, so put them back into key order
+                    by_name = operator.attrgetter("object_name")
+                    for obj in sorted(children[entry], key=by_name):
+                        expanded.append(obj.object_name if obj.is_dir else obj)
+                entries = expanded
+            LOGGER.debug(f"listing {objstore_dir} as {len(entries)} shards")
+
+            # set when the generator finishes, or is closed early, so the
+            # listings that are paused on a full queue end
+            stop = threading.Event()
+            pending = collections.deque()
+            try:
+                for entry in entries:
+                    if isinstance(entry, str):
+                        shard = _ShardStream(buffer_size, stop)
+                        executor.submit(self._fill_shard, shard, bucket_name, entry)
+                        entry = shard
+                    pending.append(entry)
+                    while len(pending) > workers * 2:
+                        yield from _next_shard(pending)
+                while pending:
+                    yield from _next_shard(pending)
+            finally:
+                stop.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fill_shard(self, shard, bucket_name, prefix):
+        """lists a shard of iter_objects_sharded recursively into its
+        _ShardStream
+        """
+        try:
+            with self._instrument("list_objects", bucket_name, prefix):
+                objects = self.backend.list_objects(bucket_name, prefix=prefix or None)
+                shard.fill(objects)
+        except BaseException as exc:
+            shard.fail(exc)
+
+    def _list_shard(self, bucket_name, prefix, delimiter=None):
+        """lists a single level of iter_objects_sharded's prefixes, or a
+        whole shard if delimiter isn't set
+        """
+        with self._instrument("list_objects", bucket_name, prefix):
+            return list(
+                self.backend.list_objects(
+                    bucket_name, prefix=prefix or None, delimiter=delimiter
+                )
+            )
+
+    def add_hook(self, hook):
+        """registers an instrumentation hook that is called at the start and
+        end of each operation, see the instrumentation module
+
+        :param hook: object with on_start(event) and on_end(event) methods
+        :type hook: instrumentation.InstrumentationHook
+        """
+        # replaced rather than modified so threads that are iterating over the
+        # hooks aren't affected
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        """unregisters an instrumentation hook"""
+        self.hooks = [registered for registered in self.hooks if registered is not hook]
+
+    def _instrument(self, operation, bucket_name=None, object_name=None):
+        """returns the context manager that reports an operation to the
+        hooks, a no-op when there are no hooks
+        """
+        return instrumentation.operation(
+            self.hooks, operation, bucket_name, object_name
+        )
+
     def log_object_properties(self, in_object):
         """write to the log the properties / values of the specified
         object
@@ -203,15 +1167,42 @@ class ObjectStoreUtil:
         """
         if bucket_name is None:
             bucket_name = self.obj_store_bucket
-        stat = self.minio_client.stat_object(bucket_name, object_name)
+        if self.stat_cache is None:
+            return self._stat_remote(bucket_name, object_name)
+
+        from minio.error import S3Error
+
+        found, stat, error = self.stat_cache.get(bucket_name, object_name)
+        if found:
+            if error is not None:
+                raise error.with_traceback(None)
+            return stat
+        try:
+            stat = self._stat_remote(bucket_name, object_name)
+        except S3Error as err:
+            if err.code in stat_cache.MISSING_CODES:
+                self.stat_cache.put_missing(bucket_name, object_name, err)
+            raise
         # self.__logObjectProperties(stat)
+        self.stat_cache.put(bucket_name, object_name, stat)
         return stat
 
+    def _stat_remote(self, bucket_name, object_name):
+        with self._instrument("stat_object", bucket_name, object_name):
+            return self.backend.stat_object(bucket_name, object_name)
+
+    def _invalidate_stat(self, bucket_name, object_names):
+        """drops the objects from the stat cache after they have been
+        changed
+        """
+        if self.stat_cache is not None:
+            self.stat_cache.invalidate(bucket_name, object_names)
+
     def createBotoClient(
         self, obj_store_user=None, obj_store_secret=None, obj_store_host=None
     ):
         """Checks to see if a boto connection has been made, if not then
-        uses the following constants to build the connection:
+        gets the shared client for the following constants:
 
         Treat this as a private method.  Any other methods that need a boto
         client will call this first.
@@ -220,7 +1211,6 @@ class ObjectStoreUtil:
         client secret:  constants.OBJ_STORE_SECRET
         s3 host:        constants.OBJ_STORE_HOST
         """
-        self.obj_store_host
         if obj_store_user is None:
             obj_store_user = self.obj_store_user
         if obj_store_secret is None:
@@ -228,23 +1218,24 @@ class ObjectStoreUtil:
         if obj_store_host is None:
             obj_store_host = self.obj_store_host
 
-        if self.boto_session is None:
-            self.boto_session = boto3.session.Session()
-
-        # aws_access_key_id - A specific AWS access key ID.
-        # aws_secret_access_key - A specific AWS secret access key.
-        # region_name - The AWS Region where you want to create new
-        #               connections.
-        # profile_name - The profile to use when creating your session.
-
+        # the client comes from the process wide registry so its connection
+        # pool is shared with every other instance using the same host /
+        # credentials
         if self.boto_client is None:
-            self.boto_client = self.boto_session.client(
-                service_name="s3",
-                aws_access_key_id=obj_store_user,
-                aws_secret_access_key=obj_store_secret,
-                endpoint_url=f"https://{obj_store_host}",
+            self.boto_client = client_pool.get_boto_client(
+                obj_store_host,
+                obj_store_user,
+                obj_store_secret,
+                pool_config=self.pool_config,
             )
 
+    def _get_boto_client(self):
+        """returns the boto client, used by the default backend for the
+        ACLs
+        """
+        self.createBotoClient()
+        return self.boto_client
+
     def get_public_permission(self, object_name, bucket_name):
         """uses the boto3 module to communicate with the S3 service and retrieve
         the ACL's.  Parses the acl and return the permission that is associated
@@ -284,10 +1275,29 @@ class ObjectStoreUtil:
         if bucket_name is None:
             bucket_name = self.obj_store_bucket
 
-        self.createBotoClient()
-        permission = None
-        results = self.boto_client.get_object_acl(Bucket=bucket_name, Key=object_name)
-        LOGGER.debug(f"ACL permissions: {results}")
+        permissions, results = self._get_public_grants(object_name, bucket_name)
+        if len(permissions) > 1:
+            msg = (
+                f"return object is: {results}, expecting it"
+                + "to only contain a single public permission but  "
+                + "have found >1. Public permissions are defined "
+                + 'under the property "Grants"-"Grantee"-"Type" = '
+                + "Group and allusers in the uri"
+            )
+            raise ValueError(msg)
+        return permissions[0] if permissions else None
+
+    def _get_public_grants(self, object_name, bucket_name):
+        """retrieves the ACL of an object
+
+        :return: the list of permissions granted to the public (AllUsers
+            group), and the full get_object_acl response
+        """
+        permissions = []
+        with self._instrument("get_object_acl", bucket_name, object_name):
+            results = self.backend.get_object_acl(bucket_name, object_name)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(f"ACL permissions: {results}")
         for grants in results["Grants"]:
             if (
                 "Grantee" in grants
@@ -296,18 +1306,8 @@ class ObjectStoreUtil:
                 and "URI" in grants["Grantee"]
                 and "AllUsers".lower() in grants["Grantee"]["URI"].lower()
             ):
-                if permission is not None:
-                    msg = (
-                        f"return object is: {results}, expecting it"
-                        + "to only contain a single public permission but  "
-                        + "have found >1. Public permissions are defined "
-                        + 'under the property "Grants"-"Grantee"-"Type" = '
-                        + "Group and allusers in the uri"
-                    )
-                    raise ValueError(msg)
-                # print(f'grant:   {grants}')
-                permission = grants["Permission"]
-        return permission
+                permissions.append(grants["Permission"])
+        return permissions, results
 
     def set_public_permissions(self, object_name, bucket_name=None):
         """Sets the input object that exists in object store to be public
@@ -330,12 +1330,128 @@ class ObjectStoreUtil:
         """
         if bucket_name is None:
             bucket_name = self.obj_store_bucket
-        self.createBotoClient()
+        self._put_object_acl(object_name, bucket_name, "public-read")
 
-        resp = self.boto_client.put_object_acl(
-            ACL="public-read", Bucket=bucket_name, Key=object_name
-        )
-        LOGGER.debug(f"resp: {resp}")
+    def _put_object_acl(self, object_name, bucket_name, acl):
+        """applies a canned ACL to an object"""
+        try:
+            with self._instrument("put_object_acl", bucket_name, object_name):
+                self.backend.put_object_acl(bucket_name, object_name, acl)
+        finally:
+            self._invalidate_stat(bucket_name, [object_name])
+
+    def iter_set_acls(
+        self,
+        objects,
+        acl="public-read",
+        bucket_name=None,
+        workers=8,
+        max_in_flight=None,
+    ):
+        """generator that applies a canned ACL to many objects concurrently.
+
+        :param objects: the prefix of the objects (str), or an iterable of
+            object names.  The names are consumed lazily
+        :param acl: the canned ACL to apply, eg "public-read" or "private"
+        :type acl: str
+        :param bucket_name: the bucket the objects are in
+        :type bucket_name: str
+        :param workers: the number of ACL requests sent at once
+        :type workers: int
+        :param max_in_flight: the maximum number of requests queued or
+            running, defaults to 2 * workers
+        :type max_in_flight: int
+        :return: yields a tuple of (object name, exception or None) for each
+            object as its request completes
+        """
+        if bucket_name is None:
+            bucket_name = self.obj_store_bucket
+        put_acl = functools.partial(self._put_acl_item, bucket_name, acl)
+        for (object_name,), future in self._iter_acl_requests(
+            put_acl, objects, bucket_name, workers, max_in_flight
+        ):
+            yield object_name, future.exception()
+
+    def iter_public_permissions(
+        self, objects, bucket_name=None, workers=8, max_in_flight=None
+    ):
+        """generator that reads the ACLs of many objects concurrently.
+
+        :param objects: the prefix of the objects (str), or an iterable of
+            object names.  The names are consumed lazily
+        :param bucket_name: the bucket the objects are in
+        :type bucket_name: str
+        :param workers: the number of ACL requests sent at once
+        :type workers: int
+        :param max_in_flight: the maximum number of requests queued or
+            running, defaults to 2 * workers
+        :type max_in_flight: int
+        :return: yields a tuple of (object name, list of the permissions
+            granted to the public or the exception raised) for each object as
+            its request completes
+        """
+        if bucket_name is None:
+            bucket_name = self.obj_store_bucket
+        get_grants = functools.partial(self._get_grants_item, bucket_name)
+        for (object_name,), future in self._iter_acl_requests(
+            get_grants, objects, bucket_name, workers, max_in_flight
+        ):
+            exc = future.exception()
+            yield object_name, exc if exc is not None else future.result()
+
+    def audit_public_permissions(
+        self, objects, bucket_name=None, workers=8, max_in_flight=None
+    ):
+        """reads the ACLs of many objects concurrently and reports which are
+        public, private or inconsistent, see the ACL_* constants
+
+        :param objects: the prefix of the objects (str), or an iterable of
+            object names
+        :return: report of the public access of the objects
+        :rtype: AclReport
+        """
+        report = AclReport()
+        for object_name, permissions in self.iter_public_permissions(
+            objects,
+            bucket_name=bucket_name,
+            workers=workers,
+            max_in_flight=max_in_flight,
+        ):
+            if isinstance(permissions, Exception):
+                LOGGER.error(f"failed to read the ACL of {object_name}: {permissions}")
+                report.errors[object_name] = permissions
+            elif not permissions:
+                report.add(ACL_PRIVATE, object_name)
+            elif permissions == ["READ"]:
+                report.add(ACL_PUBLIC, object_name)
+            else:
+                report.add(ACL_INCONSISTENT, object_name)
+        LOGGER.debug(f"ACL audit: {report}")
+        return report
+
+    def _iter_acl_requests(self, func, objects, bucket_name, workers, max_in_flight):
+        """runs func(object_name) on a thread pool for each of the objects,
+        yielding ((object_name,), future) as they complete
+        """
+        if isinstance(objects, str):
+            objects = self.list_objects(
+                objstore_dir=objects,
+                return_file_names_only=True,
+                bucket_name=bucket_name,
+                iterator=True,
+            )
+        workers = max(workers or 1, 1)
+        if not max_in_flight:
+            max_in_flight = workers * 2
+        items = ((object_name,) for object_name in objects)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from _iter_bounded(executor, func, items, max_in_flight)
+
+    def _put_acl_item(self, bucket_name, acl, object_name):
+        self._put_object_acl(object_name, bucket_name, acl)
+
+    def _get_grants_item(self, bucket_name, object_name):
+        return self._get_public_grants(object_name, bucket_name)[0]
 
     def get_force_download_headers(self, object_name):
         filename = os.path.basename(object_name)
@@ -355,22 +1471,100 @@ class ObjectStoreUtil:
 
         :param objectName: object name / key that exists in the object store
         :type objectName: str
+        :param expires: how long the url is valid for, seconds or a timedelta
+        :type expires: int, datetime.timedelta
+        :param headers: response headers to override in the url, eg
+            {"response-content-type": "application/json"}
+        :type headers: dict
+        """
+        return self.get_presigned_urls(
+            [object_name],
+            object_bucket=object_bucket,
+            expires=expires,
+            headers=headers,
+        )[object_name]
+
+    def get_presigned_urls(
+        self, object_names, object_bucket=None, expires=60 * 60, headers=None
+    ):
+        """returns presigned urls for many objects.  The whole batch is signed
+        with the same signing key, see presign.presign_urls (other backends
+        may sign the urls one at a time).
+
+        If the object has a presign_cache, urls that have already been handed
+        out are returned from it while they have enough validity left, only
+        the rest are signed.
+
+        :param object_names: iterable of object names / keys
+        :param object_bucket: the bucket the objects are in
+        :type object_bucket: str
+        :param expires: how long the urls are valid for, seconds or a
+            timedelta
+        :type expires: int, datetime.timedelta
+        :param headers: response headers to override in the urls
+        :type headers: dict
+        :return: dict of object name -> url
+        :rtype: dict
         """
         if object_bucket is None:
             object_bucket = self.obj_store_bucket
+        expires = presign.as_timedelta(expires)
+
+        urls = {}
+        to_sign = []
+        for object_name in object_names:
+            if self.presign_cache is not None:
+                url = self.presign_cache.get(
+                    self.presign_cache.key(object_bucket, object_name, expires, headers)
+                )
+                if url is not None:
+                    urls[object_name] = url
+                    continue
+            to_sign.append(object_name)
+        if to_sign:
+            signed, expires_at = self.backend.presign_urls(
+                object_bucket, to_sign, expires, headers=headers
+            )
+            if self.presign_cache is not None:
+                for object_name, url in signed.items():
+                    self.presign_cache.put(
+                        self.presign_cache.key(
+                            object_bucket, object_name, expires, headers
+                        ),
+                        url,
+                        expires_at,
+                    )
+            urls.update(signed)
+        return urls
 
-        if expires and isinstance(expires, int):
-            expirestd = timedelta(seconds=expires)
-
-        params = {"expires": expirestd}
-        if headers is not None:
-            params["response_headers"] = headers
-
-        presignUrl = self.minio_client.get_presigned_url(
-            "GET", object_bucket, object_name, **params
-        )
+    def copy_object(self, src_path, dest_path, bucket_name=None, src_bucket_name=None):
+        """copies an object within object storage, the data isn't downloaded
 
-        return presignUrl
+        :param src_path: the object to copy
+        :type src_path: str
+        :param dest_path: the name of the copy
+        :type dest_path: str
+        :param bucket_name: the bucket the copy is written to
+        :type bucket_name: str
+        :param src_bucket_name: the bucket of the object to copy, defaults to
+            bucket_name
+        :type src_bucket_name: str
+        :return: the result of the copy
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        if not bucket_name:
+            bucket_name = self.obj_store_bucket
+        if not src_bucket_name:
+            src_bucket_name = bucket_name
+        try:
+            with self._instrument("copy_object", bucket_name, dest_path):
+                ret_val = self.backend.copy_object(
+                    bucket_name, dest_path, src_bucket_name, src_path
+                )
+        finally:
+            self._invalidate_stat(bucket_name, [dest_path])
+        LOGGER.debug(f"copied {src_path} to {dest_path}")
+        return ret_val
 
     def delete_remote_file(self, dest_file, obj_store_bucket=None):
         """deletes a remote file
@@ -379,16 +1573,341 @@ class ObjectStoreUtil:
         """
         if not obj_store_bucket:
             obj_store_bucket = self.obj_store_bucket
-        remove = self.minio_client.remove_object(obj_store_bucket, dest_file)
-        LOGGER.debug(f"result of remove on {dest_file}: {remove}")
+        try:
+            with self._instrument("delete_object", obj_store_bucket, dest_file):
+                self.backend.delete_object(obj_store_bucket, dest_file)
+        finally:
+            self._invalidate_stat(obj_store_bucket, [dest_file])
+        LOGGER.debug(f"removed {dest_file}")
+
+    def delete_directory(
+        self, ostore_dir, obj_store_bucket=None, batch_size=1000, workers=None
+    ):
+        """deletes all the objects inside the directory.
+
+        The listing of the directory is streamed into multi object delete
+        requests of up to `batch_size` keys, so the full list of names is
+        never built and each request removes many objects.
+
+        :param ostore_dir: the directory / prefix in object storage to delete
+        :type ostore_dir: str
+        :param obj_store_bucket: the bucket to delete from, defaults to the
+            bucket that is identified in the environment variable
+            OBJ_STORE_BUCKET
+        :type obj_store_bucket: str
+        :param batch_size: the number of keys in each delete request, object
+            storage accepts a maximum of 1000
+        :type batch_size: int
+        :param workers: number of delete requests to run concurrently,
+            defaults to None which sends one request at a time
+        :type workers: int
+        :return: the number of objects deleted and any per key errors, when a
+            whole request fails each of its keys has an error
+        :rtype: DeleteResult
+        """
+        if not obj_store_bucket:
+            obj_store_bucket = self.obj_store_bucket
+        batch_size = min(max(batch_size, 1), 1000)
+        obj_names = self.list_objects(
+            objstore_dir=ostore_dir,
+            return_file_names_only=True,
+            bucket_name=obj_store_bucket,
+            iterator=True,
+        )
+        batches = ((batch,) for batch in _iter_batches(obj_names, batch_size))
+        delete_batch = functools.partial(self._try_delete_batch, obj_store_bucket)
+
+        result = DeleteResult()
+        if not workers or workers <= 1:
+            for (batch,) in batches:
+                result.add(batch, delete_batch(batch))
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for (batch,), future in _iter_bounded(
+                    executor, delete_batch, batches, workers * 2
+                ):
+                    result.add(batch, future.result())
+        LOGGER.debug(f"delete of {ostore_dir}: {result}")
+        return result
+
+    def _try_delete_batch(self, obj_store_bucket, obj_names):
+        """sends a single multi object delete request, a failure of the
+        request itself (eg a connection error) is returned as an error for
+        each of the keys so the other requests of a bulk delete are still
+        counted
+
+        :return: list of minio DeleteError's for the keys that could not be
+            deleted
+        """
+        try:
+            return self._delete_batch(obj_store_bucket, obj_names)
+        except Exception as exc:
+            from minio.deleteobjects import DeleteError
+
+            LOGGER.error(f"delete request for {len(obj_names)} objects failed: {exc}")
+            code = getattr(exc, "code", None) or type(exc).__name__
+            return [DeleteError(code, str(exc), name, None) for name in obj_names]
+
+    def _delete_batch(self, obj_store_bucket, obj_names):
+        """sends a single multi object delete request
+
+        :return: list of minio DeleteError's for the keys that could not be
+            deleted
+        """
+        try:
+            with self._instrument("delete_objects", obj_store_bucket):
+                return self.backend.delete_objects(obj_store_bucket, obj_names)
+        finally:
+            self._invalidate_stat(obj_store_bucket, obj_names)
 
-    def delete_directory(self, ostore_dir, obj_store_bucket=None):
-        """deletes all the objects inside the directory"""
-        obj_list = self.list_objects(
-            objstore_dir=ostore_dir, return_file_names_only=True
+
+class DeleteResult:
+    """summary of a bulk delete
+
+    deleted - the number of objects that were deleted
+    errors  - list of minio DeleteError's for the objects that could not be
+              deleted, each with the name, code and message of the error
+    """
+
+    def __init__(self):
+        self.deleted = 0
+        self.errors = []
+
+    def add(self, obj_names, errors):
+        """records the outcome of a delete request for obj_names"""
+        for error in errors:
+            LOGGER.error(f"failed to delete {error.name}: {error.code} {error.message}")
+        self.deleted += len(obj_names) - len(errors)
+        self.errors.extend(errors)
+
+    @property
+    def success(self):
+        """True if all the objects were deleted"""
+        return not self.errors
+
+    def __repr__(self):
+        return f"DeleteResult(deleted={self.deleted}, errors={len(self.errors)})"
+
+
+class SyncResult:
+    """summary of the outcome of a directory sync.  The add_* methods are
+    thread safe so a single result can be shared by concurrent uploads.
+
+    uploaded   - list of (local file, object store path) that were uploaded
+    downloaded - list of (local file, object store path) that were downloaded
+    skipped    - list of (local file, object store path) that already existed
+    deleted    - list of local files that were removed after the sync
+    removed    - list of the orphaned objects that were removed by a mirror
+                 sync, see ObjectStoreDirectorySync.execute_plan
+    failed     - dict of local file -> exception raised while syncing it
+    delete_errors - list of minio DeleteError's for the orphaned objects that
+                 could not be removed
+    """
+
+    def __init__(self):
+        self.uploaded = []
+        self.downloaded = []
+        self.skipped = []
+        self.deleted = []
+        self.removed = []
+        self.failed = {}
+        self.delete_errors = []
+        self._lock = threading.Lock()
+
+    def add_uploaded(self, local_file, obj_store_path):
+        with self._lock:
+            self.uploaded.append((local_file, obj_store_path))
+
+    def add_downloaded(self, local_file, obj_store_path):
+        with self._lock:
+            self.downloaded.append((local_file, obj_store_path))
+
+    def add_skipped(self, local_file, obj_store_path):
+        with self._lock:
+            self.skipped.append((local_file, obj_store_path))
+
+    def add_deleted(self, local_file):
+        with self._lock:
+            self.deleted.append(local_file)
+
+    def add_failed(self, local_file, exc):
+        with self._lock:
+            self.failed[local_file] = exc
+
+    def add_removed(self, obj_names, errors):
+        """records the outcome of a delete request for the orphaned objects
+        obj_names
+        """
+        for error in errors:
+            LOGGER.error(f"failed to delete {error.name}: {error.code} {error.message}")
+        failed = {error.name for error in errors}
+        with self._lock:
+            self.removed.extend(name for name in obj_names if name not in failed)
+            self.delete_errors.extend(errors)
+
+    @property
+    def success(self):
+        """True if none of the files failed to sync"""
+        return not (self.failed or self.delete_errors)
+
+    def __repr__(self):
+        return (
+            f"SyncResult(uploaded={len(self.uploaded)}, "
+            + f"downloaded={len(self.downloaded)}, "
+            + f"skipped={len(self.skipped)}, deleted={len(self.deleted)}, "
+            + f"removed={len(self.removed)}, failed={len(self.failed)})"
+        )
+
+
+class SyncPlan:
+    """what a sync of a local directory to object storage would do, produced
+    by ObjectStoreDirectorySync.plan_ostore_dir.  Nothing is changed until the
+    plan is passed to execute_plan.
+
+    uploads    - list of (local file, object store path, os.stat_result) for
+                 the files that don't exist in object storage
+    overwrites - list of (local file, object store path, os.stat_result) for
+                 the files that differ from their object
+    skips      - list of (local file, object store path, os.stat_result) for
+                 the files that are already in object storage
+    orphans    - list of RemoteObject's under dest_dir that no local file maps
+                 to, only removed when the plan is executed with mirror set
+    """
+
+    def __init__(self, src_dir, dest_dir, obj_store_bucket, compare):
+        self.src_dir = src_dir
+        self.dest_dir = dest_dir
+        self.obj_store_bucket = obj_store_bucket
+        self.compare = compare
+        self.uploads = []
+        self.overwrites = []
+        self.skips = []
+        self.orphans = []
+
+    def add(self, status, local_file, obj_store_path, local_stat):
+        """records what is done with a file, status is one of the PLAN_*
+        constants
+        """
+        getattr(self, status).append((local_file, obj_store_path, local_stat))
+
+    @property
+    def upload_bytes(self):
+        """the number of bytes in the files that will be uploaded as new
+        objects
+        """
+        return sum(local_stat.st_size for _, _, local_stat in self.uploads)
+
+    @property
+    def overwrite_bytes(self):
+        """the number of bytes in the files that will replace an object"""
+        return sum(local_stat.st_size for _, _, local_stat in self.overwrites)
+
+    @property
+    def skip_bytes(self):
+        """the number of bytes in the files that don't need to be transferred"""
+        return sum(local_stat.st_size for _, _, local_stat in self.skips)
+
+    @property
+    def orphan_bytes(self):
+        """the number of bytes in the orphaned objects"""
+        return sum(remote.size or 0 for remote in self.orphans)
+
+    @property
+    def transfer_bytes(self):
+        """the total number of bytes that executing the plan uploads"""
+        return self.upload_bytes + self.overwrite_bytes
+
+    def summary(self):
+        """returns a dict of the number of files / objects and bytes in each
+        part of the plan
+        """
+        return {
+            PLAN_UPLOAD: len(self.uploads),
+            "upload_bytes": self.upload_bytes,
+            PLAN_OVERWRITE: len(self.overwrites),
+            "overwrite_bytes": self.overwrite_bytes,
+            PLAN_SKIP: len(self.skips),
+            "skip_bytes": self.skip_bytes,
+            "orphans": len(self.orphans),
+            "orphan_bytes": self.orphan_bytes,
+        }
+
+    def __repr__(self):
+        return (
+            f"SyncPlan(uploads={len(self.uploads)}, "
+            + f"overwrites={len(self.overwrites)}, skips={len(self.skips)}, "
+            + f"orphans={len(self.orphans)}, "
+            + f"transfer_bytes={self.transfer_bytes})"
+        )
+
+
+class VerifyReport:
+    """report produced by ObjectStoreDirectorySync.verify_tree
+
+    matching   - list of (local file, object store path) that are the same
+    mismatched - list of (local file, object store path) that differ
+    missing    - list of (local file, object store path) where the object
+                 doesn't exist
+    errors     - dict of local file -> exception raised while verifying it
+    """
+
+    def __init__(self):
+        self.matching = []
+        self.mismatched = []
+        self.missing = []
+        self.errors = {}
+
+    def add(self, status, local_file, obj_store_path):
+        """records the status (one of the VERIFY_* constants) of a file"""
+        getattr(self, status).append((local_file, obj_store_path))
+
+    @property
+    def success(self):
+        """True if every local file matches its object"""
+        return not (self.mismatched or self.missing or self.errors)
+
+    def __repr__(self):
+        return (
+            f"VerifyReport(matching={len(self.matching)}, "
+            + f"mismatched={len(self.mismatched)}, missing={len(self.missing)}, "
+            + f"errors={len(self.errors)})"
+        )
+
+
+class AclReport:
+    """report produced by ObjectStoreUtil.audit_public_permissions
+
+    public       - list of the objects anyone can read
+    private      - list of the objects without any public grant
+    inconsistent - list of the objects with public grants other than a
+                   single READ
+    errors       - dict of object name -> exception raised reading its ACL
+    """
+
+    def __init__(self):
+        self.public = []
+        self.private = []
+        self.inconsistent = []
+        self.errors = {}
+
+    def add(self, status, object_name):
+        """records the status (one of the ACL_* constants) of an object"""
+        getattr(self, status).append(object_name)
+
+    def summary(self):
+        """returns a dict of status -> number of objects"""
+        return {
+            ACL_PUBLIC: len(self.public),
+            ACL_PRIVATE: len(self.private),
+            ACL_INCONSISTENT: len(self.inconsistent),
+            "errors": len(self.errors),
+        }
+
+    def __repr__(self):
+        return (
+            f"AclReport(public={len(self.public)}, private={len(self.private)}, "
+            + f"inconsistent={len(self.inconsistent)}, errors={len(self.errors)})"
         )
-        for obj_name in obj_list:
-            self.delete_remote_file(dest_file=obj_name)
 
 
 class ObjectStoreDirectorySync(ObjectStoreUtil):
@@ -400,67 +1919,133 @@ class ObjectStoreDirectorySync(ObjectStoreUtil):
         obj_store_user=None,
         obj_store_secret=None,
         obj_store_bucket=None,
+        manifest_path=None,
+        reconcile_after=None,
+        hash_cache_path=None,
+        pool_config=None,
+        list_workers=None,
+        backend=None,
     ):
+        """
+        :param src_dir: the local directory that is to be synced
+        :param dest_dir: the directory in object storage that src_dir is
+            synced to
+        :param manifest_path: optional path to a sqlite manifest file (see
+            SyncManifest) that records the objects that have been uploaded.
+            When provided the list of objects that already exist in object
+            storage is read from the manifest instead of listing dest_dir,
+            the listing is only done the first time the manifest is used, when
+            it is older than `reconcile_after` or when `reconcile_manifest` is
+            called.
+        :type manifest_path: str
+        :param reconcile_after: the age (seconds or timedelta) after which the
+            manifest is reconciled against a listing of object storage.  If
+            None the manifest is trusted until reconcile_manifest is called.
+        :param hash_cache_path: optional path to a HashCache database.  When
+            provided the md5 / etags calculated for local files are cached so
+            unchanged files don't need to be read again to be compared.
+        :type hash_cache_path: str
+        :param pool_config: the http connection pool settings, see
+            ObjectStoreUtil
+        :param list_workers: if greater than 1 dest_dir is listed as shards
+            that are listed concurrently by this many threads, see
+            iter_objects_sharded
+        :type list_workers: int
+        :param backend: the storage backend, see ObjectStoreUtil
+        :type backend: backends.StorageBackend
+        """
         ObjectStoreUtil.__init__(
             self,
             obj_store_host=obj_store_host,
             obj_store_user=obj_store_user,
             obj_store_secret=obj_store_secret,
             obj_store_bucket=obj_store_bucket,
+            pool_config=pool_config,
+            backend=backend,
         )
 
         self.src_dir = src_dir
         self.dest_dir = dest_dir
-        self.obj_store_host = obj_store_host
-        self.obj_store_user = obj_store_user
-        self.obj_store_secret = obj_store_secret
-        self.obj_store_bucket = obj_store_bucket
 
-        if self.obj_store_host is None:
-            self.obj_store_host = constants.OBJ_STORE_HOST
-        if self.obj_store_user is None:
-            self.obj_store_user = constants.OBJ_STORE_USER
-        if self.obj_store_secret is None:
-            self.obj_store_secret = constants.OBJ_STORE_SECRET
-        if self.obj_store_bucket is None:
-            self.obj_store_bucket = constants.OBJ_STORE_BUCKET
+        self._cache_lock = threading.Lock()
+        self.manifest = None
+        if manifest_path is not None:
+            self.manifest = sync_manifest.SyncManifest(manifest_path)
+        self.reconcile_after = reconcile_after
+        self.list_workers = list_workers
+        self.hash_cache = None
+        if hash_cache_path is not None:
+            self.hash_cache = hash_cache.HashCache(hash_cache_path)
 
         # figure out what has already been copied
         self.ostore_cache = None
         self._calc_cache()
         self.ostore_paths = ObjectStoragePathLib(
-            obj_store_host=obj_store_host,
-            obj_store_user=obj_store_user,
-            obj_store_secret=obj_store_secret,
-            obj_store_bucket=obj_store_bucket,
+            obj_store_host=self.obj_store_host,
+            obj_store_user=self.obj_store_user,
+            obj_store_secret=self.obj_store_secret,
+            obj_store_bucket=self.obj_store_bucket,
         )
 
-    def _calc_cache(self):
-        """creates an in memory data struct that makes it easy to determine
-        if a destination file already exists or not
+    def _calc_cache(self, reconcile=False):
+        """creates an in memory index (RemoteIndex) of the objects under
+        dest_dir that makes it easy to determine if a destination file already
+        exists or not, and what its size / etag are.
+
+        If a manifest is being used the index is built from it, unless
+        `reconcile` is set or the manifest is due to be reconciled, in which
+        case object storage is listed and the manifest is updated.
+
+        :param reconcile: force a listing of object storage
+        :type reconcile: bool
         """
+        if self.manifest is not None and not (
+            reconcile
+            or self.manifest.needs_reconcile(
+                self.obj_store_bucket, self.dest_dir, self.reconcile_after
+            )
+        ):
+            LOGGER.info(f"reading objects from manifest: {self.manifest.manifest_path}")
+            self.ostore_cache = self.manifest.to_remote_index(
+                self.obj_store_bucket, self.dest_dir
+            )
+            LOGGER.info(f"indexed {len(self.ostore_cache)} objects")
+            return
+
         LOGGER.info("retrieving a list of objects in object storage...")
         remote_dir_file_list = self.list_objects(
-            objstore_dir=self.dest_dir, recursive=True, return_file_names_only=False
+            objstore_dir=self.dest_dir,
+            recursive=True,
+            return_file_names_only=False,
+            workers=self.list_workers,
         )
 
         # creating in memory lookup struct that will be used to determine what
         # objects exist in ostore and which ones do not.
-        ostore_objs_struct = []
         LOGGER.info("indexing the list of objects for faster lookup...")
-        for ostore_obj in remote_dir_file_list:
-            # file_path, file_name = os.path.split(ostore_obj.object_name)
-            # if file_path not in ostore_objs_struct:
-            # ostore_objs_struct[file_path] = []
-            # ostore_objs_struct[file_path].append(file_name)
-            ostore_objs_struct.append(ostore_obj.object_name)
-        self.ostore_cache = tuple(ostore_objs_struct)
+        self.ostore_cache = remote_index.RemoteIndex(remote_dir_file_list)
+        LOGGER.info(f"indexed {len(self.ostore_cache)} objects")
+        if self.manifest is not None:
+            self.manifest.reconcile(
+                self.obj_store_bucket, self.dest_dir, self.ostore_cache
+            )
+
+    def reconcile_manifest(self):
+        """lists the dest_dir in object storage and updates the manifest and
+        the in memory index to reflect what actually exists there.
+        """
+        if self.manifest is None:
+            raise ValueError("reconcile_manifest requires a manifest_path")
+        self._calc_cache(reconcile=True)
 
     def _exists(self, dest_file):
-        objDoesExist = False
-        if dest_file in self.ostore_cache:
-            objDoesExist = True
-        return objDoesExist
+        return dest_file in self.ostore_cache
+
+    def _is_cached_bucket(self, obj_store_bucket):
+        """True if the ostore_cache index describes obj_store_bucket, the index
+        is only ever built for the sync's own bucket
+        """
+        return obj_store_bucket is None or obj_store_bucket == self.obj_store_bucket
 
     # def update_ostore_dir(
     #     self, src_dir: str, dest_dir: str, obj_store_bucket: str = None
@@ -487,23 +2072,40 @@ class ObjectStoreDirectorySync(ObjectStoreUtil):
         delete=False,
         public=False,
         obj_store_bucket: str = None,
+        workers: int = None,
+        max_in_flight: int = None,
+        compare: str = COMPARE_EXISTS,
+        include=None,
+        exclude=None,
+        symlinks: str = walker.SYMLINKS_FOLLOW,
+        hidden: bool = False,
+        mirror: bool = False,
     ):
         """Recursive copy of directory contents to object store.
 
         Iterates over all the files and directoris in the 'src_dir' parameter,
-        when the iteration finds a directory it calls itself with that
-        directory
+        descending into any sub directories that are found.  The files are
+        streamed to the uploads as the directories are read, see
+        walker.walk_files.
 
-        does a file list of the dest_dir in object store... only copies files
-        if the equivalent destination file does not already exist in object
-        storage.
+        does a file list of the dest_dir in object store... by default only
+        copies files if the equivalent destination file does not already exist
+        in object storage.  The `compare` parameter can be used to also copy
+        files that exist but have changed, the comparison uses the object
+        metadata returned by the listing so no extra requests are made.
+
+        If `workers` is greater than 1 the uploads are run concurrently by a
+        pool of that many threads.  In this mode a failure to upload a single
+        file does not stop the sync, instead the error is recorded in the
+        `failed` property of the returned SyncResult.
 
         :param src_dir: input directory that is to be copied
         :type src_dir: str
         :param dest_dir: destination directory that is to be copied
         :type dest_dir: str
         :param delete: after file has been copied whether to delete the local
-            version or not
+            version or not.  Local files are only deleted once they have been
+            successfully uploaded (or already exist in object storage)
         :type delete: bool
         :param public: whether to make the destination file a public object or
            not.  If set to true the url path to the object will be public/read
@@ -514,65 +2116,773 @@ class ObjectStoreDirectorySync(ObjectStoreUtil):
             parameter the bucket needs to accessible by the same credentials
             used to setup the minio/boto3 client
         :param obj_store_bucket: str
+        :param workers: number of concurrent upload threads.  Defaults to None
+            which uploads the files one at a time, raising the first error
+            that is encountered.
+        :type workers: int
+        :param max_in_flight: the maximum number of uploads that can be
+            queued or running at any one time, the directory walk pauses when
+            this number is reached.  Defaults to twice the number of workers.
+        :type max_in_flight: int
+        :param compare: how to decide if an existing object is the same as the
+            local file, one of COMPARE_MODES:
+            "exists" (default) - any existing object is assumed to be the same
+            "size" - the object is the same if it's size matches the file
+            "size_mtime" - the sizes match and the file has not been modified
+            since the object was written
+            "etag" - the sizes match and the md5 / multipart etag of the file
+            matches the object's etag.  Requires reading the local file.
+        :type compare: str
+        :param include: fnmatch pattern(s) of the files to sync, eg "*.nc" or
+            "data/*.nc", see walker.walk_files.  Defaults to all files
+        :type include: str, list
+        :param exclude: fnmatch pattern(s) of the files and directories to
+            leave out
+        :type exclude: str, list
+        :param symlinks: what to do with symbolic links, one of
+            walker.SYMLINK_POLICIES.  By default links are followed
+        :type symlinks: str
+        :param hidden: sync the files and directories whose name starts with
+            a ., by default they are left out
+        :type hidden: bool
+        :param mirror: also remove the objects under dest_dir that no local
+            file maps to, see execute_plan.  The whole directory is planned
+            (see plan_ostore_dir) before anything is uploaded.
+        :type mirror: bool
+        :return: a summary of the files that were uploaded, skipped, deleted
+            or that failed
+        :rtype: SyncResult
+        """
+        if src_dir is None:
+            src_dir = self.src_dir
+        if dest_dir is None:
+            dest_dir = self.dest_dir
+        if obj_store_bucket is None:
+            obj_store_bucket = self.obj_store_bucket
+        if compare not in COMPARE_MODES:
+            msg = f"compare must be one of {COMPARE_MODES}, got: {compare}"
+            raise ValueError(msg)
+
+        if mirror:
+            plan = self.plan_ostore_dir(
+                src_dir=src_dir,
+                dest_dir=dest_dir,
+                obj_store_bucket=obj_store_bucket,
+                compare=compare,
+                include=include,
+                exclude=exclude,
+                symlinks=symlinks,
+                hidden=hidden,
+            )
+            return self.execute_plan(
+                plan,
+                delete=delete,
+                public=public,
+                mirror=mirror,
+                workers=workers,
+                max_in_flight=max_in_flight,
+            )
+
+        # stream the walk straight into the uploads
+        result = SyncResult()
+        try:
+            self._run_sync(
+                sync_func=self._sync_file,
+                sync_files=self._iter_sync_files(
+                    src_dir=src_dir,
+                    dest_dir=dest_dir,
+                    include=include,
+                    exclude=exclude,
+                    symlinks=symlinks,
+                    hidden=hidden,
+                ),
+                result=result,
+                workers=workers,
+                max_in_flight=max_in_flight,
+                delete=delete,
+                public=public,
+                obj_store_bucket=obj_store_bucket,
+                compare=compare,
+            )
+        finally:
+            self._flush_caches()
+        return result
+
+    def plan_ostore_dir(
+        self,
+        src_dir=None,
+        dest_dir=None,
+        obj_store_bucket: str = None,
+        compare: str = COMPARE_EXISTS,
+        include=None,
+        exclude=None,
+        symlinks: str = walker.SYMLINKS_FOLLOW,
+        hidden: bool = False,
+    ):
+        """works out what update_ostore_dir would do, without changing
+        anything.  The walk of src_dir is compared with the index of dest_dir
+        (see _calc_cache) to sort the files into uploads, overwrites and
+        skips, then the objects under dest_dir that no file maps to are
+        collected as orphans.  Objects that the include / exclude / hidden
+        arguments leave out of the sync are never orphans.
+
+        Only the "etag" compare mode reads the local files, the others use
+        the stat from the walk and the object metadata in the index.
+
+        :param src_dir: the local directory, defaults to the sync's src_dir
+        :param dest_dir: the object storage directory, defaults to the sync's
+            dest_dir
+        :param obj_store_bucket: the destination bucket, defaults to the
+            sync's bucket
+        :param compare: see update_ostore_dir
+        :param include: see update_ostore_dir
+        :param exclude: see update_ostore_dir
+        :param symlinks: see update_ostore_dir
+        :param hidden: see update_ostore_dir
+        :return: the plan, pass it to execute_plan to carry it out
+        :rtype: SyncPlan
         """
         if src_dir is None:
             src_dir = self.src_dir
         if dest_dir is None:
             dest_dir = self.dest_dir
-        for local_file in glob.glob(src_dir + "/**"):
-            LOGGER.debug(f"local_file: {local_file}")
-            obj_store_path = self.ostore_paths.get_obj_store_path(
-                src_path=local_file,
-                ostore_path=self.dest_dir,
-                src_root_dir=self.src_dir,
-                prepend_bucket=False,
-            )
-            LOGGER.debug(f"objStorePath: {obj_store_path}")
-            if not os.path.isfile(local_file):
-                self.update_ostore_dir(
-                    src_dir=local_file,
-                    dest_dir=obj_store_path,
-                    delete=delete,
-                    public=public,
-                    obj_store_bucket=obj_store_bucket,
+        if obj_store_bucket is None:
+            obj_store_bucket = self.obj_store_bucket
+        if compare not in COMPARE_MODES:
+            msg = f"compare must be one of {COMPARE_MODES}, got: {compare}"
+            raise ValueError(msg)
+
+        plan = SyncPlan(src_dir, dest_dir, obj_store_bucket, compare)
+        planned = set()
+        try:
+            for local_file, obj_store_path, local_stat in self._iter_sync_files(
+                src_dir=src_dir,
+                dest_dir=dest_dir,
+                include=include,
+                exclude=exclude,
+                symlinks=symlinks,
+                hidden=hidden,
+            ):
+                planned.add(obj_store_path)
+                with self._cache_lock:
+                    exists = obj_store_path in self.ostore_cache
+                if not exists:
+                    status = PLAN_UPLOAD
+                elif self._is_changed(local_file, obj_store_path, local_stat, compare):
+                    status = PLAN_OVERWRITE
+                else:
+                    status = PLAN_SKIP
+                plan.add(status, local_file, obj_store_path, local_stat)
+        finally:
+            self._flush_caches()
+
+        if not self._is_cached_bucket(obj_store_bucket):
+            # the index is of the sync's bucket, it says nothing about which
+            # objects are orphaned in another one
+            LOGGER.warning(f"orphans are only planned for {self.obj_store_bucket}")
+            LOGGER.info(f"plan {src_dir} -> {dest_dir}: {plan}")
+            return plan
+        is_walked = walker.path_filter(include=include, exclude=exclude, hidden=hidden)
+        prefix = dest_dir.strip(posixpath.sep)
+        prefix = prefix + posixpath.sep if prefix else prefix
+        prefix_len = len(prefix)
+        with self._cache_lock:
+            remotes = list(self.ostore_cache.iter_prefix(prefix))
+        for remote in remotes:
+            if remote.key in planned or remote.key.endswith(posixpath.sep):
+                continue
+            if is_walked(remote.key[prefix_len:]):
+                plan.orphans.append(remote)
+        LOGGER.info(f"plan {src_dir} -> {dest_dir}: {plan}")
+        return plan
+
+    def execute_plan(
+        self,
+        plan,
+        delete=False,
+        public=False,
+        mirror=False,
+        workers: int = None,
+        max_in_flight: int = None,
+        batch_size: int = 1000,
+    ):
+        """carries out a plan from plan_ostore_dir: uploads the new and
+        changed files and, if `mirror` is set, removes the orphaned objects
+        with multi object delete requests.  The plan is not checked against
+        object storage again, anything that changed since it was made is
+        left to the next sync.
+
+        :param plan: the plan to carry out
+        :type plan: SyncPlan
+        :param delete: see update_ostore_dir
+        :param public: see update_ostore_dir
+        :param mirror: remove the plan's orphans from object storage
+        :type mirror: bool
+        :param workers: number of concurrent upload / delete threads, see
+            update_ostore_dir
+        :type workers: int
+        :param max_in_flight: see update_ostore_dir
+        :type max_in_flight: int
+        :param batch_size: the number of keys in each delete request, see
+            delete_directory
+        :type batch_size: int
+        :return: a summary of the files that were uploaded, skipped, deleted,
+            removed or that failed
+        :rtype: SyncResult
+        """
+        result = SyncResult()
+        try:
+            self._run_sync(
+                sync_func=self._sync_planned_file,
+                sync_files=self._iter_plan_files(plan),
+                result=result,
+                workers=workers,
+                max_in_flight=max_in_flight,
+                delete=delete,
+                public=public,
+                obj_store_bucket=plan.obj_store_bucket,
+            )
+            if mirror and plan.orphans:
+                self._remove_orphans(plan, result, batch_size, workers)
+        finally:
+            self._flush_caches()
+        LOGGER.info(f"executed {plan}: {result}")
+        return result
+
+    @staticmethod
+    def _iter_plan_files(plan):
+        """yields a tuple of (local file path, object store path,
+        os.stat_result, upload) for every file in the plan
+        """
+        for status, upload in (
+            (PLAN_UPLOAD, True),
+            (PLAN_OVERWRITE, True),
+            (PLAN_SKIP, False),
+        ):
+            for local_file, obj_store_path, local_stat in getattr(plan, status):
+                yield local_file, obj_store_path, local_stat, upload
+
+    def _remove_orphans(self, plan, result, batch_size=1000, workers=None):
+        """deletes the plan's orphaned objects in batches, removing them from
+        the index and the manifest
+        """
+        obj_store_bucket = plan.obj_store_bucket
+        batch_size = min(max(batch_size, 1), 1000)
+        batches = (
+            (batch,)
+            for batch in _iter_batches(
+                (remote.key for remote in plan.orphans), batch_size
+            )
+        )
+        delete_batch = functools.partial(self._try_delete_batch, obj_store_bucket)
+
+        def record_batch(batch, errors):
+            result.add_removed(batch, errors)
+            failed = {error.name for error in errors}
+            for obj_name in batch:
+                if obj_name in failed:
+                    continue
+                with self._cache_lock:
+                    self.ostore_cache.discard(obj_name)
+                if self.manifest is not None:
+                    self.manifest.remove(obj_store_bucket, obj_name)
+
+        if not workers or workers <= 1:
+            for (batch,) in batches:
+                record_batch(batch, delete_batch(batch))
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for (batch,), future in _iter_bounded(
+                    executor, delete_batch, batches, workers * 2
+                ):
+                    record_batch(batch, future.result())
+
+    def update_local_dir(
+        self,
+        src_dir=None,
+        dest_dir=None,
+        compare: str = COMPARE_SIZE,
+        workers: int = 4,
+        max_in_flight: int = None,
+        obj_store_bucket: str = None,
+    ):
+        """the reverse of update_ostore_dir, mirrors the objects in the
+        object storage directory `dest_dir` down to the local directory
+        `src_dir`.
+
+        The objects to download come from the sync's listing of dest_dir, or
+        from a listing of dest_dir in obj_store_bucket if that is another
+        bucket.  Local files that already match their object (see `compare`) are
+        skipped, the rest are downloaded concurrently.  Each object is written
+        to a temporary file in the destination directory which is renamed once
+        the download is complete, so a partially downloaded file never
+        replaces a local file.
+
+        :param src_dir: the local directory the objects are written to,
+            defaults to the sync's src_dir
+        :type src_dir: str
+        :param dest_dir: the object storage directory to download, defaults
+            to the sync's dest_dir
+        :type dest_dir: str
+        :param compare: how to decide if an existing local file is the same as
+            the object, one of COMPARE_MODES.  Defaults to "size".
+            "size_mtime" treats the local file as the same if the sizes match
+            and it was modified after the object.
+        :type compare: str
+        :param workers: number of concurrent download threads, if 1 or None
+            the objects are downloaded one at a time, raising the first
+            error that is encountered.
+        :type workers: int
+        :param max_in_flight: the maximum number of downloads that can be
+            queued or running at any one time, defaults to twice the number of
+            workers
+        :type max_in_flight: int
+        :param obj_store_bucket: the bucket to download from, defaults to the
+            sync's bucket.  Another bucket is listed for each call, its
+            listing isn't cached.
+        :type obj_store_bucket: str
+        :return: a summary of the files that were downloaded, skipped or that
+            failed
+        :rtype: SyncResult
+        """
+        if src_dir is None:
+            src_dir = self.src_dir
+        if dest_dir is None:
+            dest_dir = self.dest_dir
+        if obj_store_bucket is None:
+            obj_store_bucket = self.obj_store_bucket
+        if compare not in COMPARE_MODES:
+            msg = f"compare must be one of {COMPARE_MODES}, got: {compare}"
+            raise ValueError(msg)
+
+        if self._is_cached_bucket(obj_store_bucket):
+            index = self.ostore_cache
+        else:
+            # the cached listing is of the sync's bucket, so the keys, sizes
+            # and modified times have to come from the other bucket
+            LOGGER.info(f"retrieving a list of objects in {obj_store_bucket}...")
+            index = remote_index.RemoteIndex(
+                self.list_objects(
+                    objstore_dir=dest_dir,
+                    bucket_name=obj_store_bucket,
+                    recursive=True,
+                    return_file_names_only=False,
+                    workers=self.list_workers,
                 )
-            else:
-                # if the path is a file path check if it already exists in
-                # ostore and then copy
-                if not self._exists(obj_store_path):
-                    # TODO: call the inheriting class to do the copy
-                    LOGGER.debug(f"uploading: {local_file} to {obj_store_path}")
-                    self.put_object(
-                        ostore_path=obj_store_path, local_path=local_file, public=public
+            )
+
+        result = SyncResult()
+        try:
+            self._run_sync(
+                sync_func=self._fetch_file,
+                sync_files=self._iter_fetch_files(
+                    src_dir=src_dir, dest_dir=dest_dir, index=index
+                ),
+                result=result,
+                workers=workers,
+                max_in_flight=max_in_flight,
+                obj_store_bucket=obj_store_bucket,
+                compare=compare,
+                index=index,
+            )
+        finally:
+            self._flush_caches()
+        return result
+
+    def _iter_fetch_files(self, src_dir, dest_dir, index=None):
+        """yields a tuple of (local file path, object store path) for every
+        object in the listing that is under dest_dir
+
+        :param index: the RemoteIndex listing, defaults to the ostore_cache
+        """
+        if index is None:
+            index = self.ostore_cache
+        prefix = dest_dir.strip(posixpath.sep)
+        prefix = prefix + posixpath.sep if prefix else prefix
+        with self._cache_lock:
+            obj_names = [remote.key for remote in index.iter_prefix(prefix)]
+        for obj_store_path in obj_names:
+            if obj_store_path.endswith(posixpath.sep):
+                continue
+            try:
+                local_file = self.ostore_paths.get_local_path(
+                    ostore_path=obj_store_path,
+                    ostore_root_dir=dest_dir,
+                    local_root_dir=src_dir,
+                )
+            except ValueError:
+                # already logged, keys like a/../b can't be mirrored locally
+                continue
+            yield local_file, obj_store_path
+
+    def _fetch_file(
+        self,
+        local_file,
+        obj_store_path,
+        result,
+        obj_store_bucket=None,
+        compare=COMPARE_SIZE,
+        index=None,
+    ):
+        """downloads a single object if the local file doesn't exist or
+        differs from it, writing to a temporary file that is then renamed to
+        local_file.
+
+        :param local_file: the path the object is downloaded to
+        :param obj_store_path: the object to download
+        :param result: the SyncResult that the outcome is recorded in
+        :param obj_store_bucket: the bucket the object is in
+        :param compare: the comparison mode, one of COMPARE_MODES
+        :param index: the RemoteIndex listing of obj_store_bucket, defaults to
+            the ostore_cache
+        """
+        if index is None:
+            index = self.ostore_cache
+        try:
+            local_stat = os.stat(local_file)
+        except FileNotFoundError:
+            local_stat = None
+        if local_stat is not None and not self._is_changed(
+            local_file, obj_store_path, local_stat, compare, download=True, index=index
+        ):
+            result.add_skipped(local_file, obj_store_path)
+            return
+
+        LOGGER.debug(f"downloading: {obj_store_path} to {local_file}")
+        local_dir = os.path.dirname(local_file)
+        os.makedirs(local_dir, exist_ok=True)
+        tmp_fd, tmp_file = backends.make_temp_file(
+            local_dir, prefix="." + os.path.basename(local_file)
+        )
+        try:
+            with os.fdopen(tmp_fd, "wb") as fh:
+                for chunk in self.backend.iter_object(obj_store_bucket, obj_store_path):
+                    fh.write(chunk)
+            with self._cache_lock:
+                remote = index.get(obj_store_path)
+            if remote is not None and remote.last_modified is not None:
+                mtime = remote.last_modified.timestamp()
+                os.utime(tmp_file, (mtime, mtime))
+            os.replace(tmp_file, local_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        result.add_downloaded(local_file, obj_store_path)
+
+    def _flush_caches(self):
+        """writes any pending manifest / hash cache records to disk"""
+        if self.manifest is not None:
+            self.manifest.flush()
+        if self.hash_cache is not None:
+            self.hash_cache.flush()
+
+    def _run_sync(
+        self, sync_func, sync_files, result, workers, max_in_flight, **sync_kwargs
+    ):
+        """runs sync_func for each tuple of positional args, starting with
+        (local file, object store path), in sync_files, either inline or on a
+        pool of `workers` threads.
+
+        :param sync_func: the method that syncs a single file, _sync_file or
+            _fetch_file
+        :param sync_kwargs: the remaining keyword args for sync_func
+        """
+        if not workers or workers <= 1:
+            for sync_args in sync_files:
+                sync_func(*sync_args, result=result, **sync_kwargs)
+            return
+
+        if max_in_flight is None:
+            max_in_flight = workers * 2
+        sync_file = functools.partial(sync_func, result=result, **sync_kwargs)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for sync_args, future in _iter_bounded(
+                executor, sync_file, sync_files, max_in_flight
+            ):
+                exc = future.exception()
+                if exc is not None:
+                    LOGGER.error(f"failed to sync {sync_args[0]}: {exc}")
+                    result.add_failed(sync_args[0], exc)
+
+    def _iter_sync_files(
+        self,
+        src_dir,
+        dest_dir,
+        include=None,
+        exclude=None,
+        symlinks=walker.SYMLINKS_FOLLOW,
+        hidden=False,
+    ):
+        """walks the source directory yielding a tuple of (local file path,
+        object store path, os.stat_result) for every file that is found
+
+        :param src_dir: the local directory that is being synced
+        :param dest_dir: the object store directory that the src_dir maps to
+        :param include: see walker.walk_files
+        :param exclude: see walker.walk_files
+        :param symlinks: see walker.walk_files
+        :param hidden: see walker.walk_files
+        """
+        # the walk only yields files, so nothing needs to be checked for
+        # being a directory
+        map_path = self.ostore_paths.mapper(src_dir, dest_dir, prepend_bucket=False).map
+        for local_file, local_stat in walker.walk_files(
+            src_dir, include=include, exclude=exclude, symlinks=symlinks, hidden=hidden
+        ):
+            obj_store_path = map_path(local_file)
+            LOGGER.debug(f"local_file: {local_file}, objStorePath: {obj_store_path}")
+            yield local_file, obj_store_path, local_stat
+
+    def _sync_file(
+        self,
+        local_file,
+        obj_store_path,
+        local_stat,
+        result,
+        delete=False,
+        public=False,
+        obj_store_bucket=None,
+        compare=COMPARE_EXISTS,
+    ):
+        """uploads a single file if it doesn't already exist in object storage
+        (or has changed, see `compare`) and optionally deletes the local
+        version once it is safely stored.
+
+        :param local_file: path to the local file
+        :param obj_store_path: the destination path in object storage
+        :param local_stat: the os.stat_result of the local file, from the walk
+        :param result: the SyncResult that the outcome is recorded in
+        :param delete: whether to remove the local file once it is in object
+            storage
+        :param public: whether the uploaded object should be public
+        :param obj_store_bucket: the destination bucket
+        :param compare: the comparison mode, one of COMPARE_MODES
+        """
+        self._sync_planned_file(
+            local_file,
+            obj_store_path,
+            local_stat,
+            upload=self._is_changed(local_file, obj_store_path, local_stat, compare),
+            result=result,
+            delete=delete,
+            public=public,
+            obj_store_bucket=obj_store_bucket,
+        )
+
+    def _sync_planned_file(
+        self,
+        local_file,
+        obj_store_path,
+        local_stat,
+        upload,
+        result,
+        delete=False,
+        public=False,
+        obj_store_bucket=None,
+    ):
+        """uploads a single file, or records it as skipped, once it has been
+        decided whether it needs to be uploaded and optionally deletes the
+        local version.
+
+        :param upload: whether the file is uploaded
+        :type upload: bool
+        see _sync_file for the other parameters
+        """
+        if upload:
+            LOGGER.debug(f"uploading: {local_file} to {obj_store_path}")
+            ret_val = self.put_object(
+                ostore_path=obj_store_path,
+                local_path=local_file,
+                bucket_name=obj_store_bucket,
+                public=public,
+            )
+            if self._is_cached_bucket(obj_store_bucket):
+                with self._cache_lock:
+                    self.ostore_cache.add(
+                        key=obj_store_path,
+                        size=local_stat.st_size,
+                        etag=ret_val.etag,
+                        last_modified=time.time(),
                     )
-                if delete:
-                    LOGGER.debug(f"removing the local file: {local_file}")
-                    os.remove(local_file)
+            if self.manifest is not None:
+                self.manifest.record(
+                    bucket=obj_store_bucket,
+                    key=obj_store_path,
+                    size=local_stat.st_size,
+                    etag=ret_val.etag,
+                    local_mtime=local_stat.st_mtime,
+                )
+            result.add_uploaded(local_file, obj_store_path)
+        else:
+            result.add_skipped(local_file, obj_store_path)
+        if delete:
+            LOGGER.debug(f"removing the local file: {local_file}")
+            os.remove(local_file)
+            result.add_deleted(local_file)
+
+    def _is_changed(
+        self,
+        local_file,
+        obj_store_path,
+        local_stat,
+        compare,
+        download=False,
+        index=None,
+    ):
+        """identifies if the local file needs to be uploaded by comparing it to
+        the object's metadata in the ostore_cache, or in index.
+
+        :param local_file: path to the local file
+        :param obj_store_path: the destination path in object storage
+        :param local_stat: the os.stat_result for the local file
+        :param compare: the comparison mode, one of COMPARE_MODES
+        :param download: set when syncing from object storage, the mtime
+            comparison then checks if the object is newer than the file
+        :param index: the RemoteIndex to compare with, defaults to the
+            ostore_cache
+        :return: True if the object doesn't exist or differs from the file
+        """
+        if index is None:
+            index = self.ostore_cache
+        with self._cache_lock:
+            remote = index.get(obj_store_path)
+        if remote is None:
+            return True
+        if compare == COMPARE_EXISTS:
+            return False
+        if remote.size != local_stat.st_size:
+            LOGGER.debug(f"size of {local_file} differs from {obj_store_path}")
+            return True
+        if compare == COMPARE_SIZE_MTIME:
+            if remote.last_modified is None:
+                return True
+            # object storage only records last modified to the second
+            if download:
+                return remote.last_modified.timestamp() > local_stat.st_mtime
+            return int(local_stat.st_mtime) > remote.last_modified.timestamp()
+        if compare == COMPARE_ETAG:
+            return not remote.etag or not self._etag_matches(local_file, remote.etag)
+        return False
+
+    def _etag_matches(self, local_file, etag):
+        """checks if the etag from object storage was calculated from the
+        contents of the local file
+
+        :param local_file: path to the local file
+        :param etag: the etag from object storage, either an md5 or a
+            multipart etag
+        """
+        etag = etag.strip('"')
+        if len(etag.split("-")) == 2:
+            # etag format suggests the file was uploaded as a multipart
+            # which impacts how the etags are calculated
+            return self.check_multipart_etag(local_file, etag)
+        return CalcETags(hash_cache=self.hash_cache).calc_md5(local_file) == etag
 
     def _verify(self, local_file, dest_file):
         """identifis if the local file and the dest file are the same file by
         checking the md5 hash cached in object storage and the version that
         has been stored locally.
 
+        The etag of the object is taken from the cached listing, or from a
+        stat (HEAD) request if the object isn't in the cache.  The local file
+        is hashed as a stream so the file is never read into memory.
+
         :param local_file: file path to the local version of the file
         :param dest_file: file path to the equivalent file in object storage
         """
-        dest_obj_info = self.minio_client.get_object(self.obj_store_bucket, dest_file)
-        etagDest = dest_obj_info.etag
+        return self._verify_status(local_file, dest_file) == VERIFY_MATCHING
 
-        is_same = False
+    def _verify_status(self, local_file, dest_file, bucket_name=None):
+        """compares a local file with the equivalent object in object storage
 
-        md5Src = hashlib.md5(open(local_file, "rb").read()).hexdigest()
-        LOGGER.debug(f"etagDest: {etagDest}")
-        if etagDest == md5Src:
-            is_same = True
-        elif (len(etagDest.split("-")) == 2) and self.check_multipart_etag(
-            local_file, etagDest
-        ):
-            # etag format suggests the file was uploaded as a multipart
-            # which impacts how the etags are calculated
-            is_same = True
-        return is_same
+        :param local_file: file path to the local version of the file
+        :param dest_file: file path to the equivalent file in object storage
+        :param bucket_name: the bucket to check, defaults to the sync's bucket
+        :return: one of VERIFY_MATCHING, VERIFY_MISMATCHED or VERIFY_MISSING
+        """
+        remote = self._get_remote_meta(dest_file, bucket_name=bucket_name)
+        if remote is None:
+            return VERIFY_MISSING
+        LOGGER.debug(f"etagDest: {remote.etag}")
+        if remote.size is not None and remote.size != os.path.getsize(local_file):
+            return VERIFY_MISMATCHED
+        if remote.etag and self._etag_matches(local_file, remote.etag):
+            return VERIFY_MATCHING
+        return VERIFY_MISMATCHED
+
+    def _get_remote_meta(self, dest_file, bucket_name=None):
+        """returns a RemoteObject with the size and etag of an object, from
+        the cached listing if possible otherwise from a stat request.  Returns
+        None if the object doesn't exist.
+        """
+        if bucket_name is None or bucket_name == self.obj_store_bucket:
+            with self._cache_lock:
+                remote = self.ostore_cache.get(dest_file)
+            if remote is not None:
+                return remote
+        from minio.error import S3Error
+
+        try:
+            stat = self.stat_object(object_name=dest_file, bucket_name=bucket_name)
+        except S3Error as err:
+            if err.code in stat_cache.MISSING_CODES:
+                return None
+            raise
+        return remote_index.RemoteObject(
+            key=dest_file,
+            size=stat.size,
+            etag=stat.etag.strip('"') if stat.etag else stat.etag,
+            last_modified=stat.last_modified,
+        )
+
+    def verify_tree(
+        self, src_dir=None, dest_dir=None, obj_store_bucket=None, workers=4
+    ):
+        """compares every file in a local directory with the equivalent objects
+        in object storage.  The files are hashed concurrently.
+
+        :param src_dir: the local directory to verify, defaults to the
+            sync's src_dir
+        :type src_dir: str
+        :param dest_dir: the object storage directory that src_dir was
+            synced to, defaults to the sync's dest_dir
+        :type dest_dir: str
+        :param obj_store_bucket: the bucket that src_dir was synced to
+        :type obj_store_bucket: str
+        :param workers: number of threads used to hash the local files
+        :type workers: int
+        :return: a report of which files are matching, mismatched or missing
+        :rtype: VerifyReport
+        """
+        if src_dir is None:
+            src_dir = self.src_dir
+        if dest_dir is None:
+            dest_dir = self.dest_dir
+        workers = max(workers or 1, 1)
+        report = VerifyReport()
+        sync_files = (
+            (local_file, obj_store_path)
+            for local_file, obj_store_path, _ in self._iter_sync_files(
+                src_dir=src_dir, dest_dir=dest_dir
+            )
+        )
+        verify = functools.partial(self._verify_status, bucket_name=obj_store_bucket)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for (local_file, obj_store_path), future in _iter_bounded(
+                executor, verify, sync_files, workers * 2
+            ):
+                exc = future.exception()
+                if exc is not None:
+                    LOGGER.error(f"failed to verify {local_file}: {exc}")
+                    report.errors[local_file] = exc
+                else:
+                    report.add(future.result(), local_file, obj_store_path)
+        self._flush_caches()
+        LOGGER.info(f"verify {src_dir} -> {dest_dir}: {report}")
+        return report
 
     def check_multipart_etag(self, localFile, etagFromDest):
         """checks to see if the etag from S3 can be validated locally
@@ -584,27 +2894,119 @@ class ObjectStoreDirectorySync(ObjectStoreUtil):
         :return: a boolean that tells us if the etag can be validated
         :rtype: bool
         """
-        verifyEtag = CalcETags()
+        verifyEtag = CalcETags(hash_cache=getattr(self, "hash_cache", None))
         return verifyEtag.etag_is_valid(localFile, etagFromDest)
 
 
+class _PartHasher:
+    """accumulates the md5 digests of the consecutive `partsize` byte parts of
+    a stream, used to calculate the multipart etag for one part size.  A
+    partsize of None hashes the whole stream as a single md5.
+    """
+
+    __slots__ = ("partsize", "digests", "part_md5", "part_bytes")
+
+    def __init__(self, partsize):
+        self.partsize = partsize
+        self.digests = []
+        self.part_md5 = hashlib.md5()
+        self.part_bytes = 0
+
+    def update(self, data):
+        """hashes the data, a memoryview, closing off parts as their
+        boundaries are crossed
+        """
+        if self.partsize is None:
+            self.part_md5.update(data)
+            return
+        offset = 0
+        length = len(data)
+        while offset < length:
+            take = min(self.partsize - self.part_bytes, length - offset)
+            end = offset + take
+            self.part_md5.update(data[offset:end])
+            self.part_bytes += take
+            offset = end
+            if self.part_bytes == self.partsize:
+                self.digests.append(self.part_md5.digest())
+                self.part_md5 = hashlib.md5()
+                self.part_bytes = 0
+
+    def hexdigest(self):
+        if self.partsize is None:
+            return self.part_md5.hexdigest()
+        digests = self.digests
+        if self.part_bytes:
+            digests = digests + [self.part_md5.digest()]
+        return hashlib.md5(b"".join(digests)).hexdigest() + "-" + str(len(digests))
+
+
 class CalcETags(object):
-    def __init__(self):
+    def __init__(self, buffer_size=1048576, hash_cache=None):
+        """
+        :param buffer_size: the size of the buffer files are read through
+            when calculating etags
+        :type buffer_size: int
+        :param hash_cache: optional HashCache, digests found in the cache are
+            returned without reading the file and any digests that are
+            calculated are added to it
+        :type hash_cache: hash_cache.HashCache
+        """
         self.defaultPartSize = 1048576
+        self.buffer_size = buffer_size
+        self.hash_cache = hash_cache
 
     def factor_of_1MB(self, filesize, num_parts):
         x = filesize / int(num_parts)
         y = x % self.defaultPartSize
         return int(x + self.defaultPartSize - y)
 
+    def calc_md5(self, inputfile):
+        """calculates the md5 of a file, the file is streamed through a fixed
+        size buffer so the whole file is never held in memory
+        """
+        return self.calc_etags(inputfile, [None])[None]
+
     def calc_etag(self, inputfile, partsize):
-        md5_digests = []
-        with open(inputfile, "rb") as f:
-            for chunk in iter(lambda: f.read(partsize), b""):
-                md5_digests.append(hashlib.md5(chunk).digest())
-        return (
-            hashlib.md5(b"".join(md5_digests)).hexdigest() + "-" + str(len(md5_digests))
-        )
+        return self.calc_etags(inputfile, [partsize])[partsize]
+
+    def calc_etags(self, inputfile, partsizes):
+        """calculates the multipart etags for several part sizes in a single
+        read of the file.  The file is read into one reusable buffer and each
+        block is fed to a hasher for every part size.
+
+        :param inputfile: path to the file to calculate the etags for
+        :type inputfile: str
+        :param partsizes: iterable of part sizes in bytes, a part size of
+            None calculates the plain md5 of the file
+        :return: dict of partsize -> etag
+        :rtype: dict
+        """
+        partsizes = set(partsizes)
+        if self.hash_cache is None:
+            return self._read_etags(inputfile, partsizes)
+
+        local_stat = os.stat(inputfile)
+        etags = self.hash_cache.get(local_stat, partsizes)
+        missing = partsizes.difference(etags)
+        if missing:
+            calculated = self._read_etags(inputfile, missing)
+            self.hash_cache.put(inputfile, local_stat, calculated)
+            etags.update(calculated)
+        return etags
+
+    def _read_etags(self, inputfile, partsizes):
+        hashers = [_PartHasher(partsize) for partsize in partsizes]
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        with open(inputfile, "rb", buffering=0) as f:
+            while True:
+                bytes_read = f.readinto(buffer)
+                if not bytes_read:
+                    break
+                for hasher in hashers:
+                    hasher.update(view[:bytes_read])
+        return dict((hasher.partsize, hasher.hexdigest()) for hasher in hashers)
 
     def possible_partsizes(self, filesize, num_parts):
         return (
@@ -612,11 +3014,11 @@ class CalcETags(object):
             and (float(filesize) / float(partsize)) <= num_parts
         )
 
-    def etag_is_valid(self, inFilePath, s3eTag):
-        LOGGER.debug(f"inFilePath: {inFilePath}, s3eTag: {s3eTag}")
-        filesize = os.path.getsize(inFilePath)
-        num_parts = int(s3eTag.split("-")[1])
-        etag_is_valid = False
+    def candidate_partsizes(self, filesize, num_parts):
+        """returns the part sizes commonly used by upload clients that could
+        have produced a multipart etag with `num_parts` parts for a file of
+        `filesize` bytes
+        """
         # Default Partsizes Map: aws_cli/boto3, s3cmd
         partsizes = [
             8388608,
@@ -625,9 +3027,25 @@ class CalcETags(object):
                 filesize, num_parts
             ),  # Used by many clients to upload large files
         ]
+        # the part size put_object picks for files too large for 15MB parts
+        if filesize <= MAX_MULTIPART_PARTS * MAX_PART_SIZE:
+            partsizes.append(multipart_part_size(filesize))
+        is_possible = self.possible_partsizes(filesize, num_parts)
+        return list(filter(is_possible, dict.fromkeys(partsizes)))
 
-        for partsize in filter(self.possible_partsizes(filesize, num_parts), partsizes):
-            calcETag = self.calc_etag(inFilePath, partsize)
+    def etag_is_valid(self, inFilePath, s3eTag):
+        LOGGER.debug(f"inFilePath: {inFilePath}, s3eTag: {s3eTag}")
+        s3eTag = s3eTag.strip('"')
+        filesize = os.path.getsize(inFilePath)
+        num_parts = int(s3eTag.split("-")[1])
+        etag_is_valid = False
+
+        partsizes = self.candidate_partsizes(filesize, num_parts)
+        if not partsizes:
+            return etag_is_valid
+        calcETags = self.calc_etags(inFilePath, partsizes)
+        for partsize in partsizes:
+            calcETag = calcETags[partsize]
             LOGGER.debug(f"etags froms3: {s3eTag}, calced: {calcETag}, {partsize}")
 
             if s3eTag == calcETag:
@@ -636,6 +3054,39 @@ class CalcETags(object):
                 break
         return etag_is_valid
 
+    def etags_are_valid(self, files_etags, workers=None):
+        """verifies the etags for many files.  Plain md5 etags as well as
+        multipart etags are supported.
+
+        :param files_etags: iterable of (local file path, etag) tuples
+        :param workers: if greater than 1 the files are hashed concurrently
+            by this many threads
+        :type workers: int
+        :return: dict of local file path -> bool, True if the etag matches
+        :rtype: dict
+        """
+        if not workers or workers <= 1:
+            return dict(
+                (in_file, self.etag_matches(in_file, etag))
+                for in_file, etag in files_etags
+            )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = dict(
+                (executor.submit(self.etag_matches, in_file, etag), in_file)
+                for in_file, etag in files_etags
+            )
+            return dict(
+                (futures[future], future.result())
+                for future in concurrent.futures.as_completed(futures)
+            )
+
+    def etag_matches(self, in_file, etag):
+        """checks if an md5 or multipart etag matches the local file"""
+        etag = etag.strip('"')
+        if len(etag.split("-")) == 2:
+            return self.etag_is_valid(in_file, etag)
+        return self.calc_md5(in_file) == etag
+
 
 class ObjectStoragePathLib:
     """class that wrap some functions to clean up file paths when working with
@@ -654,14 +3105,16 @@ class ObjectStoragePathLib:
         self.obj_store_secret = obj_store_secret
         self.obj_store_bucket = obj_store_bucket
 
+        # only the paths are worked with, the connection parameters are
+        # optional so this works with any backend
         if self.obj_store_host is None:
-            self.obj_store_host = constants.OBJ_STORE_HOST
+            self.obj_store_host = getattr(constants, "OBJ_STORE_HOST", None)
         if self.obj_store_user is None:
-            self.obj_store_user = constants.OBJ_STORE_USER
+            self.obj_store_user = getattr(constants, "OBJ_STORE_USER", None)
         if self.obj_store_secret is None:
-            self.obj_store_secret = constants.OBJ_STORE_SECRET
+            self.obj_store_secret = getattr(constants, "OBJ_STORE_SECRET", None)
         if self.obj_store_bucket is None:
-            self.obj_store_bucket = constants.OBJ_STORE_BUCKET
+            self.obj_store_bucket = getattr(constants, "OBJ_STORE_BUCKET", None)
 
     def remove_sr_root_dir(self, in_path, src_root_dir):
         """
@@ -742,3 +3195,209 @@ class ObjectStoragePathLib:
             objStoreAbsPath = objStoreAbsPath.replace(os.path.sep, posixpath.sep)
         LOGGER.debug(f"object store absolute path: {objStoreAbsPath}")
         return objStoreAbsPath
+
+    def mapper(
+        self,
+        src_root_dir: str,
+        ostore_path: str,
+        prepend_bucket: bool = True,
+        include_leading_slash: bool = False,
+    ):
+        """returns an ObjectStoragePathMapper bound to this bucket, use it
+        instead of get_obj_store_path when translating a lot of paths under
+        the same src_root_dir.
+
+        :rtype: ObjectStoragePathMapper
+        """
+        return ObjectStoragePathMapper(
+            src_root_dir,
+            ostore_path,
+            bucket_name=self.obj_store_bucket,
+            prepend_bucket=prepend_bucket,
+            include_leading_slash=include_leading_slash,
+        )
+
+    def get_local_path(
+        self,
+        ostore_path: str,
+        ostore_root_dir: str,
+        local_root_dir: str,
+    ):
+        """the reverse of get_obj_store_path, calculates the local file path
+        that an object should be copied to.  Example if the ostore_path is
+        backup/guy/roster/elite_habs2023.txt, the ostore_root_dir is
+        backup/guy and the local_root_dir is /home/glafleur/players the
+        calculated path will be /home/glafleur/players/roster/elite_habs2023.txt
+
+        :param ostore_path: the object name / key
+        :param ostore_root_dir: the directory in object storage that maps to
+            local_root_dir, ostore_path is a sub dir of this path
+        :param local_root_dir: the local directory
+        :raises ValueError: raised if the ostore_path is not under the
+            ostore_root_dir, or would resolve to a path outside of the
+            local_root_dir
+        :return: the local file path
+        :rtype: str
+        """
+        prefix = ostore_root_dir.strip(posixpath.sep)
+        prefix = prefix + posixpath.sep if prefix else prefix
+        prefix_len = len(prefix)
+        key = ostore_path.lstrip(posixpath.sep)
+        if not key.startswith(prefix):
+            msg = (
+                f"expecting the object store root path {ostore_root_dir} to "
+                + f"be part of the object path {ostore_path}"
+            )
+            LOGGER.error(msg)
+            raise ValueError(msg)
+        parts = key[prefix_len:].split(posixpath.sep)
+        if any(part in ("", ".", "..") for part in parts):
+            msg = f"object path {ostore_path} can't be mapped to a local file"
+            LOGGER.error(msg)
+            raise ValueError(msg)
+        local_path = os.path.join(local_root_dir, *parts)
+        LOGGER.debug(f"local path: {local_path}")
+        return local_path
+
+
+class ObjectStoragePathMapper:
+    """translates many local paths under src_root_dir to the equivalent
+    object storage paths under ostore_path, the batch version of
+    ObjectStoragePathLib.get_obj_store_path.
+
+    The root and the destination prefix are worked out once, when the mapper
+    is created, after that each path is translated with string operations.
+    The file system isn't touched, the caller says which paths are
+    directories (eg from the stat of walker.walk_files).
+    """
+
+    def __init__(
+        self,
+        src_root_dir: str,
+        ostore_path: str,
+        bucket_name: str = None,
+        prepend_bucket: bool = True,
+        include_leading_slash: bool = False,
+    ):
+        """
+        :param src_root_dir: the local directory that maps to ostore_path
+        :type src_root_dir: str
+        :param ostore_path: the directory in object storage
+        :type ostore_path: str
+        :param bucket_name: the bucket, the leading part of the paths if
+            prepend_bucket is set
+        :type bucket_name: str
+        :param prepend_bucket: see ObjectStoragePathLib.get_obj_store_path
+        :type prepend_bucket: bool
+        :param include_leading_slash: see
+            ObjectStoragePathLib.get_obj_store_path
+        :type include_leading_slash: bool
+        """
+        if prepend_bucket and not bucket_name:
+            raise ValueError("prepend_bucket requires a bucket_name")
+        self.src_root_dir = src_root_dir
+        self.ostore_path = ostore_path
+        self.bucket_name = bucket_name
+        self.include_leading_slash = include_leading_slash
+
+        self._root = pathlib.PurePath(src_root_dir)
+        # a path under the root starts with the root as it was given or in
+        # its normalized form, followed by a separator
+        prefixes = []
+        for prefix in (src_root_dir, str(self._root)):
+            if prefix in ("", "."):
+                continue
+            if not prefix.endswith(os.path.sep):
+                prefix = prefix + os.path.sep
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+        self._root_prefixes = tuple(prefixes)
+
+        # joined the same way as get_obj_store_path, with a trailing
+        # separator for the relative path
+        if prepend_bucket:
+            self._dest_prefix = os.path.join(bucket_name, ostore_path, "")
+        else:
+            self._dest_prefix = os.path.join(ostore_path, "")
+        self._to_posix = sys.platform == "win32"
+
+    def map(self, src_path: str, is_dir: bool = False):
+        """returns the object storage path of a local path
+
+        :param src_path: a path under src_root_dir
+        :type src_path: str
+        :param is_dir: the path is a directory, a trailing separator is added
+        :type is_dir: bool
+        :raises ValueError: raised if src_path isn't under src_root_dir
+        :rtype: str
+        """
+        sep = os.path.sep
+        for prefix in self._root_prefixes:
+            prefix_len = len(prefix)
+            if src_path.startswith(prefix) and len(src_path) > prefix_len:
+                rel_path = src_path[prefix_len:]
+                # paths from os.scandir / os.path.join are already clean,
+                # others are normalized the way PurePath would
+                if (
+                    sep + sep in rel_path
+                    or rel_path[0] == sep
+                    or rel_path[-1] == sep
+                    or "." in rel_path
+                    and (
+                        rel_path == "."
+                        or rel_path.startswith("." + sep)
+                        or sep + "." + sep in rel_path
+                        or rel_path.endswith(sep + ".")
+                    )
+                ):
+                    rel_path = self._relative_path(src_path)
+                break
+        else:
+            rel_path = self._relative_path(src_path)
+
+        dest = self._dest_prefix + rel_path
+        if is_dir and dest[-1] != sep:
+            dest = dest + sep
+        if self.include_leading_slash and dest[0] != sep:
+            dest = sep + dest
+        # object storage always uses posix / unix path delimiters
+        if self._to_posix:
+            dest = dest.replace(sep, posixpath.sep)
+        return dest
+
+    def map_paths(self, src_paths, is_dir: bool = False):
+        """generator that translates an iterable of local paths
+
+        :param src_paths: iterable of paths under src_root_dir
+        :param is_dir: all the paths are directories
+        :type is_dir: bool
+        :return: yields the object storage paths, in the same order
+        """
+        map_path = self.map
+        for src_path in src_paths:
+            yield map_path(src_path, is_dir)
+
+    def map_entries(self, entries):
+        """generator that translates an iterable of (local path, is_dir)
+        tuples
+
+        :return: yields the object storage paths, in the same order
+        """
+        map_path = self.map
+        for src_path, is_dir in entries:
+            yield map_path(src_path, is_dir)
+
+    def _relative_path(self, src_path):
+        """the path relative to the root worked out with PurePath, for the
+        paths the string prefixes don't cover
+        """
+        path = pathlib.PurePath(src_path)
+        if self._root not in path.parents:
+            msg = (
+                f"expecting the root path {self.src_root_dir} to "
+                + f"be part of the input path {src_path}"
+            )
+            LOGGER.error(msg)
+            raise ValueError(msg)
+        root_len = len(self._root.parts)
+        return os.path.join(*path.parts[root_len:])
@@ -0,0 +1,286 @@
+""" asyncio interface to the object store utility.
+
+The underlying minio / boto3 clients are blocking, so every call is run on a
+single, bounded thread pool that is shared by all the operations of an
+AsyncObjectStoreUtil.  The size of the pool is the limit on the number of
+calls that run at once, any number of operations can be awaited and the
+extra ones wait in the pool's queue until a thread is free.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+
+from . import NRObjStoreUtil, client_pool
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncObjectStoreUtil:
+    """async counterpart of ObjectStoreUtil, exposes the same methods as
+    coroutines.
+
+    Example:
+
+        async with AsyncObjectStoreUtil(max_concurrency=64) as ostore:
+            await asyncio.gather(
+                *[ostore.put_object(key, path) for key, path in uploads]
+            )
+            async for obj in ostore.iter_objects("junky/"):
+                print(obj.object_name)
+    """
+
+    def __init__(
+        self,
+        obj_store_host=None,
+        obj_store_user=None,
+        obj_store_secret=None,
+        obj_store_bucket=None,
+        tmpfolder=None,
+        max_concurrency=32,
+        ostore=None,
+        pool_config=None,
+    ):
+        """
+        :param obj_store_host: see ObjectStoreUtil
+        :param obj_store_user: see ObjectStoreUtil
+        :param obj_store_secret: see ObjectStoreUtil
+        :param obj_store_bucket: see ObjectStoreUtil
+        :param tmpfolder: see ObjectStoreUtil
+        :param max_concurrency: the size of the thread pool, the maximum
+            number of operations that run at the same time
+        :type max_concurrency: int
+        :param ostore: an existing ObjectStoreUtil to wrap, if provided the
+            connection parameters are ignored
+        :type ostore: ObjectStoreUtil
+        :param pool_config: the http connection pool settings, defaults to
+            the default settings with a pool_size of max_concurrency
+        :type pool_config: client_pool.ConnectionPoolConfig
+        """
+        if ostore is None:
+            if pool_config is None:
+                pool_config = client_pool.ConnectionPoolConfig(
+                    pool_size=max_concurrency
+                )
+            ostore = NRObjStoreUtil.ObjectStoreUtil(
+                obj_store_host=obj_store_host,
+                obj_store_user=obj_store_user,
+                obj_store_secret=obj_store_secret,
+                obj_store_bucket=obj_store_bucket,
+                tmpfolder=tmpfolder,
+                pool_config=pool_config,
+            )
+        self.ostore = ostore
+        self.max_concurrency = max_concurrency
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ostore"
+        )
+
+    @property
+    def obj_store_bucket(self):
+        return self.ostore.obj_store_bucket
+
+    async def _run(self, func, *args, **kwargs):
+        """runs the blocking func on the thread pool, it waits in the pool's
+        queue if all the threads are busy
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def put_object(
+        self, ostore_path, local_path, bucket_name=None, public=False, **kwargs
+    ):
+        """see ObjectStoreUtil.put_object"""
+        return await self._run(
+            self.ostore.put_object,
+            ostore_path=ostore_path,
+            local_path=local_path,
+            bucket_name=bucket_name,
+            public=public,
+            **kwargs,
+        )
+
+    async def get_object(self, file_path, local_path, bucket_name=None, **kwargs):
+        """see ObjectStoreUtil.get_object"""
+        return await self._run(
+            self.ostore.get_object,
+            file_path=file_path,
+            local_path=local_path,
+            bucket_name=bucket_name,
+            **kwargs,
+        )
+
+    async def put_stream(self, ostore_path, data, bucket_name=None, **kwargs):
+        """see ObjectStoreUtil.put_stream, iterables of chunks are consumed on
+        the thread pool
+        """
+        return await self._run(
+            self.ostore.put_stream,
+            ostore_path=ostore_path,
+            data=data,
+            bucket_name=bucket_name,
+            **kwargs,
+        )
+
+    async def get_stream(self, file_path, out=None, bucket_name=None, **kwargs):
+        """see ObjectStoreUtil.get_stream"""
+        return await self._run(
+            self.ostore.get_stream,
+            file_path=file_path,
+            out=out,
+            bucket_name=bucket_name,
+            **kwargs,
+        )
+
+    async def stat_object(self, object_name, bucket_name=None):
+        """see ObjectStoreUtil.stat_object"""
+        return await self._run(
+            self.ostore.stat_object, object_name=object_name, bucket_name=bucket_name
+        )
+
+    async def get_object_properties(self, object_name, bucket_name=None):
+        """see ObjectStoreUtil.get_object_properties"""
+        return await self.stat_object(object_name=object_name, bucket_name=bucket_name)
+
+    async def list_objects(
+        self,
+        objstore_dir=None,
+        recursive=True,
+        return_file_names_only=False,
+        bucket_name=None,
+        **kwargs,
+    ):
+        """see ObjectStoreUtil.list_objects, the full listing is returned as a
+        list, use iter_objects to stream it.
+        """
+        return [
+            obj
+            async for obj in self.iter_objects(
+                objstore_dir=objstore_dir,
+                recursive=recursive,
+                return_file_names_only=return_file_names_only,
+                bucket_name=bucket_name,
+                **kwargs,
+            )
+        ]
+
+    async def iter_objects(
+        self,
+        objstore_dir=None,
+        recursive=True,
+        return_file_names_only=False,
+        bucket_name=None,
+        batch_size=1000,
+        **kwargs,
+    ):
+        """async generator that streams the objects in objstore_dir.  The
+        listing is pulled from the blocking client in batches of `batch_size`
+        so a page of results costs one trip to the thread pool.  Any other
+        keyword arguments, eg the filters, are passed to
+        ObjectStoreUtil.list_objects.
+
+        :return: yields minio Object's or object names if
+            return_file_names_only is set
+        """
+        objects = iter(
+            self.ostore.list_objects(
+                objstore_dir=objstore_dir,
+                recursive=recursive,
+                return_file_names_only=return_file_names_only,
+                bucket_name=bucket_name,
+                iterator=True,
+                **kwargs,
+            )
+        )
+        while True:
+            batch = await self._run(_next_batch, objects, batch_size)
+            for obj in batch:
+                yield obj
+            if len(batch) < batch_size:
+                break
+
+    async def copy_object(self, src_path, dest_path, bucket_name=None, **kwargs):
+        """see ObjectStoreUtil.copy_object"""
+        return await self._run(
+            self.ostore.copy_object,
+            src_path=src_path,
+            dest_path=dest_path,
+            bucket_name=bucket_name,
+            **kwargs,
+        )
+
+    async def delete_remote_file(self, dest_file, obj_store_bucket=None):
+        """see ObjectStoreUtil.delete_remote_file"""
+        return await self._run(
+            self.ostore.delete_remote_file,
+            dest_file=dest_file,
+            obj_store_bucket=obj_store_bucket,
+        )
+
+    async def delete_directory(self, ostore_dir, obj_store_bucket=None, **kwargs):
+        """see ObjectStoreUtil.delete_directory"""
+        return await self._run(
+            self.ostore.delete_directory,
+            ostore_dir=ostore_dir,
+            obj_store_bucket=obj_store_bucket,
+            **kwargs,
+        )
+
+    async def get_presigned_url(self, object_name, **kwargs):
+        """see ObjectStoreUtil.get_presigned_url"""
+        return await self._run(
+            self.ostore.get_presigned_url, object_name=object_name, **kwargs
+        )
+
+    async def get_presigned_urls(self, object_names, **kwargs):
+        """see ObjectStoreUtil.get_presigned_urls"""
+        return await self._run(
+            self.ostore.get_presigned_urls, object_names=list(object_names), **kwargs
+        )
+
+    async def set_public_permissions(self, object_name, bucket_name=None):
+        """see ObjectStoreUtil.set_public_permissions"""
+        return await self._run(
+            self.ostore.set_public_permissions,
+            object_name=object_name,
+            bucket_name=bucket_name,
+        )
+
+    async def get_public_permission(self, object_name, bucket_name=None):
+        """see ObjectStoreUtil.get_public_permission"""
+        return await self._run(
+            self.ostore.get_public_permission,
+            object_name=object_name,
+            bucket_name=bucket_name,
+        )
+
+    def close(self):
+        """shuts down the thread pool, waiting for running calls to finish.
+        Blocks, from a coroutine use aclose.
+        """
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """shuts down the thread pool, the wait for the running calls to
+        finish happens on another thread so the event loop isn't blocked
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+def _next_batch(objects, batch_size):
+    """pulls up to batch_size items from the objects iterator"""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            break
+    return batch
@@ -0,0 +1,1491 @@
+""" Storage backends that ObjectStoreUtil runs its requests on.
+
+ObjectStoreUtil doesn't talk to the object store directly, every request goes
+through a StorageBackend that implements the put, get, stat, list, delete,
+copy and ACL operations (plus the multipart upload primitives).  Four
+backends are provided:
+
+    MinioBackend  - the default, a minio client, with boto3 for the ACLs
+    Boto3Backend  - a boto3 s3 client for everything
+    LocalBackend  - the buckets are directories on the local file system, eg
+        to stage data on a local disk with the same API
+    MemoryBackend - the objects are held in memory, for tests and benchmarks
+        that shouldn't need an object store
+
+Whatever the backend, stat and list return minio.datatypes.Object's, writes
+return minio.helpers.ObjectWriteResult's, failed deletes are reported as
+minio.deleteobjects.DeleteError's and errors are raised as
+minio.error.S3Error's with the S3 error code (eg NoSuchKey), so the code
+using a backend doesn't depend on which one it is.  The local backends
+produce the same etags as S3: the md5 of the data, or for multipart uploads
+the md5 of the part md5s followed by -<number of parts>.
+"""
+
+import bisect
+import contextlib
+import datetime
+import functools
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import operator
+import os
+import shutil
+import threading
+import uuid
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PART_SIZE = 15728640
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+CHUNK_SIZE = 1048576
+
+
+ALL_USERS_URI = "http://acs.amazonaws.com/groups/global/AllUsers"
+# the permissions granted to the public by the canned ACLs
+CANNED_ACLS = {
+    "private": (),
+    "public-read": ("READ",),
+    "public-read-write": ("READ", "WRITE"),
+}
+
+# the response headers that can be overridden in a presigned url, and the
+# name of the matching boto3 parameter
+PRESIGN_RESPONSE_PARAMS = {
+    "response-cache-control": "ResponseCacheControl",
+    "response-content-disposition": "ResponseContentDisposition",
+    "response-content-encoding": "ResponseContentEncoding",
+    "response-content-language": "ResponseContentLanguage",
+    "response-content-type": "ResponseContentType",
+    "response-expires": "ResponseExpires",
+}
+
+
+def make_temp_file(directory, prefix="", suffix=".part", mode=0o666):
+    """creates a new, uniquely named file in directory, open for reading and
+    writing.  Unlike tempfile.mkstemp, which always uses 0600, the file is
+    created with `mode` less the current umask, so once it is renamed into
+    place it has the permissions of any other new file.
+
+    :param directory: the directory the file is created in
+    :type directory: str
+    :param prefix: the start of the file name
+    :type prefix: str
+    :param suffix: the end of the file name
+    :type suffix: str
+    :param mode: the permissions before the umask is applied
+    :type mode: int
+    :return: tuple of (file descriptor, path)
+    """
+    path = os.path.join(directory, f"{prefix}{uuid.uuid4().hex}{suffix}")
+    flags = os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    return os.open(path, flags, mode), path
+
+
+class StorageBackend:
+    """the operations a backend implements, all of them raise
+    NotImplementedError here.
+
+    Objects are identified by bucket name and object name, the acl params
+    are canned ACLs (see CANNED_ACLS) or None for the bucket's default.
+    """
+
+    name = None
+
+    def bucket_exists(self, bucket_name):
+        raise NotImplementedError
+
+    def make_bucket(self, bucket_name):
+        raise NotImplementedError
+
+    def put_object(
+        self,
+        bucket_name,
+        object_name,
+        local_path,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        """uploads a file, as a multipart upload of part_size parts if it is
+        larger than a part
+
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        raise NotImplementedError
+
+    def put_stream(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        length=-1,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        """uploads the data read from a readable file-like object
+
+        :param length: the number of bytes to upload, -1 reads data to the end
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        raise NotImplementedError
+
+    def get_object(self, bucket_name, object_name, local_path):
+        """downloads an object to local_path
+
+        :return: the metadata of the object
+        :rtype: minio.datatypes.Object
+        """
+        raise NotImplementedError
+
+    def iter_object(
+        self,
+        bucket_name,
+        object_name,
+        offset=0,
+        length=None,
+        etag=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        """generator that yields the data of an object, or of length bytes
+        from offset, in chunks of up to chunk_size bytes
+
+        :param etag: only read the object if it still has this etag,
+            otherwise S3Error PreconditionFailed is raised
+        """
+        raise NotImplementedError
+
+    def stat_object(self, bucket_name, object_name):
+        """:rtype: minio.datatypes.Object"""
+        raise NotImplementedError
+
+    def list_objects(self, bucket_name, prefix=None, delimiter=None, start_after=None):
+        """generator that yields the objects whose names start with prefix,
+        in key order.
+
+        :param delimiter: if set the names that contain the delimiter after
+            the prefix are grouped into a single directory entry (an Object
+            whose name ends with the delimiter), otherwise the listing is
+            recursive
+        :param start_after: only list the names that sort after this one
+        """
+        raise NotImplementedError
+
+    def delete_object(self, bucket_name, object_name):
+        raise NotImplementedError
+
+    def delete_objects(self, bucket_name, object_names):
+        """deletes many objects
+
+        :return: the errors for the objects that couldn't be deleted
+        :rtype: list of minio.deleteobjects.DeleteError
+        """
+        raise NotImplementedError
+
+    def copy_object(self, bucket_name, object_name, src_bucket_name, src_object_name):
+        """copies an object within the object store
+
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        raise NotImplementedError
+
+    def get_object_acl(self, bucket_name, object_name):
+        """returns the ACL of an object in the format of the boto3
+        get_object_acl response, a dict with Owner and Grants
+        """
+        raise NotImplementedError
+
+    def put_object_acl(self, bucket_name, object_name, acl):
+        raise NotImplementedError
+
+    def create_multipart_upload(
+        self, bucket_name, object_name, content_type=DEFAULT_CONTENT_TYPE, acl=None
+    ):
+        """starts a multipart upload, returns its upload id"""
+        raise NotImplementedError
+
+    def upload_part(self, bucket_name, object_name, upload_id, part_number, data):
+        """uploads a single part (bytes), returns its etag"""
+        raise NotImplementedError
+
+    def complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        """assembles the parts, a list of (part number, etag), into the object
+
+        :rtype: minio.helpers.ObjectWriteResult
+        """
+        raise NotImplementedError
+
+    def abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        raise NotImplementedError
+
+    def presign_urls(self, bucket_name, object_names, expires, headers=None):
+        """creates presigned GET urls
+
+        :param expires: how long the urls are valid for
+        :type expires: datetime.timedelta
+        :return: dict of object name -> url, and the time the urls expire
+        :rtype: tuple(dict, datetime.datetime)
+        """
+        raise NotImplementedError(
+            f"the {self.name} backend doesn't support presigned urls"
+        )
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+def _s3_error(code, message, bucket_name=None, object_name=None):
+    from minio.error import S3Error
+
+    resource = "/" + "/".join(name for name in (bucket_name, object_name) if name)
+    return S3Error(code, message, resource, None, None, None, bucket_name, object_name)
+
+
+def _write_result(bucket_name, object_name, etag, version_id=None, headers=None):
+    from minio.helpers import ObjectWriteResult
+    from urllib3 import HTTPHeaderDict
+
+    return ObjectWriteResult(
+        bucket_name, object_name, version_id, etag, HTTPHeaderDict(headers or {})
+    )
+
+
+def _acl_metadata(acl):
+    return {"x-amz-acl": acl} if acl else {}
+
+
+def _check_acl(acl, bucket_name=None, object_name=None):
+    if acl is not None and acl not in CANNED_ACLS:
+        raise _s3_error(
+            "InvalidArgument", f"unsupported canned ACL {acl}", bucket_name, object_name
+        )
+
+
+def _acl_policy(acl, owner):
+    """builds the get_object_acl response for a canned ACL"""
+    grants = [
+        {
+            "Grantee": {"DisplayName": owner, "ID": owner, "Type": "CanonicalUser"},
+            "Permission": "FULL_CONTROL",
+        }
+    ]
+    for permission in CANNED_ACLS[acl or "private"]:
+        grants.append(
+            {
+                "Grantee": {"Type": "Group", "URI": ALL_USERS_URI},
+                "Permission": permission,
+            }
+        )
+    return {"Owner": {"DisplayName": owner, "ID": owner}, "Grants": grants}
+
+
+def _multipart_etag(part_etags):
+    md5 = hashlib.md5()
+    for etag in part_etags:
+        md5.update(bytes.fromhex(etag))
+    return f"{md5.hexdigest()}-{len(part_etags)}"
+
+
+def _read_full(stream, size):
+    """reads up to size bytes, only returning less at the end of the
+    stream
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _iter_stream(stream, length=-1, chunk_size=CHUNK_SIZE):
+    """yields the chunks read from a stream, stopping after length bytes if
+    length isn't negative
+    """
+    remaining = length
+    while remaining:
+        size = chunk_size if remaining < 0 else min(chunk_size, remaining)
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        if remaining > 0:
+            remaining -= len(chunk)
+        yield chunk
+
+
+def _delimit(objects, prefix, delimiter):
+    """groups the objects (in key order) whose names contain the delimiter
+    after the prefix into a single directory entry
+    """
+    from minio.datatypes import Object
+
+    if not delimiter:
+        yield from objects
+        return
+    last = None
+    for obj in objects:
+        pos = obj.object_name.find(delimiter, len(prefix))
+        if pos < 0:
+            yield obj
+            continue
+        common_prefix = obj.object_name[: pos + len(delimiter)]
+        # names with the same common prefix are next to each other
+        if common_prefix != last:
+            last = common_prefix
+            yield Object(obj.bucket_name, common_prefix)
+
+
+class MinioBackend(StorageBackend):
+    """requests made with a minio client.  minio doesn't support ACLs, those
+    are made with a boto3 client that is only created when it is needed.
+    """
+
+    name = "minio"
+
+    def __init__(self, minio_client, get_boto_client=None):
+        """
+        :param minio_client: the client the requests are made with
+        :type minio_client: minio.Minio
+        :param get_boto_client: callable returning the boto3 s3 client used
+            for the ACL requests, called the first time one is made
+        :type get_boto_client: callable
+        """
+        self.minio_client = minio_client
+        self.get_boto_client = get_boto_client
+        self._acl_backend = None
+
+    def _acls(self):
+        if self._acl_backend is None:
+            if self.get_boto_client is None:
+                raise NotImplementedError("no boto3 client to manage the ACLs with")
+            self._acl_backend = Boto3Backend(self.get_boto_client())
+        return self._acl_backend
+
+    def bucket_exists(self, bucket_name):
+        return self.minio_client.bucket_exists(bucket_name)
+
+    def make_bucket(self, bucket_name):
+        self.minio_client.make_bucket(bucket_name)
+
+    def put_object(
+        self,
+        bucket_name,
+        object_name,
+        local_path,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        return self.minio_client.fput_object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            file_path=local_path,
+            content_type=content_type,
+            metadata=_acl_metadata(acl),
+            part_size=part_size,
+        )
+
+    def put_stream(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        length=-1,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        return self.minio_client.put_object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=data,
+            length=length,
+            content_type=content_type,
+            metadata=_acl_metadata(acl),
+            part_size=part_size,
+        )
+
+    def get_object(self, bucket_name, object_name, local_path):
+        return self.minio_client.fget_object(
+            bucket_name=bucket_name, object_name=object_name, file_path=local_path
+        )
+
+    def iter_object(
+        self,
+        bucket_name,
+        object_name,
+        offset=0,
+        length=None,
+        etag=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        request_headers = {"If-Match": f'"{etag}"'} if etag else None
+        response = self.minio_client.get_object(
+            bucket_name,
+            object_name,
+            offset=offset,
+            length=length or 0,
+            request_headers=request_headers,
+        )
+        try:
+            yield from response.stream(amt=chunk_size)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def stat_object(self, bucket_name, object_name):
+        return self.minio_client.stat_object(bucket_name, object_name)
+
+    def list_objects(self, bucket_name, prefix=None, delimiter=None, start_after=None):
+        if delimiter is None:
+            return self.minio_client.list_objects(
+                bucket_name,
+                recursive=True,
+                prefix=prefix,
+                start_after=start_after,
+                use_url_encoding_type=False,
+            )
+        return self.minio_client._list_objects(
+            bucket_name, delimiter=delimiter, prefix=prefix, start_after=start_after
+        )
+
+    def delete_object(self, bucket_name, object_name):
+        self.minio_client.remove_object(bucket_name, object_name)
+
+    def delete_objects(self, bucket_name, object_names):
+        from minio.deleteobjects import DeleteObject
+
+        delete_list = [DeleteObject(name) for name in object_names]
+        # remove_objects is lazy, the request is only made once it's consumed
+        return list(self.minio_client.remove_objects(bucket_name, delete_list))
+
+    def copy_object(self, bucket_name, object_name, src_bucket_name, src_object_name):
+        from minio.commonconfig import CopySource
+
+        return self.minio_client.copy_object(
+            bucket_name, object_name, CopySource(src_bucket_name, src_object_name)
+        )
+
+    def get_object_acl(self, bucket_name, object_name):
+        return self._acls().get_object_acl(bucket_name, object_name)
+
+    def put_object_acl(self, bucket_name, object_name, acl):
+        self._acls().put_object_acl(bucket_name, object_name, acl)
+
+    def create_multipart_upload(
+        self, bucket_name, object_name, content_type=DEFAULT_CONTENT_TYPE, acl=None
+    ):
+        headers = {"Content-Type": content_type}
+        headers.update(_acl_metadata(acl))
+        return self.minio_client._create_multipart_upload(
+            bucket_name, object_name, headers
+        )
+
+    def upload_part(self, bucket_name, object_name, upload_id, part_number, data):
+        return self.minio_client._upload_part(
+            bucket_name, object_name, data, None, upload_id, part_number
+        )
+
+    def complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        from minio.datatypes import Part
+        from minio.helpers import ObjectWriteResult
+
+        result = self.minio_client._complete_multipart_upload(
+            bucket_name,
+            object_name,
+            upload_id,
+            [Part(part_number, etag) for part_number, etag in parts],
+        )
+        return ObjectWriteResult(
+            result.bucket_name,
+            result.object_name,
+            result.version_id,
+            result.etag,
+            result.http_headers,
+            location=result.location,
+        )
+
+    def abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        self.minio_client._abort_multipart_upload(bucket_name, object_name, upload_id)
+
+    def presign_urls(self, bucket_name, object_names, expires, headers=None):
+        from . import presign
+
+        return presign.presign_urls(
+            self.minio_client, bucket_name, object_names, expires, headers=headers
+        )
+
+
+class Boto3Backend(StorageBackend):
+    """requests made with a boto3 s3 client.  The botocore ClientError's are
+    raised as minio S3Error's with the same error code.
+    """
+
+    name = "boto3"
+
+    def __init__(self, boto_client):
+        """
+        :param boto_client: the client the requests are made with
+        :type boto_client: botocore.client.S3
+        """
+        self.boto_client = boto_client
+
+    @contextlib.contextmanager
+    def _errors(self, bucket_name=None, object_name=None):
+        from botocore.exceptions import ClientError
+
+        try:
+            yield
+        except ClientError as err:
+            error = err.response.get("Error", {})
+            code = error.get("Code")
+            # HEAD responses have no body, only the status code
+            if code in ("404", "NotFound"):
+                code = "NoSuchKey" if object_name else "NoSuchBucket"
+            raise _s3_error(
+                code, error.get("Message"), bucket_name, object_name
+            ) from err
+
+    @staticmethod
+    def _object(bucket_name, object_name, response):
+        from minio.datatypes import Object
+
+        etag = response.get("ETag")
+        return Object(
+            bucket_name,
+            object_name,
+            last_modified=response.get("LastModified"),
+            etag=etag.replace('"', "") if etag else etag,
+            size=response.get("ContentLength", response.get("Size")),
+            metadata=response.get("Metadata"),
+            version_id=response.get("VersionId"),
+            storage_class=response.get("StorageClass"),
+            content_type=response.get("ContentType"),
+        )
+
+    @staticmethod
+    def _write_result(bucket_name, object_name, response):
+        etag = response.get("ETag") or response.get("CopyObjectResult", {}).get("ETag")
+        return _write_result(
+            bucket_name,
+            object_name,
+            etag.replace('"', "") if etag else etag,
+            version_id=response.get("VersionId"),
+            headers=response.get("ResponseMetadata", {}).get("HTTPHeaders"),
+        )
+
+    def bucket_exists(self, bucket_name):
+        try:
+            with self._errors(bucket_name):
+                self.boto_client.head_bucket(Bucket=bucket_name)
+        except Exception as err:
+            if getattr(err, "code", None) == "NoSuchBucket":
+                return False
+            raise
+        return True
+
+    def make_bucket(self, bucket_name):
+        with self._errors(bucket_name):
+            self.boto_client.create_bucket(Bucket=bucket_name)
+
+    def put_object(
+        self,
+        bucket_name,
+        object_name,
+        local_path,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        with open(local_path, "rb") as fh:
+            return self.put_stream(
+                bucket_name,
+                object_name,
+                fh,
+                length=os.fstat(fh.fileno()).st_size,
+                part_size=part_size,
+                content_type=content_type,
+                acl=acl,
+            )
+
+    def put_stream(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        length=-1,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        # like minio, anything that fits in a single part is sent as a single
+        # put, the rest as a multipart upload
+        first = _read_full(data, part_size if length < 0 else min(length, part_size))
+        if 0 <= length <= part_size or len(first) < part_size:
+            params = {"ContentType": content_type}
+            if acl:
+                params["ACL"] = acl
+            with self._errors(bucket_name, object_name):
+                response = self.boto_client.put_object(
+                    Bucket=bucket_name, Key=object_name, Body=first, **params
+                )
+            return self._write_result(bucket_name, object_name, response)
+
+        upload_id = self.create_multipart_upload(
+            bucket_name, object_name, content_type=content_type, acl=acl
+        )
+        try:
+            parts = []
+            part = first
+            remaining = length - len(first) if length >= 0 else -1
+            while part:
+                part_number = len(parts) + 1
+                etag = self.upload_part(
+                    bucket_name, object_name, upload_id, part_number, part
+                )
+                parts.append((part_number, etag))
+                if remaining == 0:
+                    break
+                part = _read_full(
+                    data, part_size if remaining < 0 else min(part_size, remaining)
+                )
+                if remaining > 0:
+                    remaining -= len(part)
+            return self.complete_multipart_upload(
+                bucket_name, object_name, upload_id, parts
+            )
+        except BaseException:
+            self.abort_multipart_upload(bucket_name, object_name, upload_id)
+            raise
+
+    def get_object(self, bucket_name, object_name, local_path):
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.get_object(Bucket=bucket_name, Key=object_name)
+        body = response["Body"]
+        # like minio's fget_object the download goes to a temporary file that
+        # is renamed into place, a failed download never leaves a partial file
+        local_dir = os.path.dirname(os.path.abspath(local_path))
+        try:
+            os.makedirs(local_dir, exist_ok=True)
+            tmp_fd, tmp_file = make_temp_file(
+                local_dir, prefix="." + os.path.basename(local_path)
+            )
+            try:
+                with os.fdopen(tmp_fd, "wb") as fh:
+                    for chunk in body.iter_chunks(CHUNK_SIZE):
+                        fh.write(chunk)
+                os.replace(tmp_file, local_path)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+        finally:
+            body.close()
+        return self._object(bucket_name, object_name, response)
+
+    def iter_object(
+        self,
+        bucket_name,
+        object_name,
+        offset=0,
+        length=None,
+        etag=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        params = {}
+        if length:
+            params["Range"] = f"bytes={offset}-{offset + length - 1}"
+        elif offset:
+            params["Range"] = f"bytes={offset}-"
+        if etag:
+            params["IfMatch"] = f'"{etag}"'
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.get_object(
+                Bucket=bucket_name, Key=object_name, **params
+            )
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def stat_object(self, bucket_name, object_name):
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.head_object(Bucket=bucket_name, Key=object_name)
+        return self._object(bucket_name, object_name, response)
+
+    def list_objects(self, bucket_name, prefix=None, delimiter=None, start_after=None):
+        from minio.datatypes import Object
+
+        params = {"Bucket": bucket_name}
+        if prefix:
+            params["Prefix"] = prefix
+        if delimiter:
+            params["Delimiter"] = delimiter
+        if start_after:
+            params["StartAfter"] = start_after
+        paginator = self.boto_client.get_paginator("list_objects_v2")
+        with self._errors(bucket_name):
+            for page in paginator.paginate(**params):
+                objects = [
+                    self._object(bucket_name, content["Key"], content)
+                    for content in page.get("Contents", [])
+                ]
+                prefixes = [
+                    Object(bucket_name, common_prefix["Prefix"])
+                    for common_prefix in page.get("CommonPrefixes", [])
+                ]
+                # the objects and the common prefixes of a page are separate
+                # lists, merge them back into key order
+                yield from heapq.merge(
+                    objects, prefixes, key=operator.attrgetter("object_name")
+                )
+
+    def delete_object(self, bucket_name, object_name):
+        with self._errors(bucket_name, object_name):
+            self.boto_client.delete_object(Bucket=bucket_name, Key=object_name)
+
+    def delete_objects(self, bucket_name, object_names):
+        from minio.deleteobjects import DeleteError
+
+        object_names = list(object_names)
+        if not object_names:
+            return []
+        with self._errors(bucket_name):
+            response = self.boto_client.delete_objects(
+                Bucket=bucket_name,
+                Delete={
+                    "Objects": [{"Key": name} for name in object_names],
+                    "Quiet": True,
+                },
+            )
+        return [
+            DeleteError(
+                error.get("Code"),
+                error.get("Message"),
+                error.get("Key"),
+                error.get("VersionId"),
+            )
+            for error in response.get("Errors", [])
+        ]
+
+    def copy_object(self, bucket_name, object_name, src_bucket_name, src_object_name):
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.copy_object(
+                Bucket=bucket_name,
+                Key=object_name,
+                CopySource={"Bucket": src_bucket_name, "Key": src_object_name},
+            )
+        return self._write_result(bucket_name, object_name, response)
+
+    def get_object_acl(self, bucket_name, object_name):
+        with self._errors(bucket_name, object_name):
+            return self.boto_client.get_object_acl(Bucket=bucket_name, Key=object_name)
+
+    def put_object_acl(self, bucket_name, object_name, acl):
+        with self._errors(bucket_name, object_name):
+            resp = self.boto_client.put_object_acl(
+                ACL=acl, Bucket=bucket_name, Key=object_name
+            )
+        LOGGER.debug(f"resp: {resp}")
+
+    def create_multipart_upload(
+        self, bucket_name, object_name, content_type=DEFAULT_CONTENT_TYPE, acl=None
+    ):
+        params = {"ContentType": content_type}
+        if acl:
+            params["ACL"] = acl
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.create_multipart_upload(
+                Bucket=bucket_name, Key=object_name, **params
+            )
+        return response["UploadId"]
+
+    def upload_part(self, bucket_name, object_name, upload_id, part_number, data):
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.upload_part(
+                Bucket=bucket_name,
+                Key=object_name,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+        return response["ETag"].replace('"', "")
+
+    def complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        with self._errors(bucket_name, object_name):
+            response = self.boto_client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=object_name,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": part_number, "ETag": etag}
+                        for part_number, etag in parts
+                    ]
+                },
+            )
+        return self._write_result(bucket_name, object_name, response)
+
+    def abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        with self._errors(bucket_name, object_name):
+            self.boto_client.abort_multipart_upload(
+                Bucket=bucket_name, Key=object_name, UploadId=upload_id
+            )
+
+    def presign_urls(self, bucket_name, object_names, expires, headers=None):
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + expires
+        params = {"Bucket": bucket_name}
+        for header, value in (headers or {}).items():
+            if header.lower() not in PRESIGN_RESPONSE_PARAMS:
+                raise ValueError(f"can't override the {header} header with boto3")
+            params[PRESIGN_RESPONSE_PARAMS[header.lower()]] = value
+        urls = {}
+        for object_name in object_names:
+            urls[object_name] = self.boto_client.generate_presigned_url(
+                "get_object",
+                Params=dict(params, Key=object_name),
+                ExpiresIn=int(expires.total_seconds()),
+            )
+        return urls, expires_at
+
+
+class _LocalStoreBackend(StorageBackend):
+    """the parts that LocalBackend and MemoryBackend have in common.
+
+    Subclasses store the data, the rest is built on:
+        _check_bucket(bucket_name)
+        _store(bucket_name, object_name, chunks, content_type, acl, etag)
+        _stat(bucket_name, object_name) -> (Object, acl)
+        _read(bucket_name, object_name, offset, length, chunk_size)
+        _iter_objects(bucket_name, prefix, start_after, delimiter)
+        _remove(bucket_name, object_name)
+        _set_acl(bucket_name, object_name, acl)
+        _store_part(upload_id, part_number, data), _iter_part(ref) and
+        _discard_parts(upload_id)
+    """
+
+    owner = "local"
+
+    def __init__(self):
+        # upload id -> (bucket, object name, content type, acl, parts) where
+        # parts is a dict of part number -> (etag, reference to the data)
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def put_object(
+        self,
+        bucket_name,
+        object_name,
+        local_path,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        with open(local_path, "rb") as fh:
+            return self.put_stream(
+                bucket_name, object_name, fh, content_type=content_type, acl=acl
+            )
+
+    def put_stream(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        length=-1,
+        part_size=DEFAULT_PART_SIZE,
+        content_type=DEFAULT_CONTENT_TYPE,
+        acl=None,
+    ):
+        _check_acl(acl, bucket_name, object_name)
+        return self._store(
+            bucket_name,
+            object_name,
+            _iter_stream(data, length),
+            content_type,
+            acl,
+        )
+
+    def get_object(self, bucket_name, object_name, local_path):
+        stat, _ = self._stat(bucket_name, object_name)
+        local_dir = os.path.dirname(os.path.abspath(local_path))
+        os.makedirs(local_dir, exist_ok=True)
+        tmp_fd, tmp_file = make_temp_file(
+            local_dir, prefix="." + os.path.basename(local_path)
+        )
+        try:
+            with os.fdopen(tmp_fd, "wb") as fh:
+                for chunk in self._read(bucket_name, object_name, 0, None, CHUNK_SIZE):
+                    fh.write(chunk)
+            os.replace(tmp_file, local_path)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        return stat
+
+    def iter_object(
+        self,
+        bucket_name,
+        object_name,
+        offset=0,
+        length=None,
+        etag=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        stat, _ = self._stat(bucket_name, object_name)
+        if etag and etag != stat.etag:
+            raise _s3_error(
+                "PreconditionFailed",
+                "At least one of the pre-conditions you specified did not hold",
+                bucket_name,
+                object_name,
+            )
+        if offset > stat.size or (offset == stat.size and stat.size):
+            raise _s3_error(
+                "InvalidRange",
+                "The requested range is not satisfiable",
+                bucket_name,
+                object_name,
+            )
+        yield from self._read(bucket_name, object_name, offset, length, chunk_size)
+
+    def stat_object(self, bucket_name, object_name):
+        return self._stat(bucket_name, object_name)[0]
+
+    def list_objects(self, bucket_name, prefix=None, delimiter=None, start_after=None):
+        self._check_bucket(bucket_name)
+        prefix = prefix or ""
+        return _delimit(
+            self._iter_objects(bucket_name, prefix, start_after or "", delimiter),
+            prefix,
+            delimiter,
+        )
+
+    def delete_object(self, bucket_name, object_name):
+        self._check_bucket(bucket_name)
+        # like S3, deleting an object that doesn't exist isn't an error
+        self._remove(bucket_name, object_name)
+
+    def delete_objects(self, bucket_name, object_names):
+        from minio.deleteobjects import DeleteError
+        from minio.error import S3Error
+
+        self._check_bucket(bucket_name)
+        errors = []
+        for object_name in object_names:
+            try:
+                self._remove(bucket_name, object_name)
+            except S3Error as err:
+                errors.append(DeleteError(err.code, err.message, object_name, None))
+            except OSError as err:
+                errors.append(DeleteError("InternalError", str(err), object_name, None))
+        return errors
+
+    def copy_object(self, bucket_name, object_name, src_bucket_name, src_object_name):
+        stat, _ = self._stat(src_bucket_name, src_object_name)
+        return self._store(
+            bucket_name,
+            object_name,
+            self._read(src_bucket_name, src_object_name, 0, None, CHUNK_SIZE),
+            stat.content_type or DEFAULT_CONTENT_TYPE,
+            None,
+        )
+
+    def get_object_acl(self, bucket_name, object_name):
+        _, acl = self._stat(bucket_name, object_name)
+        return _acl_policy(acl, self.owner)
+
+    def put_object_acl(self, bucket_name, object_name, acl):
+        _check_acl(acl, bucket_name, object_name)
+        self._stat(bucket_name, object_name)
+        self._set_acl(bucket_name, object_name, acl)
+
+    def create_multipart_upload(
+        self, bucket_name, object_name, content_type=DEFAULT_CONTENT_TYPE, acl=None
+    ):
+        self._check_bucket(bucket_name)
+        _check_acl(acl, bucket_name, object_name)
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = (bucket_name, object_name, content_type, acl, {})
+        return upload_id
+
+    def _get_upload(self, bucket_name, object_name, upload_id):
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        if upload is None or upload[:2] != (bucket_name, object_name):
+            raise _s3_error(
+                "NoSuchUpload",
+                "The specified multipart upload does not exist",
+                bucket_name,
+                object_name,
+            )
+        return upload
+
+    def upload_part(self, bucket_name, object_name, upload_id, part_number, data):
+        parts = self._get_upload(bucket_name, object_name, upload_id)[4]
+        ref = self._store_part(upload_id, part_number, data)
+        etag = hashlib.md5(data).hexdigest()
+        with self._lock:
+            parts[part_number] = (etag, ref)
+        return etag
+
+    def complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        _, _, content_type, acl, uploaded = self._get_upload(
+            bucket_name, object_name, upload_id
+        )
+        refs = []
+        for part_number, etag in parts:
+            if part_number not in uploaded or uploaded[part_number][0] != etag:
+                raise _s3_error(
+                    "InvalidPart",
+                    f"part {part_number} was not uploaded or its etag doesn't match",
+                    bucket_name,
+                    object_name,
+                )
+            refs.append(uploaded[part_number][1])
+        chunks = itertools.chain.from_iterable(self._iter_part(ref) for ref in refs)
+        result = self._store(
+            bucket_name,
+            object_name,
+            chunks,
+            content_type,
+            acl,
+            etag=_multipart_etag([etag for _, etag in parts]),
+        )
+        self.abort_multipart_upload(bucket_name, object_name, upload_id)
+        return result
+
+    def abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        self._get_upload(bucket_name, object_name, upload_id)
+        with self._lock:
+            del self._uploads[upload_id]
+        self._discard_parts(upload_id)
+
+
+class _MemoryObject:
+    __slots__ = ("data", "etag", "last_modified", "content_type", "acl")
+
+    def __init__(self, data, etag, last_modified, content_type, acl):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.acl = acl
+
+
+class MemoryBackend(_LocalStoreBackend):
+    """keeps the buckets and objects in memory, nothing is persisted.
+    Thread safe.
+    """
+
+    name = "memory"
+
+    def __init__(self, buckets=()):
+        """
+        :param buckets: the names of the buckets to create
+        :type buckets: iterable
+        """
+        _LocalStoreBackend.__init__(self)
+        # bucket -> (sorted list of the object names, dict of name -> object)
+        self._buckets = {}
+        for bucket_name in buckets:
+            self.make_bucket(bucket_name)
+
+    def __repr__(self):
+        return f"MemoryBackend(buckets={sorted(self._buckets)!r})"
+
+    def bucket_exists(self, bucket_name):
+        return bucket_name in self._buckets
+
+    def make_bucket(self, bucket_name):
+        with self._lock:
+            if bucket_name in self._buckets:
+                raise _s3_error(
+                    "BucketAlreadyOwnedByYou", "bucket already exists", bucket_name
+                )
+            self._buckets[bucket_name] = ([], {})
+
+    def _check_bucket(self, bucket_name):
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            raise _s3_error(
+                "NoSuchBucket", "The specified bucket does not exist", bucket_name
+            )
+        return bucket
+
+    def _get(self, bucket_name, object_name):
+        obj = self._check_bucket(bucket_name)[1].get(object_name)
+        if obj is None:
+            raise _s3_error(
+                "NoSuchKey",
+                "The specified key does not exist.",
+                bucket_name,
+                object_name,
+            )
+        return obj
+
+    @staticmethod
+    def _object(bucket_name, object_name, obj):
+        from minio.datatypes import Object
+
+        return Object(
+            bucket_name,
+            object_name,
+            last_modified=obj.last_modified,
+            etag=obj.etag,
+            size=len(obj.data),
+            content_type=obj.content_type,
+        )
+
+    def _store(self, bucket_name, object_name, chunks, content_type, acl, etag=None):
+        names, objects = self._check_bucket(bucket_name)
+        data = b"".join(chunks)
+        obj = _MemoryObject(
+            data,
+            etag or hashlib.md5(data).hexdigest(),
+            datetime.datetime.now(datetime.timezone.utc),
+            content_type,
+            acl,
+        )
+        with self._lock:
+            if object_name not in objects:
+                bisect.insort(names, object_name)
+            objects[object_name] = obj
+        return _write_result(bucket_name, object_name, obj.etag)
+
+    def _stat(self, bucket_name, object_name):
+        obj = self._get(bucket_name, object_name)
+        return self._object(bucket_name, object_name, obj), obj.acl
+
+    def _read(self, bucket_name, object_name, offset, length, chunk_size):
+        data = memoryview(self._get(bucket_name, object_name).data)
+        end = len(data) if length is None else min(offset + length, len(data))
+        for pos in range(offset, end, chunk_size):
+            chunk_end = min(pos + chunk_size, end)
+            yield bytes(data[pos:chunk_end])
+
+    def _iter_objects(self, bucket_name, prefix, start_after, delimiter):
+        names, objects = self._check_bucket(bucket_name)
+        with self._lock:
+            if start_after >= prefix:
+                start = bisect.bisect_right(names, start_after)
+            else:
+                start = bisect.bisect_left(names, prefix)
+            matching = []
+            for object_name in itertools.islice(names, start, None):
+                if not object_name.startswith(prefix):
+                    break
+                matching.append((object_name, objects[object_name]))
+        for object_name, obj in matching:
+            yield self._object(bucket_name, object_name, obj)
+
+    def _remove(self, bucket_name, object_name):
+        names, objects = self._check_bucket(bucket_name)
+        with self._lock:
+            if objects.pop(object_name, None) is not None:
+                del names[bisect.bisect_left(names, object_name)]
+
+    def _set_acl(self, bucket_name, object_name, acl):
+        self._get(bucket_name, object_name).acl = acl
+
+    def _store_part(self, upload_id, part_number, data):
+        return bytes(data)
+
+    def _iter_part(self, ref):
+        yield ref
+
+    def _discard_parts(self, upload_id):
+        pass
+
+
+class LocalBackend(_LocalStoreBackend):
+    """stores the objects as files on the local file system.
+
+    Each bucket is a directory under `root` and each object a file at the
+    path of its name, so the data can be used directly by other programs.
+    The etag, content type and ACL of the objects are kept in json files
+    under root/.nrutil/meta, files that are added to the buckets by other
+    means are hashed the first time they are listed or stat'ed.
+
+    Object names have to be valid relative paths: names that are absolute,
+    contain empty, . or .. segments or end with / are rejected, and a name
+    can't be both an object and the directory of other objects.
+    """
+
+    name = "local"
+    # the directory under root with the metadata, in progress writes and
+    # multipart uploads.  Not a valid bucket name so it can't clash with one.
+    state_dir = ".nrutil"
+
+    def __init__(self, root, buckets=()):
+        """
+        :param root: the directory the buckets are created in
+        :type root: str
+        :param buckets: the names of the buckets to create if they don't
+            exist yet
+        :type buckets: iterable
+        """
+        _LocalStoreBackend.__init__(self)
+        self.root = os.path.abspath(root)
+        self._meta_dir = os.path.join(self.root, self.state_dir, "meta")
+        self._tmp_dir = os.path.join(self.root, self.state_dir, "tmp")
+        self._uploads_dir = os.path.join(self.root, self.state_dir, "uploads")
+        for directory in (self._meta_dir, self._tmp_dir, self._uploads_dir):
+            os.makedirs(directory, exist_ok=True)
+        for bucket_name in buckets:
+            if not self.bucket_exists(bucket_name):
+                self.make_bucket(bucket_name)
+
+    def __repr__(self):
+        return f"LocalBackend(root={self.root!r})"
+
+    def _bucket_path(self, bucket_name):
+        if not bucket_name or bucket_name.startswith(".") or "/" in bucket_name:
+            raise _s3_error(
+                "InvalidBucketName", "The specified bucket is not valid", bucket_name
+            )
+        return os.path.join(self.root, bucket_name)
+
+    def _paths(self, bucket_name, object_name):
+        """returns the path of the data and of the metadata of an object"""
+        segments = object_name.split("/")
+        if not object_name or any(segment in ("", ".", "..") for segment in segments):
+            raise _s3_error(
+                "InvalidArgument",
+                f"{object_name!r} can't be stored on the file system",
+                bucket_name,
+                object_name,
+            )
+        data_path = os.path.join(self._bucket_path(bucket_name), *segments)
+        meta_path = os.path.join(self._meta_dir, bucket_name, *segments) + ".json"
+        return data_path, meta_path
+
+    def bucket_exists(self, bucket_name):
+        return os.path.isdir(self._bucket_path(bucket_name))
+
+    def make_bucket(self, bucket_name):
+        try:
+            os.mkdir(self._bucket_path(bucket_name))
+        except FileExistsError:
+            raise _s3_error(
+                "BucketAlreadyOwnedByYou", "bucket already exists", bucket_name
+            ) from None
+
+    def _check_bucket(self, bucket_name):
+        if not self.bucket_exists(bucket_name):
+            raise _s3_error(
+                "NoSuchBucket", "The specified bucket does not exist", bucket_name
+            )
+
+    def _no_such_key(self, bucket_name, object_name):
+        return _s3_error(
+            "NoSuchKey", "The specified key does not exist.", bucket_name, object_name
+        )
+
+    def _store(self, bucket_name, object_name, chunks, content_type, acl, etag=None):
+        self._check_bucket(bucket_name)
+        data_path, meta_path = self._paths(bucket_name, object_name)
+        # written next to the other in progress writes and moved into place
+        # once complete, so readers never see a partial object
+        tmp_fd, tmp_file = make_temp_file(self._tmp_dir)
+        try:
+            md5 = hashlib.md5()
+            with os.fdopen(tmp_fd, "wb") as fh:
+                for chunk in chunks:
+                    md5.update(chunk)
+                    fh.write(chunk)
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            os.replace(tmp_file, data_path)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        etag = etag or md5.hexdigest()
+        self._write_meta(data_path, meta_path, etag, content_type, acl)
+        return _write_result(bucket_name, object_name, etag)
+
+    @staticmethod
+    def _write_meta(data_path, meta_path, etag, content_type, acl):
+        stat = os.stat(data_path)
+        meta = {
+            "etag": etag,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content_type": content_type,
+            "acl": acl,
+        }
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        tmp_meta = f"{meta_path}.{uuid.uuid4().hex}"
+        with open(tmp_meta, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_meta, meta_path)
+        return meta
+
+    def _read_meta(self, data_path, meta_path, stat):
+        """returns the metadata of an object, rehashing the file if it has
+        been changed since the metadata was written
+        """
+        try:
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            meta = None
+        if (
+            meta is not None
+            and meta["size"] == stat.st_size
+            and meta["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return meta
+        LOGGER.debug(f"hashing {data_path}, it was changed outside of the backend")
+        md5 = hashlib.md5()
+        with open(data_path, "rb") as fh:
+            for chunk in iter(functools.partial(fh.read, CHUNK_SIZE), b""):
+                md5.update(chunk)
+        content_type = meta["content_type"] if meta else DEFAULT_CONTENT_TYPE
+        acl = meta["acl"] if meta else None
+        return self._write_meta(
+            data_path, meta_path, md5.hexdigest(), content_type, acl
+        )
+
+    def _object(self, bucket_name, object_name, data_path, meta_path, stat=None):
+        from minio.datatypes import Object
+
+        if stat is None:
+            try:
+                stat = os.stat(data_path)
+            except (FileNotFoundError, NotADirectoryError):
+                raise self._no_such_key(bucket_name, object_name) from None
+            if not os.path.isfile(data_path):
+                raise self._no_such_key(bucket_name, object_name)
+        meta = self._read_meta(data_path, meta_path, stat)
+        obj = Object(
+            bucket_name,
+            object_name,
+            last_modified=datetime.datetime.fromtimestamp(
+                stat.st_mtime, datetime.timezone.utc
+            ),
+            etag=meta["etag"],
+            size=stat.st_size,
+            content_type=meta["content_type"],
+        )
+        return obj, meta["acl"]
+
+    def _stat(self, bucket_name, object_name):
+        self._check_bucket(bucket_name)
+        data_path, meta_path = self._paths(bucket_name, object_name)
+        return self._object(bucket_name, object_name, data_path, meta_path)
+
+    def _read(self, bucket_name, object_name, offset, length, chunk_size):
+        data_path, _ = self._paths(bucket_name, object_name)
+        try:
+            fh = open(data_path, "rb")
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            raise self._no_such_key(bucket_name, object_name) from None
+        with fh:
+            fh.seek(offset)
+            yield from _iter_stream(fh, -1 if length is None else length, chunk_size)
+
+    def _iter_objects(self, bucket_name, prefix, start_after, delimiter):
+        # start in the deepest directory that contains all the names that
+        # start with the prefix
+        dir_key = prefix[: prefix.rfind("/") + 1]
+        path = os.path.join(self._bucket_path(bucket_name), *dir_key.split("/"))
+        yield from self._walk(
+            bucket_name, path, dir_key, prefix, start_after, delimiter == "/"
+        )
+
+    def _walk(self, bucket_name, path, dir_key, prefix, start_after, shallow):
+        """yields the objects in path and its sub directories in key order.
+        With shallow the sub directories that match the prefix are yielded
+        as directory entries instead.
+        """
+        from minio.datatypes import Object
+
+        try:
+            with os.scandir(path) as entries:
+                names = []
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        names.append((dir_key + entry.name + "/", entry, True))
+                    elif entry.is_file():
+                        names.append((dir_key + entry.name, entry, False))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        # sorting the directories by their name with the trailing / puts the
+        # names in the same order as the keys in the bucket
+        names.sort(key=operator.itemgetter(0))
+        meta_dir = os.path.join(self._meta_dir, bucket_name)
+        for key, entry, is_dir in names:
+            if is_dir:
+                if not (key.startswith(prefix) or prefix.startswith(key)):
+                    continue
+                # every name in the directory sorts before start_after
+                if key < start_after and not start_after.startswith(key):
+                    continue
+                if shallow and key.startswith(prefix):
+                    yield Object(bucket_name, key)
+                else:
+                    yield from self._walk(
+                        bucket_name, entry.path, key, prefix, start_after, shallow
+                    )
+            elif key.startswith(prefix) and key > start_after:
+                meta_path = os.path.join(meta_dir, *key.split("/")) + ".json"
+                yield self._object(
+                    bucket_name, key, entry.path, meta_path, stat=entry.stat()
+                )[0]
+
+    def _remove(self, bucket_name, object_name):
+        data_path, meta_path = self._paths(bucket_name, object_name)
+        for path, top in (
+            (data_path, self._bucket_path(bucket_name)),
+            (meta_path, os.path.join(self._meta_dir, bucket_name)),
+        ):
+            try:
+                os.remove(path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            except IsADirectoryError:
+                # a "directory" of other objects, not an object
+                return
+            # like S3 there are no directories without objects in them
+            _remove_empty_dirs(os.path.dirname(path), top)
+
+    def _set_acl(self, bucket_name, object_name, acl):
+        data_path, meta_path = self._paths(bucket_name, object_name)
+        meta = self._read_meta(data_path, meta_path, os.stat(data_path))
+        self._write_meta(data_path, meta_path, meta["etag"], meta["content_type"], acl)
+
+    def _store_part(self, upload_id, part_number, data):
+        upload_dir = os.path.join(self._uploads_dir, upload_id)
+        os.makedirs(upload_dir, exist_ok=True)
+        part_path = os.path.join(upload_dir, str(part_number))
+        with open(part_path, "wb") as fh:
+            fh.write(data)
+        return part_path
+
+    def _iter_part(self, ref):
+        with open(ref, "rb") as fh:
+            yield from _iter_stream(fh)
+
+    def _discard_parts(self, upload_id):
+        shutil.rmtree(os.path.join(self._uploads_dir, upload_id), ignore_errors=True)
+
+
+def _remove_empty_dirs(path, top):
+    """removes path and its parents, up to but not including top, while they
+    are empty
+    """
+    while os.path.normpath(path) != os.path.normpath(top):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
@@ -0,0 +1,213 @@
+""" Connection pool configuration and a process wide registry of object store
+clients.
+
+Creating a minio or boto3 client creates a new pool of http connections.
+Instead the clients are created once per endpoint / credentials / pool
+configuration and shared by every ObjectStoreUtil (and subclass) instance in
+the process, so connections that have already been opened (and have already
+done their TLS handshake) are reused.
+
+The client libraries are imported when the first client is created rather
+than when this module is imported, boto3 in particular is slow to import and
+is only needed for the ACL methods.
+"""
+
+import hashlib
+import logging
+import os
+import socket
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ConnectionPoolConfig:
+    """settings for the http connection pools used by the object store
+    clients.  Instances are immutable so they can be used as part of the
+    client registry key.
+    """
+
+    __slots__ = (
+        "pool_size",
+        "keep_alive",
+        "connect_timeout",
+        "read_timeout",
+        "retries",
+        "backoff_factor",
+        "secure",
+    )
+
+    def __init__(
+        self,
+        pool_size=10,
+        keep_alive=True,
+        connect_timeout=60,
+        read_timeout=300,
+        retries=5,
+        backoff_factor=0.2,
+        secure=True,
+    ):
+        """
+        :param pool_size: the maximum number of connections kept open to the
+            object store host, should be at least the number of threads that
+            use the client at the same time
+        :type pool_size: int
+        :param keep_alive: enable tcp keep alive on the pooled connections so
+            idle connections are not dropped by firewalls / load balancers
+        :type keep_alive: bool
+        :param connect_timeout: seconds to wait for a connection to be made
+        :type connect_timeout: float
+        :param read_timeout: seconds to wait for data from the server
+        :type read_timeout: float
+        :param retries: the number of times a failed request (connection
+            errors and 500, 502, 503, 504 responses) is retried
+        :type retries: int
+        :param backoff_factor: the factor used to calculate the delay between
+            retries, see urllib3.util.Retry
+        :type backoff_factor: float
+        :param secure: use https to connect to the object store
+        :type secure: bool
+        """
+        for attr, value in (
+            ("pool_size", pool_size),
+            ("keep_alive", keep_alive),
+            ("connect_timeout", connect_timeout),
+            ("read_timeout", read_timeout),
+            ("retries", retries),
+            ("backoff_factor", backoff_factor),
+            ("secure", secure),
+        ):
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConnectionPoolConfig is immutable")
+
+    def _key(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, ConnectionPoolConfig):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        params = ", ".join(f"{attr}={getattr(self, attr)!r}" for attr in self.__slots__)
+        return f"ConnectionPoolConfig({params})"
+
+    def http_client(self):
+        """creates the urllib3 PoolManager used by the minio client, same as
+        the default minio creates but with these settings
+        """
+        import certifi
+        import urllib3
+
+        socket_options = list(urllib3.connection.HTTPConnection.default_socket_options)
+        if self.keep_alive:
+            socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        return urllib3.PoolManager(
+            timeout=urllib3.util.Timeout(
+                connect=self.connect_timeout, read=self.read_timeout
+            ),
+            maxsize=self.pool_size,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            socket_options=socket_options,
+            retries=urllib3.util.Retry(
+                total=self.retries,
+                backoff_factor=self.backoff_factor,
+                status_forcelist=[500, 502, 503, 504],
+            ),
+        )
+
+    def botocore_config(self):
+        """creates the botocore Config used by the boto3 client"""
+        import botocore.config
+
+        return botocore.config.Config(
+            max_pool_connections=self.pool_size,
+            tcp_keepalive=self.keep_alive,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={"total_max_attempts": self.retries + 1, "mode": "standard"},
+        )
+
+
+DEFAULT_POOL_CONFIG = ConnectionPoolConfig()
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(kind, host, user, secret, pool_config):
+    # the secret is hashed so it isn't kept around as part of the key
+    secret_hash = hashlib.sha256((secret or "").encode("utf8")).hexdigest()
+    return (kind, host, user, secret_hash, pool_config)
+
+
+def get_minio_client(host, user, secret, pool_config=None):
+    """returns the shared minio client for the host / credentials, creating
+    it if it doesn't exist yet.
+
+    :param pool_config: the connection pool settings, defaults to
+        DEFAULT_POOL_CONFIG
+    :type pool_config: ConnectionPoolConfig
+    :rtype: minio.Minio
+    """
+    if pool_config is None:
+        pool_config = DEFAULT_POOL_CONFIG
+    key = _registry_key("minio", host, user, secret, pool_config)
+    with _registry_lock:
+        if key not in _registry:
+            import minio
+
+            LOGGER.debug(f"creating minio client for {host}, {pool_config}")
+            _registry[key] = minio.Minio(
+                host,
+                user,
+                secret,
+                secure=pool_config.secure,
+                http_client=pool_config.http_client(),
+            )
+        return _registry[key]
+
+
+def get_boto_client(host, user, secret, pool_config=None):
+    """returns the shared boto3 s3 client for the host / credentials,
+    creating it if it doesn't exist yet.  boto3 clients are thread safe,
+    boto3 sessions are not, so the session is only used while holding the
+    registry lock.
+
+    :param pool_config: the connection pool settings, defaults to
+        DEFAULT_POOL_CONFIG
+    :type pool_config: ConnectionPoolConfig
+    """
+    if pool_config is None:
+        pool_config = DEFAULT_POOL_CONFIG
+    key = _registry_key("boto", host, user, secret, pool_config)
+    with _registry_lock:
+        if key not in _registry:
+            import boto3
+
+            LOGGER.debug(f"creating boto3 client for {host}, {pool_config}")
+            scheme = "https" if pool_config.secure else "http"
+            # aws_access_key_id - A specific AWS access key ID.
+            # aws_secret_access_key - A specific AWS secret access key.
+            _registry[key] = boto3.session.Session().client(
+                service_name="s3",
+                aws_access_key_id=user,
+                aws_secret_access_key=secret,
+                endpoint_url=f"{scheme}://{host}",
+                config=pool_config.botocore_config(),
+            )
+        return _registry[key]
+
+
+def clear_registry():
+    """forgets all the shared clients, new clients are created on the next
+    request for one
+    """
+    with _registry_lock:
+        _registry.clear()
@@ -1,20 +1,51 @@
-""" Declaring constants used by the archive script. """
+""" Declaring constants used by the archive script.
+
+The constants are resolved lazily, importing this module doesn't read any
+files or environment variables.  The first time one of the constants is
+accessed the .env file next to this module is loaded (if it exists), after
+that the constants are read from the environment variables with the same
+name.  A constant that isn't defined in the environment raises an
+AttributeError, so hasattr() can be used to test for optional constants.
+"""
 
 import logging
 import os
 import sys
 
-import dotenv
-
 LOGGER = logging.getLogger(__name__)
 
-envPath = os.path.join(os.path.dirname(__file__), '.env')
+envPath = os.path.join(os.path.dirname(__file__), ".env")
 
 module = sys.modules[__name__]
 
-if os.path.exists(envPath):
-    print("loading dot env...")
-    dotenv.load_dotenv()
+# searching for default object store env variables and populate into constants
+# if they exist
+ostore_env_vars_names = [
+    "OBJ_STORE_BUCKET",
+    "OBJ_STORE_SECRET",
+    "OBJ_STORE_USER",
+    "OBJ_STORE_HOST",
+]
+
+# other optional params
+optionals = ["TEST_OBJ_NAME"]
+
+_dotenv_loaded = False
+
+
+def load_dotenv():
+    """loads the .env file that sits next to this module into the
+    environment, only the first call does anything.
+    """
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    if os.path.exists(envPath):
+        import dotenv
+
+        LOGGER.debug(f"loading dot env: {envPath}")
+        dotenv.load_dotenv(envPath)
 
 
 def set_properties(env_var_names: list):
@@ -28,12 +59,13 @@ def set_properties(env_var_names: list):
         if env_var_name in os.environ:
             setattr(module, env_var_name, os.environ[env_var_name])
 
-# searching for default object store env variables and populate into constants
-# if they exist
-ostore_env_vars_names = ['OBJ_STORE_BUCKET', 'OBJ_STORE_SECRET',
-                         'OBJ_STORE_USER', 'OBJ_STORE_HOST']
-set_properties(ostore_env_vars_names)
 
-# other optional params
-optionals = ['TEST_OBJ_NAME']
-set_properties(optionals)
+def __getattr__(name):
+    """resolves the constants that haven't been set explicitly with
+    set_properties from the environment
+    """
+    if name in ostore_env_vars_names or name in optionals:
+        load_dotenv()
+        if name in os.environ:
+            return os.environ[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
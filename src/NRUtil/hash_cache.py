@@ -0,0 +1,188 @@
+""" Persistent cache of the md5 / multipart etag digests calculated for local
+files.
+
+Digests are stored against the device, inode, size and modified time (in
+nanoseconds) of the file they were calculated for.  As long as none of those
+have changed the file is assumed to have the same content and the cached
+digest is returned without reading the file.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+# the kind recorded for a plain md5 digest, multipart etags are recorded under
+# the part size that was used to calculate them
+MD5_KIND = "md5"
+
+
+def default_cache_path():
+    """returns the default location of the hash cache database"""
+    return os.path.join(
+        os.path.expanduser("~"), ".cache", "nr_objstore_util", "hash_cache.sqlite"
+    )
+
+
+class HashCache:
+    """sqlite backed cache of file digests keyed by
+    (device, inode, size, mtime_ns).
+
+    The object is safe to share between threads.  The number of lookups that
+    were answered from the cache and the number that were not are available
+    in the `hits` and `misses` properties.
+    """
+
+    def __init__(self, cache_path=None, commit_every=500):
+        """
+        :param cache_path: path to the sqlite file used to store the digests,
+            created if it doesn't exist.  Defaults to default_cache_path()
+        :type cache_path: str
+        :param commit_every: number of digests to write between commits
+        :type commit_every: int
+        """
+        if cache_path is None:
+            cache_path = default_cache_path()
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_path = cache_path
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                + "dev INTEGER NOT NULL, ino INTEGER NOT NULL, kind TEXT NOT NULL, "
+                + "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                + "path TEXT NOT NULL, digest TEXT NOT NULL, "
+                + "PRIMARY KEY (dev, ino, kind)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+
+    def get(self, local_stat, kinds):
+        """looks up the cached digests of a file
+
+        :param local_stat: the os.stat_result of the file
+        :param kinds: iterable of the digest kinds to look up, a part size or
+            None / MD5_KIND for the plain md5
+        :return: dict of kind -> digest for the kinds that were found, kinds
+            that were not found are counted as misses
+        :rtype: dict
+        """
+        found = {}
+        with self._lock:
+            for kind in kinds:
+                row = self._conn.execute(
+                    "SELECT digest FROM hashes WHERE dev = ? AND ino = ? "
+                    + "AND kind = ? AND size = ? AND mtime_ns = ?",
+                    (
+                        local_stat.st_dev,
+                        local_stat.st_ino,
+                        self._kind(kind),
+                        local_stat.st_size,
+                        local_stat.st_mtime_ns,
+                    ),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[kind] = row[0]
+        return found
+
+    def put(self, local_path, local_stat, digests):
+        """stores the digests calculated for a file
+
+        :param local_path: path to the file, used to evict the entry once the
+            file has been deleted
+        :param local_stat: the os.stat_result of the file taken before the
+            digests were calculated
+        :param digests: dict of kind -> digest
+        """
+        rows = [
+            (
+                local_stat.st_dev,
+                local_stat.st_ino,
+                self._kind(kind),
+                local_stat.st_size,
+                local_stat.st_mtime_ns,
+                os.path.abspath(local_path),
+                digest,
+            )
+            for kind, digest in digests.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._pending += len(rows)
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def evict_missing(self):
+        """removes the entries for files that have been deleted or have
+        changed since their digests were calculated
+
+        :return: the number of entries that were removed
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT dev, ino, size, mtime_ns, path FROM hashes"
+            ).fetchall()
+        stale = []
+        for dev, ino, size, mtime_ns, path in rows:
+            try:
+                local_stat = os.stat(path)
+            except OSError:
+                local_stat = None
+            if local_stat is None or (
+                local_stat.st_dev,
+                local_stat.st_ino,
+                local_stat.st_size,
+                local_stat.st_mtime_ns,
+            ) != (dev, ino, size, mtime_ns):
+                stale.append((dev, ino, size, mtime_ns))
+        with self._lock:
+            evicted = 0
+            for key in stale:
+                evicted += self._conn.execute(
+                    "DELETE FROM hashes WHERE dev = ? AND ino = ? AND size = ? "
+                    + "AND mtime_ns = ?",
+                    key,
+                ).rowcount
+            self._commit()
+        LOGGER.info(f"evicted {evicted} entries from the hash cache")
+        return evicted
+
+    def stats(self):
+        """returns a dict with the hit / miss counts and the number of cached
+        digests
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def flush(self):
+        """commits any digests that have not been written yet"""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    @staticmethod
+    def _kind(kind):
+        if kind is None:
+            return MD5_KIND
+        return str(kind)
@@ -0,0 +1,311 @@
+""" Hooks that are called at the start and end of object store operations.
+
+A hook is any object with `on_start(event)` and `on_end(event)` methods,
+InstrumentationHook can be used as a base class.  Hooks are registered on an
+ObjectStoreUtil with add_hook, when no hooks are registered the operations
+don't build any events so the instrumentation costs nothing.
+
+The event passed to the hooks is an OperationEvent with the operation name,
+bucket, key, the number of bytes transferred, the duration in seconds, the
+number of retries and the outcome ("ok" or "error").  duration and outcome
+are None when on_start is called.
+
+Two hooks are provided:
+    MetricsAggregator - keeps counts, bytes, retries and a latency histogram
+        per operation / outcome in memory
+    PrometheusExporter - renders the metrics of a MetricsAggregator in the
+        prometheus text format, eg to be picked up by the node exporter's
+        textfile collector at the end of a batch job
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+import uuid
+
+LOGGER = logging.getLogger(__name__)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+
+# upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class OperationEvent:
+    """a single operation, passed to the hooks"""
+
+    __slots__ = (
+        "operation",
+        "bucket",
+        "key",
+        "bytes",
+        "duration",
+        "retries",
+        "outcome",
+        "error",
+    )
+
+    def __init__(self, operation, bucket=None, key=None):
+        self.operation = operation
+        self.bucket = bucket
+        self.key = key
+        self.bytes = 0
+        self.duration = None
+        self.retries = 0
+        self.outcome = None
+        self.error = None
+
+    def __repr__(self):
+        return (
+            f"OperationEvent(operation={self.operation!r}, key={self.key!r}, "
+            + f"bytes={self.bytes}, duration={self.duration}, "
+            + f"retries={self.retries}, outcome={self.outcome!r})"
+        )
+
+
+class InstrumentationHook:
+    """base class for hooks, both methods do nothing"""
+
+    def on_start(self, event):
+        pass
+
+    def on_end(self, event):
+        pass
+
+
+class _Operation:
+    """context manager that times an operation and calls the hooks.  The
+    code running the operation sets the bytes / retries on it.
+    """
+
+    __slots__ = ("event", "hooks", "_start")
+
+    def __init__(self, hooks, operation, bucket, key):
+        self.hooks = hooks
+        self.event = OperationEvent(operation, bucket, key)
+        self._start = None
+
+    @property
+    def bytes(self):
+        return self.event.bytes
+
+    @bytes.setter
+    def bytes(self, value):
+        self.event.bytes = value
+
+    @property
+    def retries(self):
+        return self.event.retries
+
+    @retries.setter
+    def retries(self, value):
+        self.event.retries = value
+
+    def __enter__(self):
+        _call_hooks(self.hooks, "on_start", self.event)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.event.duration = time.perf_counter() - self._start
+        if exc is None:
+            self.event.outcome = OUTCOME_OK
+        else:
+            self.event.outcome = OUTCOME_ERROR
+            self.event.error = exc
+        _call_hooks(self.hooks, "on_end", self.event)
+        return False
+
+
+class _NullOperation:
+    """stands in for _Operation when there are no hooks, ignores everything"""
+
+    __slots__ = ()
+    bytes = 0
+    retries = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_OPERATION = _NullOperation()
+
+
+def operation(hooks, name, bucket=None, key=None):
+    """returns the context manager used to instrument an operation
+
+    :param hooks: the registered hooks, if empty a shared no-op context
+        manager is returned
+    :type hooks: list
+    """
+    if not hooks:
+        return NULL_OPERATION
+    return _Operation(hooks, name, bucket, key)
+
+
+def _call_hooks(hooks, method, event):
+    # a broken hook shouldn't break the operation it is observing
+    for hook in hooks:
+        try:
+            getattr(hook, method)(event)
+        except Exception:
+            LOGGER.exception(f"instrumentation hook {hook!r} failed")
+
+
+class _OperationStats:
+    __slots__ = ("count", "bytes", "retries", "duration", "bucket_counts")
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.bytes = 0
+        self.retries = 0
+        self.duration = 0.0
+        # the last slot counts the durations above the largest bucket
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+
+class MetricsAggregator(InstrumentationHook):
+    """thread safe, in memory aggregation of the operations by operation name
+    and outcome
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: the upper bounds, in seconds, of the latency
+            histogram buckets
+        :type buckets: tuple
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def on_end(self, event):
+        key = (event.operation, event.outcome)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _OperationStats(self.buckets)
+            stats.count += 1
+            stats.bytes += event.bytes or 0
+            stats.retries += event.retries or 0
+            stats.duration += event.duration
+            stats.bucket_counts[bisect.bisect_left(self.buckets, event.duration)] += 1
+
+    def snapshot(self):
+        """returns the metrics collected so far
+
+        :return: dict of (operation, outcome) -> dict with count, bytes,
+            retries, duration (the total seconds) and buckets (list of
+            cumulative counts, one per histogram bucket)
+        :rtype: dict
+        """
+        with self._lock:
+            snapshot = {}
+            for key, stats in self._stats.items():
+                cumulative = []
+                total = 0
+                for count in stats.bucket_counts[:-1]:
+                    total += count
+                    cumulative.append(total)
+                snapshot[key] = {
+                    "count": stats.count,
+                    "bytes": stats.bytes,
+                    "retries": stats.retries,
+                    "duration": stats.duration,
+                    "buckets": cumulative,
+                }
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class PrometheusExporter:
+    """renders the metrics of a MetricsAggregator in the prometheus text
+    exposition format
+    """
+
+    def __init__(self, aggregator, prefix="nrutil_ostore"):
+        """
+        :param aggregator: the aggregator to export
+        :type aggregator: MetricsAggregator
+        :param prefix: prefix of the metric names
+        :type prefix: str
+        """
+        self.aggregator = aggregator
+        self.prefix = prefix
+
+    def render(self):
+        """returns the metrics as a string"""
+        snapshot = self.aggregator.snapshot()
+        prefix = self.prefix
+        lines = []
+        for metric, metric_type, help_text, field in (
+            (
+                "operations_total",
+                "counter",
+                "object store operations",
+                "count",
+            ),
+            ("bytes_total", "counter", "bytes transferred", "bytes"),
+            ("retries_total", "counter", "retried requests", "retries"),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            for (operation_name, outcome), stats in sorted(snapshot.items()):
+                labels = _labels(operation=operation_name, outcome=outcome)
+                lines.append(f"{prefix}_{metric}{{{labels}}} {stats[field]}")
+
+        name = f"{prefix}_operation_duration_seconds"
+        lines.append(f"# HELP {name} duration of the object store operations")
+        lines.append(f"# TYPE {name} histogram")
+        for (operation_name, outcome), stats in sorted(snapshot.items()):
+            labels = _labels(operation=operation_name, outcome=outcome)
+            for bound, count in zip(self.aggregator.buckets, stats["buckets"]):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f"{name}_sum{{{labels}}} {stats['duration']}")
+            lines.append(f"{name}_count{{{labels}}} {stats['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """writes the metrics to a file, atomically so a collector never
+        reads a partial file
+
+        :param path: the file to write, eg a .prom file in the node
+            exporter's textfile collector directory
+        :type path: str
+        """
+        # created 0644 less the umask (mkstemp would make it 0600) so the
+        # collector, which usually runs as another user, can read it.  The
+        # .tmp suffix keeps the collector from picking up the partial file
+        tmp_path = f"{os.path.abspath(path)}.{uuid.uuid4().hex}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            with os.fdopen(fd, "w") as fh:
+                fh.write(self.render())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _labels(**labels):
+    return ",".join(
+        f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
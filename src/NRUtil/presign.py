@@ -0,0 +1,240 @@
+""" Batch generation of presigned urls.
+
+minio's get_presigned_url looks up the credentials and derives the signature
+V4 signing key (four chained HMACs of the date, region and service) for every
+url.  presign_urls signs a whole batch of objects with one request date, so
+the credentials, region and signing key are worked out once per batch and
+each url only costs the hashing of its own canonical request.
+
+The signing uses minio internals, which aren't part of its public api.  If a
+minio release doesn't have them presign_urls falls back to calling
+get_presigned_url for each object.
+
+PresignedURLCache keeps the urls that have been handed out so that repeated
+requests for the same object return the existing url while it still has
+enough of its validity left, instead of signing a new one.
+"""
+
+import collections
+import datetime
+import logging
+import threading
+from urllib.parse import urlunsplit
+
+LOGGER = logging.getLogger(__name__)
+
+# limits imposed by signature V4 on the expiry of a presigned url
+MIN_EXPIRES = datetime.timedelta(seconds=1)
+MAX_EXPIRES = datetime.timedelta(days=7)
+
+# the minio internals presign_urls signs with, written against minio 7.2
+SIGNER_FUNCS = (
+    "_get_scope",
+    "_get_signing_key",
+    "_get_presign_canonical_request_hash",
+    "_get_string_to_sign",
+    "_get_signature",
+    "queryencode",
+)
+CLIENT_ATTRS = ("_base_url", "_get_region", "_provider")
+
+
+def as_timedelta(expires):
+    """converts an expiry given as seconds (int / float) or a timedelta to a
+    timedelta
+
+    :raises ValueError: raised if the expiry is outside of the 1 second to 7
+        days allowed for presigned urls
+    """
+    if not isinstance(expires, datetime.timedelta):
+        expires = datetime.timedelta(seconds=expires)
+    if expires < MIN_EXPIRES or expires > MAX_EXPIRES:
+        raise ValueError("expires must be between 1 second to 7 days")
+    return expires
+
+
+def has_signer_internals(minio_client):
+    """True if minio_client, and the minio release it comes from, have the
+    internals that presign_urls uses to sign a batch with one signing key
+    """
+    from minio import signer
+
+    return all(hasattr(signer, name) for name in SIGNER_FUNCS) and all(
+        hasattr(minio_client, name) for name in CLIENT_ATTRS
+    )
+
+
+def presign_urls(
+    minio_client,
+    bucket_name,
+    object_names,
+    expires,
+    headers=None,
+    method="GET",
+    request_date=None,
+):
+    """creates presigned urls for several objects in a bucket
+
+    :param minio_client: the client whose endpoint and credentials are used
+    :type minio_client: minio.Minio
+    :param bucket_name: the bucket the objects are in
+    :type bucket_name: str
+    :param object_names: iterable of the object names to sign
+    :param expires: how long the urls are valid for
+    :type expires: datetime.timedelta
+    :param headers: response headers to override, eg
+        {"response-content-type": "application/json"}
+    :type headers: dict
+    :param method: the http method the urls are for
+    :type method: str
+    :param request_date: the time the urls are signed at, defaults to now
+    :type request_date: datetime.datetime
+    :return: dict of object name -> url, and the time the urls expire
+    :rtype: tuple(dict, datetime.datetime)
+    """
+    from minio import signer, time
+    from minio.helpers import check_bucket_name, check_object_name
+
+    expires_seconds = int(as_timedelta(expires).total_seconds())
+    if request_date is None:
+        request_date = time.utcnow()
+    expires_at = request_date + datetime.timedelta(seconds=expires_seconds)
+    if not has_signer_internals(minio_client):
+        LOGGER.debug("minio signer internals not found, signing each url")
+        urls = {
+            object_name: minio_client.get_presigned_url(
+                method,
+                bucket_name,
+                object_name,
+                expires=datetime.timedelta(seconds=expires_seconds),
+                response_headers=headers,
+                request_date=request_date,
+            )
+            for object_name in object_names
+        }
+        return urls, expires_at
+
+    check_bucket_name(bucket_name, s3_check=minio_client._base_url.is_aws_host)
+    region = minio_client._get_region(bucket_name)
+    creds = minio_client._provider.retrieve() if minio_client._provider else None
+    query_params = dict(headers or {})
+    if creds and creds.session_token:
+        query_params["X-Amz-Security-Token"] = creds.session_token
+
+    signing_key = None
+    if creds:
+        scope = signer._get_scope(request_date, region, "s3")
+        signing_key = signer._get_signing_key(
+            creds.secret_key, request_date, region, "s3"
+        )
+    urls = {}
+    for object_name in object_names:
+        check_object_name(object_name)
+        url = minio_client._base_url.build(
+            method,
+            region,
+            bucket_name=bucket_name,
+            object_name=object_name,
+            query_params=dict(query_params),
+        )
+        if signing_key is not None:
+            request_hash, url = signer._get_presign_canonical_request_hash(
+                method,
+                url,
+                creds.access_key,
+                scope,
+                request_date,
+                expires_seconds,
+            )
+            string_to_sign = signer._get_string_to_sign(
+                request_date, scope, request_hash
+            )
+            signature = signer._get_signature(signing_key, string_to_sign)
+            url = url._replace(
+                query=url.query + "&X-Amz-Signature=" + signer.queryencode(signature)
+            )
+        urls[object_name] = urlunsplit(url)
+    return urls, expires_at
+
+
+class PresignedURLCache:
+    """thread safe, size limited (least recently used are dropped) cache of
+    presigned urls.
+
+    A url is returned from the cache while at least `min_remaining` of its
+    validity is left.  The number of lookups answered from the cache and the
+    number that were not are available in the `hits` and `misses` properties.
+    """
+
+    def __init__(self, max_entries=10000, min_remaining=0.5):
+        """
+        :param max_entries: the maximum number of urls kept
+        :type max_entries: int
+        :param min_remaining: the validity a cached url must have left to be
+            reused, as a timedelta / seconds, or when less than 1 as a
+            fraction of the expiry that was requested
+        :type min_remaining: float, datetime.timedelta
+        """
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self.hits = 0
+        self.misses = 0
+        self._urls = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(bucket_name, object_name, expires, headers=None, method="GET"):
+        """returns the cache key of a url"""
+        return (
+            method,
+            bucket_name,
+            object_name,
+            int(expires.total_seconds()),
+            tuple(sorted((headers or {}).items())),
+        )
+
+    def _min_remaining(self, expires):
+        if isinstance(self.min_remaining, datetime.timedelta):
+            return self.min_remaining
+        if self.min_remaining < 1:
+            return expires * self.min_remaining
+        return datetime.timedelta(seconds=self.min_remaining)
+
+    def get(self, key, now=None):
+        """returns the cached url for key, or None if there isn't one with
+        enough validity left
+        """
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        min_remaining = self._min_remaining(datetime.timedelta(seconds=key[3]))
+        with self._lock:
+            entry = self._urls.get(key)
+            if entry is not None and entry[1] - now >= min_remaining:
+                self._urls.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._urls[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, url, expires_at):
+        """adds a url to the cache"""
+        with self._lock:
+            self._urls[key] = (url, expires_at)
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.max_entries:
+                self._urls.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+
+    def __len__(self):
+        return len(self._urls)
+
+    def stats(self):
+        """returns a dict with the hit / miss counts and the number of cached
+        urls
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
@@ -0,0 +1,244 @@
+""" Compact in memory index of the objects that exist under a prefix in object
+storage.
+
+The index keeps the object keys in a sorted list with the size, etag and last
+modified time of each object stored in parallel arrays.  This keeps the
+memory used per object small, membership tests are a binary search and
+because the keys are sorted, prefix and range queries only touch the keys
+that are part of the result.
+"""
+
+import array
+import bisect
+import datetime
+import logging
+import math
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RemoteObject:
+    """a single record from the RemoteIndex"""
+
+    __slots__ = ("key", "size", "etag", "last_modified")
+
+    def __init__(self, key, size=None, etag=None, last_modified=None):
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def __eq__(self, other):
+        if not isinstance(other, RemoteObject):
+            return NotImplemented
+        return (self.key, self.size, self.etag, self.last_modified) == (
+            other.key,
+            other.size,
+            other.etag,
+            other.last_modified,
+        )
+
+    def __repr__(self):
+        return (
+            f"RemoteObject(key={self.key!r}, size={self.size}, "
+            + f"etag={self.etag!r}, last_modified={self.last_modified})"
+        )
+
+
+class RemoteIndex:
+    """sorted, array backed index of object store keys and their metadata.
+
+    The objects the index is created with can be in any order, they are
+    sorted the first time the index is queried.  Records added after that are
+    inserted in place, so an index that is queried between adds (eg while
+    uploads are recorded during a sync) is never sorted again.  Adding a key
+    that already exists replaces the existing record.
+    """
+
+    # sentinel stored in the arrays when a size / modified time is unknown
+    _NO_SIZE = -1
+    _NO_TIME = math.nan
+
+    def __init__(self, objects=None):
+        """
+        :param objects: optional iterable of minio Object's (or anything with
+            object_name, size, etag and last_modified properties) that are
+            used to populate the index, see `add_object`
+        """
+        self._keys = []
+        self._sizes = array.array("q")
+        self._mtimes = array.array("d")
+        self._etags = []
+        self._sorted = True
+        if objects is not None:
+            for obj in objects:
+                if getattr(obj, "is_dir", False):
+                    continue
+                self._append(obj.object_name, obj.size, obj.etag, obj.last_modified)
+            self._ensure_sorted()
+
+    def add(self, key, size=None, etag=None, last_modified=None):
+        """adds a record to the index
+
+        :param key: the object name / key
+        :type key: str
+        :param size: the size of the object in bytes
+        :type size: int
+        :param etag: the objects etag, surrounding quotes are removed
+        :type etag: str
+        :param last_modified: when the object was last modified
+        :type last_modified: datetime.datetime
+        """
+        if not self._sorted or not self._keys or key > self._keys[-1]:
+            self._append(key, size, etag, last_modified)
+            return
+        size = self._NO_SIZE if size is None else int(size)
+        mtime = self._to_timestamp(last_modified)
+        etag = self._clean_etag(etag)
+        pos = bisect.bisect_left(self._keys, key)
+        if self._keys[pos] == key:
+            self._sizes[pos] = size
+            self._mtimes[pos] = mtime
+            self._etags[pos] = etag
+            return
+        self._keys.insert(pos, key)
+        self._sizes.insert(pos, size)
+        self._mtimes.insert(pos, mtime)
+        self._etags.insert(pos, etag)
+
+    def add_object(self, obj):
+        """adds a minio Object to the index, directory place holders that get
+        returned by non recursive listings are ignored
+
+        :param obj: the object returned by minio's list_objects
+        """
+        if getattr(obj, "is_dir", False):
+            return
+        self.add(
+            key=obj.object_name,
+            size=obj.size,
+            etag=obj.etag,
+            last_modified=obj.last_modified,
+        )
+
+    def discard(self, key):
+        """removes the key from the index if it exists"""
+        pos = self._find(key)
+        if pos is None:
+            return
+        del self._keys[pos]
+        del self._sizes[pos]
+        del self._mtimes[pos]
+        del self._etags[pos]
+
+    def get(self, key, default=None):
+        """returns the RemoteObject for the key, or default if the key isn't
+        in the index
+        """
+        pos = self._find(key)
+        if pos is None:
+            return default
+        return self._record(pos)
+
+    def iter_prefix(self, prefix):
+        """yields the RemoteObject's whose key starts with prefix, in key
+        order
+        """
+        self._ensure_sorted()
+        pos = bisect.bisect_left(self._keys, prefix)
+        while pos < len(self._keys) and self._keys[pos].startswith(prefix):
+            yield self._record(pos)
+            pos += 1
+
+    def iter_range(self, start=None, end=None):
+        """yields the RemoteObject's whose keys are in the half open range
+        [start, end), in key order.  A start or end of None is unbounded.
+        """
+        self._ensure_sorted()
+        lo = 0 if start is None else bisect.bisect_left(self._keys, start)
+        hi = len(self._keys) if end is None else bisect.bisect_left(self._keys, end)
+        for pos in range(lo, hi):
+            yield self._record(pos)
+
+    def keys(self):
+        """returns the sorted list of keys, don't modify it"""
+        self._ensure_sorted()
+        return self._keys
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        self._ensure_sorted()
+        return len(self._keys)
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def _find(self, key):
+        self._ensure_sorted()
+        pos = bisect.bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return pos
+        return None
+
+    def _record(self, pos):
+        size = self._sizes[pos]
+        mtime = self._mtimes[pos]
+        return RemoteObject(
+            key=self._keys[pos],
+            size=None if size == self._NO_SIZE else size,
+            etag=self._etags[pos],
+            last_modified=(
+                None
+                if math.isnan(mtime)
+                else datetime.datetime.fromtimestamp(mtime, tz=datetime.timezone.utc)
+            ),
+        )
+
+    def _append(self, key, size, etag, last_modified):
+        """adds a record to the end of the arrays, leaving the sort until the
+        index is next queried if it is out of order
+        """
+        if self._keys and self._sorted and key <= self._keys[-1]:
+            self._sorted = False
+        self._keys.append(key)
+        self._sizes.append(self._NO_SIZE if size is None else int(size))
+        self._mtimes.append(self._to_timestamp(last_modified))
+        self._etags.append(self._clean_etag(etag))
+
+    def _ensure_sorted(self):
+        """sorts the parallel arrays by key, when a key has been added more
+        than once the last record added wins
+        """
+        if self._sorted:
+            return
+        LOGGER.debug(f"sorting remote index of {len(self._keys)} keys")
+        # stable sort so duplicates stay in the order they were added
+        order = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+        keep = []
+        for pos in order:
+            if keep and self._keys[keep[-1]] == self._keys[pos]:
+                keep[-1] = pos
+            else:
+                keep.append(pos)
+        self._keys = [self._keys[pos] for pos in keep]
+        self._sizes = array.array("q", (self._sizes[pos] for pos in keep))
+        self._mtimes = array.array("d", (self._mtimes[pos] for pos in keep))
+        self._etags = [self._etags[pos] for pos in keep]
+        self._sorted = True
+
+    @staticmethod
+    def _clean_etag(etag):
+        if etag is None:
+            return None
+        return etag.strip('"')
+
+    def _to_timestamp(self, last_modified):
+        if last_modified is None:
+            return self._NO_TIME
+        if isinstance(last_modified, (int, float)):
+            return float(last_modified)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+        return last_modified.timestamp()
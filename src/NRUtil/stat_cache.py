@@ -0,0 +1,111 @@
+""" In process cache of object metadata (the result of stat_object).
+
+Entries expire after a time to live and the least recently used entries are
+dropped once the cache is full.  Objects that don't exist are cached as well
+(negative caching), so repeatedly checking for a missing object doesn't make
+a request each time either.
+
+ObjectStoreUtil invalidates the entries of the objects it writes, deletes or
+changes the permissions of.  Changes made by other clients are only seen once
+the entry expires.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# error codes returned by the object store when an object doesn't exist
+MISSING_CODES = ("NoSuchKey", "NoSuchObject", "ResourceNotFound")
+
+
+class StatCache:
+    """thread safe, size and time limited cache of object metadata keyed by
+    (bucket, object name).
+
+    The number of lookups answered from the cache and the number that were
+    not are available in the `hits` and `misses` properties.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000, negative_ttl=None):
+        """
+        :param ttl: seconds an entry is valid for
+        :type ttl: float
+        :param max_entries: the maximum number of entries kept, the least
+            recently used are dropped first
+        :type max_entries: int
+        :param negative_ttl: seconds that an object is remembered as missing,
+            defaults to ttl.  Use 0 to disable negative caching
+        :type negative_ttl: float
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket_name, object_name):
+        """looks up an object
+
+        :return: tuple of (found, stat, error).  found is False if there is
+            no valid entry.  For objects that are cached as missing stat is
+            None and error is the error the object store returned
+        """
+        key = (bucket_name, object_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1], entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None, None
+
+    def put(self, bucket_name, object_name, stat):
+        """caches the metadata of an object"""
+        self._put((bucket_name, object_name), self.ttl, stat, None)
+
+    def put_missing(self, bucket_name, object_name, error):
+        """caches that an object doesn't exist
+
+        :param error: the error returned by the object store, re-raised on
+            lookups of the object
+        """
+        if self.negative_ttl > 0:
+            self._put((bucket_name, object_name), self.negative_ttl, None, error)
+
+    def _put(self, key, ttl, stat, error):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, stat, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bucket_name, object_names):
+        """removes the entries for the objects
+
+        :param object_names: iterable of object names
+        """
+        with self._lock:
+            for object_name in object_names:
+                self._entries.pop((bucket_name, object_name), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """returns a dict with the hit / miss counts and the number of cached
+        entries
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
@@ -0,0 +1,237 @@
+""" Persistent record of what has been synced to object storage.
+
+The manifest is a small sqlite database that records, for every object
+uploaded by a directory sync, its key, size, etag, the time it was uploaded
+and the modified time of the local file it was created from.  A sync that is
+re-run can build its view of object storage from the manifest instead of
+listing the whole destination prefix.  The manifest can be reconciled against
+an actual listing of object storage whenever required.
+"""
+
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+
+from . import remote_index
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SyncManifest:
+    """sqlite backed manifest of the objects that exist in object storage.
+
+    The object is safe to share between threads, writes are batched and
+    committed every `commit_every` records or when `flush` is called.
+    """
+
+    def __init__(self, manifest_path, commit_every=500):
+        """
+        :param manifest_path: path to the sqlite file, created if it doesn't
+            exist
+        :type manifest_path: str
+        :param commit_every: number of records to write between commits
+        :type commit_every: int
+        """
+        self.manifest_path = manifest_path
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                + "bucket TEXT NOT NULL, key TEXT NOT NULL, size INTEGER, "
+                + "etag TEXT, last_modified REAL, local_mtime REAL, "
+                + "PRIMARY KEY (bucket, key)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reconciled ("
+                + "bucket TEXT NOT NULL, prefix TEXT NOT NULL, "
+                + "reconciled_at REAL NOT NULL, PRIMARY KEY (bucket, prefix))"
+            )
+            self._conn.commit()
+
+    def record(self, bucket, key, size, etag, local_mtime=None, last_modified=None):
+        """records that an object has been written to object storage
+
+        :param bucket: the bucket the object was written to
+        :param key: the object name / key
+        :param size: size of the object in bytes
+        :param etag: the etag object storage returned for the object
+        :param local_mtime: the modified time (epoch seconds) of the local
+            file that was uploaded
+        :param last_modified: when the object was written, defaults to now
+        """
+        if last_modified is None:
+            last_modified = time.time()
+        if etag is not None:
+            etag = etag.strip('"')
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket, key, size, etag, last_modified, local_mtime),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def remove(self, bucket, key):
+        """removes an object from the manifest"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM objects WHERE bucket = ? AND key = ?", (bucket, key)
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def get(self, bucket, key):
+        """returns the manifest record for an object as a dict with the keys
+        key, size, etag, last_modified and local_mtime or None if the object
+        is not in the manifest.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, size, etag, last_modified, local_mtime FROM objects "
+                + "WHERE bucket = ? AND key = ?",
+                (bucket, key),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("key", "size", "etag", "last_modified", "local_mtime"), row))
+
+    def last_reconciled(self, bucket, prefix):
+        """returns the epoch time that the prefix was last reconciled against
+        object storage, or None if it never has been
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reconciled_at FROM reconciled WHERE bucket = ? AND prefix = ?",
+                (bucket, prefix or ""),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def needs_reconcile(self, bucket, prefix, max_age=None):
+        """identifies if the prefix needs to be reconciled against object
+        storage.  Always True if the prefix has never been reconciled.
+
+        :param max_age: the age (seconds or timedelta) after which a
+            reconciliation is considered stale.  If None a prefix only
+            needs reconciling if it never has been.
+        """
+        reconciled_at = self.last_reconciled(bucket, prefix)
+        if reconciled_at is None:
+            return True
+        if max_age is None:
+            return False
+        if isinstance(max_age, datetime.timedelta):
+            max_age = max_age.total_seconds()
+        return (time.time() - reconciled_at) > max_age
+
+    def reconcile(self, bucket, prefix, objects):
+        """replaces the manifest records under the prefix with the objects
+        from a listing of object storage.  The local modified times that
+        have been recorded are kept for any object whose etag has not
+        changed.
+
+        :param objects: iterable of RemoteObject's, ie a RemoteIndex built
+            from a listing of the prefix
+        :return: the number of objects under the prefix
+        """
+        lo, hi = self._prefix_bounds(prefix)
+        with self._lock:
+            local_mtimes = dict(
+                (row[0], (row[1], row[2]))
+                for row in self._conn.execute(
+                    "SELECT key, etag, local_mtime FROM objects "
+                    + self._prefix_where(hi),
+                    self._prefix_params(bucket, lo, hi),
+                )
+            )
+            self._conn.execute(
+                "DELETE FROM objects " + self._prefix_where(hi),
+                self._prefix_params(bucket, lo, hi),
+            )
+            cnt = 0
+            batch = []
+            for obj in objects:
+                local_mtime = None
+                if obj.key in local_mtimes:
+                    old_etag, old_mtime = local_mtimes[obj.key]
+                    if old_etag == obj.etag:
+                        local_mtime = old_mtime
+                last_modified = None
+                if obj.last_modified is not None:
+                    last_modified = obj.last_modified.timestamp()
+                batch.append(
+                    (bucket, obj.key, obj.size, obj.etag, last_modified, local_mtime)
+                )
+                cnt += 1
+                if len(batch) >= self.commit_every:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reconciled VALUES (?, ?, ?)",
+                (bucket, prefix or "", time.time()),
+            )
+            self._commit()
+        LOGGER.info(f"reconciled {cnt} objects under {bucket}/{prefix}")
+        return cnt
+
+    def to_remote_index(self, bucket, prefix):
+        """builds a RemoteIndex of the objects recorded under the prefix"""
+        lo, hi = self._prefix_bounds(prefix)
+        index = remote_index.RemoteIndex()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, size, etag, last_modified FROM objects "
+                + self._prefix_where(hi)
+                + " ORDER BY key",
+                self._prefix_params(bucket, lo, hi),
+            ).fetchall()
+        for key, size, etag, last_modified in rows:
+            index.add(key=key, size=size, etag=etag, last_modified=last_modified)
+        return index
+
+    def flush(self):
+        """commits any records that have not been written yet"""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def _insert(self, batch):
+        if batch:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)", batch
+            )
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    @staticmethod
+    def _prefix_bounds(prefix):
+        """calculates the key range [lo, hi) that covers every key that starts
+        with the prefix, hi is None when the range is unbounded
+        """
+        if not prefix:
+            return "", None
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    @staticmethod
+    def _prefix_where(hi):
+        if hi is None:
+            return "WHERE bucket = ? AND key >= ?"
+        return "WHERE bucket = ? AND key >= ? AND key < ?"
+
+    @staticmethod
+    def _prefix_params(bucket, lo, hi):
+        if hi is None:
+            return (bucket, lo)
+        return (bucket, lo, hi)
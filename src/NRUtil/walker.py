@@ -0,0 +1,184 @@
+""" Streaming walk of a local directory tree.
+
+walk_files yields a (path, os.stat_result) tuple for every file under a
+directory, as the directories are read.  It uses os.scandir, so the type of
+each entry comes from the directory listing itself and the only system call
+made per file is the stat that is handed to the caller (which uses it for the
+size / mtime instead of stat'ing the file again).  The walk is iterative, a
+stack of the directories still to be read, so deep trees don't hit the
+recursion limit.
+
+The files that are yielded can be restricted with:
+    include / exclude - fnmatch patterns, see walk_files
+    symlinks - what to do with symbolic links, one of the SYMLINKS_* policies
+    hidden - whether files and directories starting with a . are walked
+
+path_filter applies the same include / exclude / hidden rules to relative
+paths without touching the file system.
+"""
+
+import fnmatch
+import logging
+import os
+import stat
+
+LOGGER = logging.getLogger(__name__)
+
+# symbolic link policies
+#  follow - links to files are yielded and links to directories are walked,
+#           a link back to a directory that is being walked (one of its own
+#           parents) isn't followed, so link loops are safe
+#  files  - links to files are yielded, links to directories are ignored
+#  skip   - all links are ignored
+SYMLINKS_FOLLOW = "follow"
+SYMLINKS_FILES = "files"
+SYMLINKS_SKIP = "skip"
+SYMLINK_POLICIES = (SYMLINKS_FOLLOW, SYMLINKS_FILES, SYMLINKS_SKIP)
+
+
+class _Patterns:
+    """a set of fnmatch patterns.  Patterns that contain a / are matched
+    against the path relative to the root of the walk (with / separators),
+    the others against the name of the file / directory.
+    """
+
+    __slots__ = ("path_patterns", "name_patterns")
+
+    def __init__(self, patterns):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        patterns = [pattern.strip("/") for pattern in patterns]
+        self.path_patterns = [pattern for pattern in patterns if "/" in pattern]
+        self.name_patterns = [pattern for pattern in patterns if "/" not in pattern]
+
+    def match(self, rel_path, name):
+        for pattern in self.name_patterns:
+            if fnmatch.fnmatchcase(name, pattern):
+                return True
+        for pattern in self.path_patterns:
+            if fnmatch.fnmatchcase(rel_path, pattern):
+                return True
+        return False
+
+
+def walk_files(root, include=None, exclude=None, symlinks=SYMLINKS_FOLLOW, hidden=True):
+    """generator that walks the directory tree under root, yielding a tuple
+    of (path, os.stat_result) for every file.
+
+    The entries of each directory are yielded in name order, the files of a
+    directory before its sub directories.  Directories that can't be read
+    and links that point to nothing are logged and skipped.
+
+    :param root: the directory to walk
+    :type root: str
+    :param include: fnmatch pattern(s), if set only the files that match one
+        of them are yielded.  Patterns with a / are matched against the path
+        relative to root, eg "data/*.nc", the others against the file name,
+        eg "*.nc"
+    :type include: str, list
+    :param exclude: fnmatch pattern(s) of the files and directories to leave
+        out, matched in the same way as include.  Excluded directories aren't
+        walked at all
+    :type exclude: str, list
+    :param symlinks: what to do with symbolic links, one of
+        SYMLINK_POLICIES
+    :type symlinks: str
+    :param hidden: walk the files and directories whose name starts with a .
+    :type hidden: bool
+    :return: yields (path, os.stat_result) tuples, the stat is of the file
+        that a link points to
+    """
+    if symlinks not in SYMLINK_POLICIES:
+        msg = f"symlinks must be one of {SYMLINK_POLICIES}, got: {symlinks}"
+        raise ValueError(msg)
+    include = _Patterns(include) if include else None
+    exclude = _Patterns(exclude) if exclude else None
+    follow = symlinks != SYMLINKS_SKIP
+
+    # the (st_dev, st_ino) of the directories on the path from root to the
+    # directory being read, only a link to one of them is a loop.  The same
+    # directory reached by different paths (eg a link to a sibling) is walked
+    # once per path, like the files are
+    ancestors = frozenset()
+    if symlinks == SYMLINKS_FOLLOW:
+        root_stat = os.stat(root)
+        ancestors = frozenset([(root_stat.st_dev, root_stat.st_ino)])
+
+    # (directory path, its path relative to root with a trailing /, ancestors)
+    dirs = [(root, "", ancestors)]
+    while dirs:
+        cur_dir, rel_dir, ancestors = dirs.pop()
+        try:
+            with os.scandir(cur_dir) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as err:
+            LOGGER.warning(f"can't read directory {cur_dir}: {err}")
+            continue
+
+        sub_dirs = []
+        for entry in entries:
+            name = entry.name
+            if not hidden and name.startswith("."):
+                continue
+            rel_path = rel_dir + name
+            if exclude is not None and exclude.match(rel_path, name):
+                continue
+            try:
+                is_link = entry.is_symlink()
+                if is_link and not follow:
+                    continue
+                is_dir = entry.is_dir()
+                if is_dir:
+                    if is_link and symlinks == SYMLINKS_FILES:
+                        continue
+                    dir_ancestors = ancestors
+                    if symlinks == SYMLINKS_FOLLOW:
+                        dir_stat = entry.stat()
+                        dir_id = (dir_stat.st_dev, dir_stat.st_ino)
+                        if dir_id in ancestors:
+                            LOGGER.debug(f"{entry.path} links back to a parent")
+                            continue
+                        dir_ancestors = ancestors | {dir_id}
+                    sub_dirs.append((entry.path, rel_path + "/", dir_ancestors))
+                    continue
+                if include is not None and not include.match(rel_path, name):
+                    continue
+                file_stat = entry.stat()
+            except OSError as err:
+                LOGGER.warning(f"can't stat {entry.path}: {err}")
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                yield entry.path, file_stat
+        # reversed so they are popped off the stack in name order
+        dirs.extend(reversed(sub_dirs))
+
+
+def path_filter(include=None, exclude=None, hidden=True):
+    """returns a function that checks if a file would be yielded by
+    walk_files with the same include, exclude and hidden arguments, going by
+    its path relative to the root alone.  The file system isn't looked at, so
+    this works for paths that don't exist locally, eg the keys of objects
+    that were synced from the directory.
+
+    :param include: see walk_files
+    :param exclude: see walk_files
+    :param hidden: see walk_files
+    :return: a function that takes a relative path, with / separators, and
+        returns True if the file would be walked
+    """
+    include = _Patterns(include) if include else None
+    exclude = _Patterns(exclude) if exclude else None
+
+    def is_walked(rel_path):
+        names = rel_path.split("/")
+        path = ""
+        for name in names:
+            path = path + name
+            if not hidden and name.startswith("."):
+                return False
+            if exclude is not None and exclude.match(path, name):
+                return False
+            path = path + "/"
+        return include is None or include.match(rel_path, names[-1])
+
+    return is_walked
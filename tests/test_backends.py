@@ -0,0 +1,443 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+
+import pytest
+from minio.error import S3Error
+
+import NRUtil.async_ostore
+import NRUtil.backends
+import NRUtil.NRObjStoreUtil
+
+LOGGER = logging.getLogger(__name__)
+
+BUCKET = "tbucket"
+
+
+@pytest.fixture(params=["memory", "local"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return NRUtil.backends.MemoryBackend(buckets=[BUCKET])
+    return NRUtil.backends.LocalBackend(str(tmp_path / "store"), buckets=[BUCKET])
+
+
+@pytest.fixture
+def ostore(backend, tmp_path):
+    return NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        obj_store_bucket=BUCKET, tmpfolder=str(tmp_path), backend=backend
+    )
+
+
+@pytest.fixture
+def umask():
+    """runs the test with a umask of 027, new files are created 0640"""
+    old_umask = os.umask(0o027)
+    yield 0o640
+    os.umask(old_umask)
+
+
+def write_file(path, data):
+    with open(path, "wb") as fh:
+        fh.write(data)
+    return str(path)
+
+
+def test_put_get_stat(ostore, tmp_path, umask):
+    data = b"test 1 2 3\n"
+    src = write_file(tmp_path / "src.txt", data)
+    result = ostore.put_object(ostore_path="junky/junk.txt", local_path=src)
+    assert result.etag == hashlib.md5(data).hexdigest()
+
+    stat = ostore.stat_object("junky/junk.txt")
+    assert stat.size == len(data)
+    assert stat.etag == result.etag
+    assert stat.last_modified is not None
+
+    dest = str(tmp_path / "dest.txt")
+    ostore.get_object(file_path="junky/junk.txt", local_path=dest)
+    with open(dest, "rb") as fh:
+        assert fh.read() == data
+    assert os.stat(dest).st_mode & 0o777 == umask
+    assert ostore.get_stream("junky/junk.txt").read() == data
+
+    with pytest.raises(S3Error) as err:
+        ostore.stat_object("junky/missing.txt")
+    assert err.value.code == "NoSuchKey"
+
+
+def test_get_object_new_dir(ostore, tmp_path):
+    ostore.put_stream("a/f.txt", b"data")
+    # like minio's fget_object the missing directories are created
+    dest = tmp_path / "new" / "sub" / "f.txt"
+    ostore.get_object(file_path="a/f.txt", local_path=str(dest))
+    assert dest.read_bytes() == b"data"
+    assert os.listdir(dest.parent) == ["f.txt"]
+
+    # and when it is downloaded as concurrent ranges
+    dest = tmp_path / "ranged" / "sub" / "f.txt"
+    ostore.get_object(file_path="a/f.txt", local_path=str(dest), workers=4)
+    assert dest.read_bytes() == b"data"
+    assert os.listdir(dest.parent) == ["f.txt"]
+
+
+def test_multipart_and_ranged(ostore, tmp_path, umask):
+    data = os.urandom(12 * 1048576 + 17)
+    src = write_file(tmp_path / "big.bin", data)
+    calc = NRUtil.NRObjStoreUtil.CalcETags()
+
+    result = ostore.put_object(
+        ostore_path="big.bin", local_path=src, workers=2, part_size=5242880
+    )
+    # same etag as S3: md5 of the part md5s and the number of parts
+    assert result.etag == calc.calc_etag(src, 5242880)
+    assert result.etag.endswith("-3")
+
+    dest = str(tmp_path / "big.out")
+    ostore.get_object(
+        file_path="big.bin", local_path=dest, workers=3, part_size=5242880
+    )
+    with open(dest, "rb") as fh:
+        assert fh.read() == data
+    assert os.stat(dest).st_mode & 0o777 == umask
+
+    result = ostore.put_stream("stream.bin", io.BytesIO(data), length=-1)
+    assert ostore.stat_object("stream.bin").size == len(data)
+    out = io.BytesIO()
+    assert ostore.get_stream("stream.bin", out=out) == len(data)
+    assert out.getvalue() == data
+
+
+def test_list_objects(ostore):
+    names = ["a/1.txt", "a/b/2.txt", "a/b/c/3.txt", "a-b.txt", "a0/4.txt", "z.txt"]
+    for name in names:
+        ostore.put_stream(name, name.encode())
+
+    assert ostore.list_objects(return_file_names_only=True) == sorted(names)
+    assert ostore.list_objects(objstore_dir="a/", return_file_names_only=True) == [
+        "a/1.txt",
+        "a/b/2.txt",
+        "a/b/c/3.txt",
+    ]
+    assert ostore.list_objects(
+        objstore_dir="a/", recursive=False, return_file_names_only=True
+    ) == ["a/1.txt", "a/b/"]
+    assert ostore.list_objects(recursive=False, return_file_names_only=True) == [
+        "a-b.txt",
+        "a/",
+        "a0/",
+        "z.txt",
+    ]
+    assert ostore.list_objects(
+        objstore_dir="a", start_after="a/b/2.txt", return_file_names_only=True
+    ) == ["a/b/c/3.txt", "a0/4.txt"]
+    assert ostore.list_objects(
+        return_file_names_only=True, workers=4, shard_depth=2
+    ) == sorted(names)
+    assert ostore.list_objects(pattern="*/*.txt", return_file_names_only=True) == [
+        "a/1.txt",
+        "a/b/2.txt",
+        "a/b/c/3.txt",
+        "a0/4.txt",
+    ]
+
+
+def test_list_objects_sharded_buffer(ostore, monkeypatch):
+    """the sharded listing only lists buffer_size objects of a shard ahead of
+    the one being yielded, and stops listing when it is closed
+    """
+    names = [f"{top}/{cnt:03d}.txt" for top in ["a", "b"] for cnt in range(200)]
+    for name in names:
+        ostore.put_stream(name, name.encode())
+
+    listed = []
+    list_objects = ostore.backend.list_objects
+
+    def counting_list_objects(*args, **kwargs):
+        for obj in list_objects(*args, **kwargs):
+            listed.append(obj.object_name)
+            yield obj
+
+    monkeypatch.setattr(ostore.backend, "list_objects", counting_list_objects)
+    objs = ostore.iter_objects_sharded(workers=2, buffer_size=5)
+    assert next(objs).object_name == "a/000.txt"
+    # give the workers time to fill the queues
+    threading.Event().wait(0.5)
+    # the discovery listing, plus the objects queued for each shard
+    assert len(listed) < 2 + 2 * 7
+    objs.close()
+    assert [
+        obj.object_name for obj in ostore.iter_objects_sharded(workers=2, buffer_size=5)
+    ] == names
+
+
+def test_copy_delete(ostore):
+    ostore.put_stream("src/1.txt", b"one")
+    ostore.put_stream("src/2.txt", b"two")
+    ostore.copy_object("src/1.txt", "dest/1.txt")
+    assert ostore.get_stream("dest/1.txt").read() == b"one"
+    assert ostore.stat_object("dest/1.txt").etag == ostore.stat_object("src/1.txt").etag
+
+    ostore.delete_remote_file("dest/1.txt")
+    # deleting an object that doesn't exist isn't an error
+    ostore.delete_remote_file("dest/1.txt")
+    result = ostore.delete_directory("src/")
+    assert result.success and result.deleted == 2
+    assert ostore.list_objects(return_file_names_only=True) == []
+
+
+def test_delete_directory_failed_request(ostore, backend, monkeypatch):
+    for num in range(5):
+        ostore.put_stream(f"dir/{num}.txt", b"x")
+    delete_objects = backend.delete_objects
+
+    def flaky_delete_objects(bucket_name, object_names):
+        if "dir/3.txt" in object_names:
+            raise ConnectionError("connection reset")
+        return delete_objects(bucket_name, object_names)
+
+    monkeypatch.setattr(backend, "delete_objects", flaky_delete_objects)
+    # the failed request is recorded, the others are still counted
+    result = ostore.delete_directory("dir/", batch_size=2, workers=2)
+    assert not result.success and result.deleted == 3
+    assert [error.name for error in result.errors] == ["dir/2.txt", "dir/3.txt"]
+    assert {error.code for error in result.errors} == {"ConnectionError"}
+    assert ostore.list_objects(return_file_names_only=True) == [
+        "dir/2.txt",
+        "dir/3.txt",
+    ]
+
+
+def test_async_exit_doesnt_block(ostore):
+    release = threading.Event()
+
+    def chunks():
+        release.wait(5)
+        yield b"data"
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while not release.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        async with NRUtil.async_ostore.AsyncObjectStoreUtil(ostore=ostore) as aostore:
+            upload = asyncio.ensure_future(aostore.put_stream("async.txt", chunks()))
+            ticker = asyncio.ensure_future(tick())
+            await asyncio.sleep(0.01)
+            asyncio.get_running_loop().call_later(0.2, release.set)
+        # leaving the block waited for the upload without blocking the loop
+        assert upload.done()
+        await ticker
+        return ticks
+
+    assert asyncio.run(run()) > 5
+    assert ostore.get_stream("async.txt").read() == b"data"
+
+
+def test_acls(ostore):
+    ostore.put_stream("private.txt", b"private")
+    ostore.put_stream("public.txt", b"public", public=True)
+    assert ostore.get_public_permission("private.txt", None) is None
+    assert ostore.get_public_permission("public.txt", None) == "READ"
+
+    ostore.set_public_permissions("private.txt")
+    assert ostore.get_public_permission("private.txt", None) == "READ"
+    results = dict(ostore.iter_set_acls(["private.txt", "public.txt"], acl="private"))
+    assert results == {"private.txt": None, "public.txt": None}
+    report = ostore.audit_public_permissions("")
+    assert sorted(report.private) == ["private.txt", "public.txt"]
+
+    with pytest.raises(S3Error) as err:
+        ostore.set_public_permissions("missing.txt")
+    assert err.value.code == "NoSuchKey"
+    with pytest.raises(NotImplementedError):
+        ostore.get_presigned_url("public.txt")
+
+
+def test_directory_sync(backend, tmp_path):
+    src_dir = tmp_path / "sync"
+    for name in ["1.txt", "sub/2.txt", "sub/sub/3.txt", ".hidden", "sub/skip.tmp"]:
+        os.makedirs(os.path.dirname(src_dir / name), exist_ok=True)
+        write_file(src_dir / name, name.encode() * 100)
+
+    def sync(**kwargs):
+        return NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+            str(src_dir), "synced", obj_store_bucket=BUCKET, backend=backend
+        ).update_ostore_dir(
+            src_dir=str(src_dir),
+            dest_dir="synced",
+            obj_store_bucket=BUCKET,
+            exclude="*.tmp",
+            **kwargs,
+        )
+
+    # the hidden files are left out by default
+    result = sync()
+    assert result.success and len(result.uploaded) == 3
+    assert "synced/.hidden" not in [dest for _, dest in result.uploaded]
+    result = sync(hidden=True)
+    assert result.success and [dest for _, dest in result.uploaded] == [
+        "synced/.hidden"
+    ]
+    result = sync(hidden=True)
+    assert result.success and not result.uploaded and len(result.skipped) == 4
+
+
+def test_directory_sync_other_bucket(backend, tmp_path):
+    src_dir = tmp_path / "sync"
+    for name in ["1.txt", "sub/2.txt"]:
+        os.makedirs(os.path.dirname(src_dir / name), exist_ok=True)
+        write_file(src_dir / name, name.encode())
+    backend.make_bucket("other")
+    sync = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        str(src_dir), "synced", obj_store_bucket=BUCKET, backend=backend
+    )
+
+    result = sync.update_ostore_dir(obj_store_bucket="other")
+    assert result.success and len(result.uploaded) == 2
+    # the index only describes the sync's bucket, the uploads to the other
+    # bucket don't make the files look synced there
+    result = sync.update_ostore_dir()
+    assert result.success and len(result.uploaded) == 2
+
+    # nor does the index say which objects are orphaned in the other bucket
+    os.remove(src_dir / "1.txt")
+    plan = sync.plan_ostore_dir(obj_store_bucket="other")
+    assert plan.orphans == []
+
+
+def test_update_local_dir(backend, tmp_path, umask):
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        obj_store_bucket=BUCKET, backend=backend
+    )
+    for name in ["1.txt", "sub/2.txt"]:
+        ostore.put_stream(name, name.encode())
+    dest_dir = tmp_path / "mirror"
+
+    # an empty dest_dir is the whole bucket
+    result = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        str(dest_dir), "", obj_store_bucket=BUCKET, backend=backend
+    ).update_local_dir()
+    assert result.success and len(result.downloaded) == 2
+    assert (dest_dir / "sub" / "2.txt").read_bytes() == b"sub/2.txt"
+    # the files get the usual mode, not the 0600 of the temporary file
+    assert os.stat(dest_dir / "1.txt").st_mode & 0o777 == umask
+
+
+def test_update_local_dir_other_bucket(backend, tmp_path):
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        obj_store_bucket=BUCKET, backend=backend
+    )
+    backend.make_bucket("other")
+    ostore.put_stream("synced/1.txt", b"one")
+    ostore.put_stream("synced/1.txt", b"other one", bucket_name="other")
+    ostore.put_stream("synced/2.txt", b"two", bucket_name="other")
+    dest_dir = tmp_path / "mirror"
+    dest_dir.mkdir()
+    write_file(dest_dir / "1.txt", b"one")
+    sync = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        str(dest_dir), "synced", obj_store_bucket=BUCKET, backend=backend
+    )
+
+    # the keys and sizes come from the other bucket, not the sync's listing
+    result = sync.update_local_dir(obj_store_bucket="other")
+    assert result.success and not result.skipped
+    assert sorted(dest for _, dest in result.downloaded) == [
+        "synced/1.txt",
+        "synced/2.txt",
+    ]
+    assert (dest_dir / "1.txt").read_bytes() == b"other one"
+    assert (dest_dir / "2.txt").read_bytes() == b"two"
+    result = sync.update_local_dir(obj_store_bucket="other")
+    assert result.success and not result.downloaded and len(result.skipped) == 2
+
+
+def test_local_backend_files(tmp_path, umask):
+    backend = NRUtil.backends.LocalBackend(str(tmp_path), buckets=[BUCKET])
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        obj_store_bucket=BUCKET, backend=backend
+    )
+    ostore.put_stream("dir/sub/file.txt", b"data")
+    data_path = tmp_path / BUCKET / "dir" / "sub" / "file.txt"
+    assert data_path.read_bytes() == b"data"
+    assert os.stat(data_path).st_mode & 0o777 == umask
+
+    # files added by other programs are hashed when they are first seen
+    write_file(tmp_path / BUCKET / "dir" / "other.txt", b"other")
+    stat = ostore.stat_object("dir/other.txt")
+    assert stat.etag == hashlib.md5(b"other").hexdigest()
+    write_file(tmp_path / BUCKET / "dir" / "other.txt", b"changed!")
+    (listed,) = ostore.list_objects(objstore_dir="dir/other")
+    assert listed.etag == hashlib.md5(b"changed!").hexdigest()
+
+    # directories are removed with the last object in them
+    ostore.delete_remote_file("dir/sub/file.txt")
+    assert not (tmp_path / BUCKET / "dir" / "sub").exists()
+
+    for name in ["../escape.txt", "/abs.txt", "dir//x.txt", "dir/"]:
+        with pytest.raises(S3Error) as err:
+            ostore.put_stream(name, b"x")
+        assert err.value.code == "InvalidArgument"
+
+
+def test_sync_plan(backend, tmp_path):
+    src_dir = tmp_path / "sync"
+    for name in ["1.txt", "sub/2.txt", "sub/3.txt"]:
+        os.makedirs(os.path.dirname(src_dir / name), exist_ok=True)
+        write_file(src_dir / name, name.encode() * 10)
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        obj_store_bucket=BUCKET, backend=backend
+    )
+    ostore.put_stream("synced/sub/2.txt", b"old")
+    ostore.put_stream("synced/1.txt", b"1.txt" * 10)
+    ostore.put_stream("synced/gone.txt", b"gone")
+    ostore.put_stream("synced/keep.tmp", b"excluded")
+    ostore.put_stream("other/x.txt", b"outside")
+    sync = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        str(src_dir), "synced", obj_store_bucket=BUCKET, backend=backend
+    )
+
+    plan = sync.plan_ostore_dir(compare="size", exclude="*.tmp")
+    assert [dest for _, dest, _ in plan.uploads] == ["synced/sub/3.txt"]
+    assert [dest for _, dest, _ in plan.overwrites] == ["synced/sub/2.txt"]
+    assert [dest for _, dest, _ in plan.skips] == ["synced/1.txt"]
+    assert [remote.key for remote in plan.orphans] == ["synced/gone.txt"]
+    assert plan.summary() == {
+        "uploads": 1,
+        "upload_bytes": 90,
+        "overwrites": 1,
+        "overwrite_bytes": 90,
+        "skips": 1,
+        "skip_bytes": 50,
+        "orphans": 1,
+        "orphan_bytes": 4,
+    }
+    assert plan.transfer_bytes == 180
+    # planning doesn't change anything
+    assert ostore.get_stream("synced/sub/2.txt").read() == b"old"
+
+    result = sync.update_ostore_dir(
+        compare="size", exclude="*.tmp", mirror=True, workers=2
+    )
+    assert result.success
+    assert sorted(dest for _, dest in result.uploaded) == [
+        "synced/sub/2.txt",
+        "synced/sub/3.txt",
+    ]
+    assert result.removed == ["synced/gone.txt"]
+    assert ostore.list_objects(return_file_names_only=True) == [
+        "other/x.txt",
+        "synced/1.txt",
+        "synced/keep.tmp",
+        "synced/sub/2.txt",
+        "synced/sub/3.txt",
+    ]
+    plan = sync.plan_ostore_dir(compare="size", exclude="*.tmp")
+    assert not (plan.uploads or plan.overwrites or plan.orphans)
+    assert len(plan.skips) == 3
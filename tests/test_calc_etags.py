@@ -0,0 +1,76 @@
+import hashlib
+import logging
+import os
+
+import NRUtil.NRObjStoreUtil
+
+LOGGER = logging.getLogger(__name__)
+
+
+def multipart_etag(data, partsize):
+    """reference implementation of the multipart etag calculation"""
+    starts = range(0, len(data), partsize)
+    digests = [hashlib.md5(data[pos:][:partsize]).digest() for pos in starts]
+    return hashlib.md5(b"".join(digests)).hexdigest() + "-" + str(len(digests))
+
+
+def test_calc_etags_single_pass(tmp_path):
+    data = os.urandom(5 * 1024 + 17)
+    test_file = os.path.join(tmp_path, "junk.bin")
+    with open(test_file, "wb") as fh:
+        fh.write(data)
+
+    # small buffer so that the part boundaries fall inside and across buffers
+    calc = NRUtil.NRObjStoreUtil.CalcETags(buffer_size=1000)
+    partsizes = [1024, 1500, 2048, len(data)]
+    etags = calc.calc_etags(test_file, partsizes + [None])
+    for partsize in partsizes:
+        assert etags[partsize] == multipart_etag(data, partsize)
+    assert etags[None] == hashlib.md5(data).hexdigest()
+    assert calc.calc_md5(test_file) == hashlib.md5(data).hexdigest()
+    assert calc.calc_etag(test_file, 1024) == multipart_etag(data, 1024)
+
+
+def test_etags_are_valid(tmp_path):
+    partsize = 8388608
+    data = b"0123456789" * (partsize // 10 + 100)
+    big_file = os.path.join(tmp_path, "big.bin")
+    small_file = os.path.join(tmp_path, "small.bin")
+    with open(big_file, "wb") as fh:
+        fh.write(data)
+    with open(small_file, "wb") as fh:
+        fh.write(b"test 1 2 3\n")
+
+    calc = NRUtil.NRObjStoreUtil.CalcETags()
+    big_etag = multipart_etag(data, partsize)
+    assert calc.etag_is_valid(big_file, big_etag)
+    assert not calc.etag_is_valid(big_file, "0" * 32 + "-2")
+
+    files_etags = [
+        (big_file, f'"{big_etag}"'),
+        (small_file, hashlib.md5(b"test 1 2 3\n").hexdigest()),
+    ]
+    assert calc.etags_are_valid(files_etags) == {big_file: True, small_file: True}
+    files_etags.append((os.path.join(tmp_path, "other.bin"), "0" * 32))
+    with open(files_etags[-1][0], "wb") as fh:
+        fh.write(b"different")
+    results = calc.etags_are_valid(files_etags, workers=3)
+    assert results[big_file] and results[small_file]
+    assert not results[files_etags[-1][0]]
+
+
+def test_multipart_part_size():
+    part_size = NRUtil.NRObjStoreUtil.multipart_part_size
+    max_parts = NRUtil.NRObjStoreUtil.MAX_MULTIPART_PARTS
+    assert part_size(1024) == 15728640
+    assert part_size(1024, 1) == NRUtil.NRObjStoreUtil.MIN_PART_SIZE
+
+    # 200GB doesn't fit in 10000 15MB parts, grows in whole MB steps
+    file_size = 200 * 1024**3
+    size = part_size(file_size)
+    assert size % 1048576 == 0
+    assert -(-file_size // size) <= max_parts
+    assert -(-file_size // (size - 1048576)) > max_parts
+
+    calc = NRUtil.NRObjStoreUtil.CalcETags()
+    assert size in calc.candidate_partsizes(file_size, -(-file_size // size))
@@ -0,0 +1,55 @@
+import logging
+
+import pytest
+
+import NRUtil.client_pool
+import NRUtil.NRObjStoreUtil
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def empty_registry():
+    NRUtil.client_pool.clear_registry()
+    yield
+    NRUtil.client_pool.clear_registry()
+
+
+def test_pool_config():
+    config = NRUtil.client_pool.ConnectionPoolConfig(pool_size=50, retries=2)
+    assert config == NRUtil.client_pool.ConnectionPoolConfig(pool_size=50, retries=2)
+    assert config != NRUtil.client_pool.DEFAULT_POOL_CONFIG
+    with pytest.raises(AttributeError):
+        config.pool_size = 10
+
+    http_client = config.http_client()
+    assert http_client.connection_pool_kw["maxsize"] == 50
+    assert http_client.connection_pool_kw["retries"].total == 2
+    boto_config = config.botocore_config()
+    assert boto_config.max_pool_connections == 50
+    assert boto_config.tcp_keepalive
+
+
+def test_clients_are_shared(empty_registry):
+    params = {
+        "obj_store_host": "ostore.example.com",
+        "obj_store_user": "user",
+        "obj_store_secret": "secret",
+        "obj_store_bucket": "bucket",
+    }
+    ostore1 = NRUtil.NRObjStoreUtil.ObjectStoreUtil(**params)
+    ostore2 = NRUtil.NRObjStoreUtil.ObjectStoreUtil(**params)
+    assert ostore1.minio_client is ostore2.minio_client
+
+    ostore1.createBotoClient()
+    ostore2.createBotoClient()
+    assert ostore1.boto_client is ostore2.boto_client
+
+    other_creds = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        **dict(params, obj_store_secret="other")
+    )
+    assert other_creds.minio_client is not ostore1.minio_client
+    bigger_pool = NRUtil.NRObjStoreUtil.ObjectStoreUtil(
+        pool_config=NRUtil.client_pool.ConnectionPoolConfig(pool_size=64), **params
+    )
+    assert bigger_pool.minio_client is not ostore1.minio_client
@@ -0,0 +1,48 @@
+import hashlib
+import logging
+import os
+
+import NRUtil.hash_cache
+import NRUtil.NRObjStoreUtil
+
+LOGGER = logging.getLogger(__name__)
+
+
+def test_hash_cache_hits_and_eviction(tmp_path):
+    cache_path = os.path.join(tmp_path, "cache", "hashes.sqlite")
+    test_file = os.path.join(tmp_path, "junk.txt")
+    with open(test_file, "wb") as fh:
+        fh.write(b"test 1 2 3\n")
+
+    cache = NRUtil.hash_cache.HashCache(cache_path)
+    calc = NRUtil.NRObjStoreUtil.CalcETags(hash_cache=cache)
+    expected_md5 = hashlib.md5(b"test 1 2 3\n").hexdigest()
+    assert calc.calc_md5(test_file) == expected_md5
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert calc.calc_md5(test_file) == expected_md5
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # only the part size that isn't cached is a miss
+    etags = calc.calc_etags(test_file, [None, 4])
+    assert etags[None] == expected_md5
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
+
+    # the digests persist, and are recalculated when the file changes
+    cache = NRUtil.hash_cache.HashCache(cache_path)
+    calc = NRUtil.NRObjStoreUtil.CalcETags(hash_cache=cache)
+    assert calc.calc_etag(test_file, 4) == etags[4]
+    assert cache.stats() == {"hits": 1, "misses": 0, "entries": 2}
+    with open(test_file, "ab") as fh:
+        fh.write(b"test 4 5 6\n")
+    assert (
+        calc.calc_md5(test_file) == hashlib.md5(b"test 1 2 3\ntest 4 5 6\n").hexdigest()
+    )
+    assert cache.misses == 1
+
+    # the cached 4 byte part size etag is for the old version of the file
+    assert cache.evict_missing() == 1
+    os.remove(test_file)
+    assert cache.evict_missing() == 1
+    assert cache.stats()["entries"] == 0
+    cache.close()
@@ -0,0 +1,40 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+# modules that are slow to import and must only be loaded when they are used
+HEAVY_MODULES = ["boto3", "botocore", "minio", "urllib3", "dotenv"]
+
+# the time the import takes is measured by benchmarks/bench_ostore.py
+IMPORT_SCRIPT = """
+import json, sys
+import NRUtil.NRObjStoreUtil
+import NRUtil.async_ostore
+print(json.dumps(sorted(m for m in %r if m in sys.modules)))
+"""
+
+
+def run_import():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [p for p in sys.path if p] + [env.get("PYTHONPATH", "")]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT % (HEAVY_MODULES,)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    return proc.stdout, proc.stderr
+
+
+def test_import_is_lazy():
+    stdout, stderr = run_import()
+    # importing the package must not print anything
+    assert stderr == ""
+    assert json.loads(stdout) == []
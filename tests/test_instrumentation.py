@@ -0,0 +1,91 @@
+import logging
+import os
+
+import NRUtil.instrumentation
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RecordingHook(NRUtil.instrumentation.InstrumentationHook):
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def on_start(self, event):
+        self.started.append((event.operation, event.key, event.outcome))
+
+    def on_end(self, event):
+        self.ended.append((event.operation, event.key, event.bytes, event.outcome))
+
+
+class BrokenHook(NRUtil.instrumentation.InstrumentationHook):
+    def on_end(self, event):
+        raise RuntimeError("broken hook")
+
+
+def test_no_hooks_is_a_no_op():
+    op = NRUtil.instrumentation.operation([], "put_object", "bucket", "key")
+    assert op is NRUtil.instrumentation.NULL_OPERATION
+    with op:
+        op.bytes = 10
+        op.retries += 1
+    assert op.bytes == 0
+
+
+def test_hooks_and_aggregator():
+    hook = RecordingHook()
+    aggregator = NRUtil.instrumentation.MetricsAggregator(buckets=(1, 10))
+    hooks = [hook, BrokenHook(), aggregator]
+
+    with NRUtil.instrumentation.operation(hooks, "put_object", "bucket", "a") as op:
+        op.bytes = 10
+        op.retries += 2
+    try:
+        with NRUtil.instrumentation.operation(hooks, "put_object", "bucket", "b"):
+            raise ValueError("failed")
+    except ValueError:
+        pass
+    with NRUtil.instrumentation.operation(hooks, "put_object", "bucket", "c") as op:
+        op.bytes = 5
+
+    assert hook.started == [
+        ("put_object", "a", None),
+        ("put_object", "b", None),
+        ("put_object", "c", None),
+    ]
+    assert hook.ended == [
+        ("put_object", "a", 10, "ok"),
+        ("put_object", "b", 0, "error"),
+        ("put_object", "c", 5, "ok"),
+    ]
+    snapshot = aggregator.snapshot()
+    assert snapshot[("put_object", "ok")]["count"] == 2
+    assert snapshot[("put_object", "ok")]["bytes"] == 15
+    assert snapshot[("put_object", "ok")]["retries"] == 2
+    assert snapshot[("put_object", "ok")]["buckets"] == [2, 2]
+    assert snapshot[("put_object", "error")]["count"] == 1
+
+
+def test_prometheus_exporter(tmp_path):
+    aggregator = NRUtil.instrumentation.MetricsAggregator(buckets=(1, 10))
+    with NRUtil.instrumentation.operation([aggregator], "get_object") as op:
+        op.bytes = 100
+    exporter = NRUtil.instrumentation.PrometheusExporter(aggregator, prefix="test")
+    text = exporter.render()
+    labels = 'operation="get_object",outcome="ok"'
+    assert f"test_operations_total{{{labels}}} 1\n" in text
+    assert f"test_bytes_total{{{labels}}} 100\n" in text
+    assert f'test_operation_duration_seconds_bucket{{{labels},le="1"}} 1\n' in text
+    assert f'test_operation_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n' in text
+    assert f"test_operation_duration_seconds_count{{{labels}}} 1\n" in text
+
+    prom_file = tmp_path / "ostore.prom"
+    old_umask = os.umask(0o022)
+    try:
+        exporter.write(str(prom_file))
+    finally:
+        os.umask(old_umask)
+    assert prom_file.read_text() == text
+    # readable by the collector
+    assert os.stat(prom_file).st_mode & 0o777 == 0o644
+    assert os.listdir(tmp_path) == ["ostore.prom"]
@@ -1,3 +1,6 @@
+import asyncio
+import datetime
+import io
 import logging
 import os.path
 
@@ -5,7 +8,12 @@ import minio
 import pytest
 import requests
 
+import NRUtil.async_ostore
+import NRUtil.backends
+import NRUtil.instrumentation
 import NRUtil.NRObjStoreUtil
+import NRUtil.presign
+import NRUtil.stat_cache
 
 LOGGER = logging.getLogger(__name__)
 
@@ -82,6 +90,23 @@ def test_presign(ostore_w_data, properties):
     LOGGER.debug(f"presigned url: {url}")
 
 
+def test_presign_batch(ostore_w_data, properties):
+    """signs a batch of urls, with the expiry as a timedelta, and reuses them
+    from the cache
+    """
+    ostore = ostore_w_data
+    ostore.presign_cache = NRUtil.presign.PresignedURLCache()
+    object_name = properties["test_file_full_path"]
+
+    urls = ostore.get_presigned_urls(
+        [object_name], expires=datetime.timedelta(minutes=5)
+    )
+    assert requests.get(urls[object_name]).status_code == 200
+    assert ostore.get_presigned_url(object_name, expires=300) == urls[object_name]
+    assert ostore.presign_cache.hits == 1
+    ostore.presign_cache = None
+
+
 def test_update_ostore(ostore_w_more_data_local, properties_advanced):
     """tests the function that updates a directory.  It should only upload
     files if they do not already exist in the object store.
@@ -115,3 +140,426 @@ def test_update_ostore(ostore_w_more_data_local, properties_advanced):
     )
     for param in properties_advanced:
         assert param["test_file_full_path"] in ostore_file_list
+
+
+def test_update_ostore_concurrent(ostore_w_more_data_local, properties_advanced):
+    """runs the directory sync with a pool of upload workers, verifies that
+    every file is uploaded and that the outcome is reported in the result
+    """
+    dest_dir = properties_advanced[0]["test_dir"]
+    src_dir = os.path.realpath(dest_dir)
+    ostore_w_more_data_local.delete_directory(ostore_dir=dest_dir)
+
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=src_dir, dest_dir=dest_dir
+    )
+    result = ostore.update_ostore_dir(workers=4, max_in_flight=2)
+    assert result.success
+    assert len(result.uploaded) == len(properties_advanced)
+
+    ostore_file_list = ostore.list_objects(
+        objstore_dir=dest_dir, return_file_names_only=True
+    )
+    for param in properties_advanced:
+        assert param["test_file_full_path"] in ostore_file_list
+
+
+def test_update_ostore_compare(ostore_w_more_data_local, properties_advanced):
+    """modifies one of the local files after it has been synced, verifies that
+    the default comparison skips it and that comparing sizes uploads it again
+    """
+    dest_dir = properties_advanced[0]["test_dir"]
+    src_dir = os.path.realpath(dest_dir)
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=src_dir, dest_dir=dest_dir
+    )
+    ostore.update_ostore_dir()
+
+    modified_file = properties_advanced[-1]["test_file_full_path"]
+    with open(modified_file, "a") as fh:
+        fh.write("test 4 5 6\n")
+
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=src_dir, dest_dir=dest_dir
+    )
+    result = ostore.update_ostore_dir()
+    assert result.uploaded == []
+
+    result = ostore.update_ostore_dir(compare=NRUtil.NRObjStoreUtil.COMPARE_SIZE)
+    assert [upload[1] for upload in result.uploaded] == [modified_file]
+
+    stat = ostore.stat_object(object_name=modified_file)
+    assert stat.size == os.path.getsize(modified_file)
+
+
+def test_verify_tree(ostore_w_more_data_local, properties_advanced):
+    """syncs the local directory then verifies it, modifies one local file and
+    deletes one remote object and verifies that both are reported.
+    """
+    dest_dir = properties_advanced[0]["test_dir"]
+    src_dir = os.path.realpath(dest_dir)
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=src_dir, dest_dir=dest_dir
+    )
+    ostore.update_ostore_dir(compare=NRUtil.NRObjStoreUtil.COMPARE_ETAG)
+    report = ostore.verify_tree()
+    assert report.success
+    assert len(report.matching) == len(properties_advanced)
+
+    modified_file = properties_advanced[-1]["test_file_full_path"]
+    with open(modified_file, "a") as fh:
+        fh.write("test 7 8 9\n")
+    missing_file = properties_advanced[0]["test_file_full_path"]
+    ostore.delete_remote_file(dest_file=missing_file)
+
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=src_dir, dest_dir=dest_dir
+    )
+    report = ostore.verify_tree(workers=2)
+    assert not report.success
+    assert [path for _, path in report.mismatched] == [modified_file]
+    assert [path for _, path in report.missing] == [missing_file]
+    assert not ostore._verify(os.path.realpath(modified_file), modified_file)
+
+
+def test_delete_directory(ostore_object, properties):
+    """uploads a handful of objects and deletes them in small concurrent
+    batches
+    """
+    src_file = properties["test_file"]
+    dest_dir = "junky_delete"
+    with open(src_file, "w") as fh:
+        fh.write("test 1 2 3\n")
+    for cnt in range(5):
+        ostore_object.put_object(
+            ostore_path=f"{dest_dir}/{cnt}/{src_file}", local_path=src_file
+        )
+    os.remove(src_file)
+
+    result = ostore_object.delete_directory(
+        ostore_dir=dest_dir, batch_size=2, workers=2
+    )
+    assert result.success
+    assert result.deleted == 5
+    obj_list = ostore_object.list_objects(
+        objstore_dir=dest_dir, return_file_names_only=True
+    )
+    assert obj_list == []
+
+
+def test_update_local_dir(ostore_w_more_data_local, properties_advanced, tmp_path):
+    """syncs the local directory to object storage then mirrors it back down
+    into an empty directory
+    """
+    dest_dir = properties_advanced[0]["test_dir"]
+    src_dir = os.path.realpath(dest_dir)
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=src_dir, dest_dir=dest_dir
+    )
+    ostore.update_ostore_dir(compare=NRUtil.NRObjStoreUtil.COMPARE_ETAG)
+
+    local_dir = os.path.join(tmp_path, dest_dir)
+    ostore = NRUtil.NRObjStoreUtil.ObjectStoreDirectorySync(
+        src_dir=local_dir, dest_dir=dest_dir
+    )
+    result = ostore.update_local_dir(workers=2)
+    assert result.success
+    assert len(result.downloaded) == len(properties_advanced)
+    for param in properties_advanced:
+        local_file = os.path.join(tmp_path, param["test_file_full_path"])
+        with open(local_file) as fh, open(param["test_file_full_path"]) as src_fh:
+            assert fh.read() == src_fh.read()
+
+    result = ostore.update_local_dir()
+    assert result.downloaded == []
+    assert len(result.skipped) == len(properties_advanced)
+
+
+def test_get_object_ranged(ostore_object, properties):
+    """downloads an object as several concurrent byte ranges"""
+    src_file = properties["test_file"]
+    dest_file = properties["test_file_full_path"]
+    local_file = "junk_ranged.txt"
+    with open(src_file, "w") as fh:
+        for cnt in range(20000):
+            fh.write(f"test {cnt} {cnt + 1} {cnt + 2}\n")
+    ostore_object.put_object(ostore_path=dest_file, local_path=src_file)
+
+    ostore_object.get_object(
+        file_path=dest_file, local_path=local_file, workers=3, part_size=65536
+    )
+    with open(src_file) as fh, open(local_file) as dl_fh:
+        assert fh.read() == dl_fh.read()
+
+    os.remove(src_file)
+    os.remove(local_file)
+    ostore_object.delete_remote_file(dest_file=dest_file)
+
+
+def test_put_object_multipart(ostore_object, properties):
+    """uploads a file as a multipart upload with the parts sent concurrently"""
+    src_file = properties["test_file"]
+    dest_file = properties["test_file_full_path"]
+    local_file = "junk_multipart.txt"
+    part_size = NRUtil.NRObjStoreUtil.MIN_PART_SIZE
+    with open(src_file, "wb") as fh:
+        fh.write(os.urandom(part_size * 2 + 12345))
+
+    ostore_object.put_object(
+        ostore_path=dest_file, local_path=src_file, workers=3, part_size=part_size
+    )
+    stat = ostore_object.stat_object(dest_file)
+    assert stat.size == os.path.getsize(src_file)
+    calc_etag = NRUtil.NRObjStoreUtil.CalcETags().calc_etag(src_file, part_size)
+    assert stat.etag.strip('"') == calc_etag
+    assert calc_etag.endswith("-3")
+
+    ostore_object.get_object(file_path=dest_file, local_path=local_file)
+    with open(src_file, "rb") as fh, open(local_file, "rb") as dl_fh:
+        assert fh.read() == dl_fh.read()
+
+    os.remove(src_file)
+    os.remove(local_file)
+    ostore_object.delete_remote_file(dest_file=dest_file)
+
+
+def test_put_get_stream(ostore_object, properties):
+    """uploads buffers, file-like objects and generators and reads them back
+    without going through named files
+    """
+    dest_file = properties["test_file_full_path"]
+    data = os.urandom(100000)
+
+    def chunks():
+        for pos in range(0, len(data), 4096):
+            yield data[pos:pos + 4096]
+
+    for src in [data, memoryview(data), io.BytesIO(data), chunks()]:
+        ostore_object.put_stream(dest_file, src)
+        assert ostore_object.stat_object(dest_file).size == len(data)
+
+        out = io.BytesIO()
+        assert ostore_object.get_stream(dest_file, out=out) == len(data)
+        assert out.getvalue() == data
+
+    # too large for the memory buffer so spills over to a temp file
+    with ostore_object.get_stream(dest_file, spool_size=1024) as fh:
+        assert fh._rolled
+        assert fh.read() == data
+    ostore_object.delete_remote_file(dest_file=dest_file)
+
+
+@pytest.mark.parametrize("backend_name", ["minio", "boto3"])
+def test_get_object_new_dir(ostore_object, properties, tmp_path, backend_name):
+    """downloads into a directory that doesn't exist, with the default backend
+    and the boto3 one
+    """
+    backend = ostore_object.backend
+    if backend_name == "boto3":
+        backend = NRUtil.backends.Boto3Backend(ostore_object._get_boto_client())
+    bucket = ostore_object.obj_store_bucket
+    dest_file = properties["test_file_full_path"]
+    ostore_object.put_stream(dest_file, b"data")
+
+    local_file = tmp_path / "new" / "sub" / "junk.txt"
+    backend.get_object(bucket, dest_file, str(local_file))
+    assert local_file.read_bytes() == b"data"
+    assert os.listdir(local_file.parent) == ["junk.txt"]
+
+    # a failed download doesn't leave anything behind
+    missing_file = tmp_path / "new" / "missing.txt"
+    with pytest.raises(minio.error.S3Error):
+        backend.get_object(bucket, dest_file + ".missing", str(missing_file))
+    assert sorted(os.listdir(missing_file.parent)) == ["sub"]
+    ostore_object.delete_remote_file(dest_file=dest_file)
+
+
+def test_list_objects_filtered(ostore_object):
+    """lists objects with the server side and client side filters"""
+    dest_dir = "junky_filtered"
+    sizes = {"a.txt": 10, "b.txt": 100, "c.dat": 1000, "sub/d.txt": 50}
+    for name, size in sizes.items():
+        ostore_object.put_stream(f"{dest_dir}/{name}", b"x" * size)
+
+    def names(**kwargs):
+        objects = ostore_object.list_objects(
+            objstore_dir=f"{dest_dir}/",
+            return_file_names_only=True,
+            iterator=True,
+            **kwargs,
+        )
+        assert not isinstance(objects, list)
+        return sorted(name[len(dest_dir) + 1:] for name in objects)
+
+    assert names() == sorted(sizes)
+    assert names(start_after=f"{dest_dir}/b.txt") == ["c.dat", "sub/d.txt"]
+    assert names(delimiter="/") == ["a.txt", "b.txt", "c.dat", "sub/"]
+    assert names(pattern="*.txt") == ["a.txt", "b.txt", "sub/d.txt"]
+    assert names(min_size=50, max_size=100) == ["b.txt", "sub/d.txt"]
+    modified = ostore_object.stat_object(f"{dest_dir}/a.txt").last_modified
+    assert names(modified_since=modified) == sorted(sizes)
+    assert names(modified_since=modified + datetime.timedelta(days=1)) == []
+    assert names(delimiter="/", min_size=0) == ["a.txt", "b.txt", "c.dat"]
+
+    ostore_object.delete_directory(ostore_dir=dest_dir)
+
+
+def test_list_objects_sharded(ostore_object):
+    """the sharded listing returns the same objects in the same order as a
+    sequential listing
+    """
+    dest_dir = "junky_sharded"
+    keys = [
+        f"{dest_dir}/{top}/{sub}/{cnt}.txt"
+        for top in ["a", "b", "c"]
+        for sub in ["x", "y"]
+        for cnt in range(3)
+    ]
+    keys += [f"{dest_dir}/b.txt", f"{dest_dir}/b0.txt", f"{dest_dir}/top.txt"]
+    for key in keys:
+        ostore_object.put_stream(key, key.encode("utf8"))
+
+    expected = ostore_object.list_objects(
+        objstore_dir=dest_dir, return_file_names_only=True
+    )
+    assert sorted(expected) == expected == sorted(keys)
+    for shard_depth in [0, 1, 2, 3]:
+        obj_names = ostore_object.list_objects(
+            objstore_dir=dest_dir,
+            return_file_names_only=True,
+            workers=4,
+            shard_depth=shard_depth,
+        )
+        assert obj_names == expected
+    obj_names = ostore_object.list_objects(
+        objstore_dir=f"{dest_dir}/", return_file_names_only=True, workers=2
+    )
+    assert obj_names == expected
+
+    ostore_object.delete_directory(ostore_dir=dest_dir)
+
+
+def test_stat_cache(ostore_object, properties):
+    """stats are answered from the cache until the object is changed through
+    the same client
+    """
+    dest_file = properties["test_file_full_path"]
+    ostore_object.stat_cache = NRUtil.stat_cache.StatCache(ttl=300)
+    try:
+        with pytest.raises(minio.error.S3Error):
+            ostore_object.stat_object(dest_file)
+        with pytest.raises(minio.error.S3Error):
+            ostore_object.stat_object(dest_file)
+        assert ostore_object.stat_cache.stats()["hits"] == 1
+
+        ostore_object.put_stream(dest_file, b"12345")
+        assert ostore_object.stat_object(dest_file).size == 5
+        ostore_object.put_stream(dest_file, b"1234567")
+        assert ostore_object.get_object_properties(dest_file).size == 7
+        assert ostore_object.stat_object(dest_file).size == 7
+
+        ostore_object.delete_remote_file(dest_file=dest_file)
+        with pytest.raises(minio.error.S3Error):
+            ostore_object.stat_object(dest_file)
+        assert ostore_object.stat_cache.stats() == {
+            "hits": 2,
+            "misses": 4,
+            "entries": 1,
+        }
+    finally:
+        ostore_object.stat_cache = None
+
+
+def test_bulk_acls(ostore_object):
+    """makes a prefix public, then audits it"""
+    dest_dir = "junky_acl"
+    keys = [f"{dest_dir}/{cnt}.txt" for cnt in range(6)]
+    for key in keys:
+        ostore_object.put_stream(key, b"test 1 2 3")
+
+    results = dict(ostore_object.iter_set_acls(keys[:4], workers=3))
+    assert sorted(results) == keys[:4]
+    assert all(exc is None for exc in results.values())
+
+    report = ostore_object.audit_public_permissions(f"{dest_dir}/", workers=3)
+    assert sorted(report.public) == keys[:4]
+    assert sorted(report.private) == keys[4:]
+    assert report.summary() == {
+        "public": 4,
+        "private": 2,
+        "inconsistent": 0,
+        "errors": 0,
+    }
+    missing = dict(
+        ostore_object.iter_public_permissions([f"{dest_dir}/missing.txt"])
+    )
+    assert isinstance(missing[f"{dest_dir}/missing.txt"], Exception)
+
+    ostore_object.delete_directory(ostore_dir=dest_dir)
+
+
+def test_instrumentation(ostore_object, properties):
+    """operations are reported to the registered hooks"""
+    dest_file = properties["test_file_full_path"]
+    aggregator = NRUtil.instrumentation.MetricsAggregator()
+    ostore_object.add_hook(aggregator)
+    try:
+        ostore_object.put_stream(dest_file, b"x" * 1000)
+        ostore_object.put_stream(dest_file, iter([b"x" * 600, b"y" * 600]))
+        assert ostore_object.get_stream(dest_file, out=io.BytesIO()) == 1200
+        ostore_object.stat_object(dest_file)
+        with pytest.raises(minio.error.S3Error):
+            ostore_object.stat_object(dest_file + ".missing")
+        ostore_object.delete_remote_file(dest_file=dest_file)
+    finally:
+        ostore_object.remove_hook(aggregator)
+    assert ostore_object.hooks == []
+
+    snapshot = aggregator.snapshot()
+    assert snapshot[("put_object", "ok")]["count"] == 2
+    assert snapshot[("put_object", "ok")]["bytes"] == 2200
+    assert snapshot[("get_object", "ok")]["bytes"] == 1200
+    assert snapshot[("stat_object", "ok")]["count"] == 1
+    assert snapshot[("stat_object", "error")]["count"] == 1
+    assert snapshot[("delete_object", "ok")]["count"] == 1
+    text = NRUtil.instrumentation.PrometheusExporter(aggregator).render()
+    assert 'operation="put_object",outcome="ok"' in text
+
+
+def test_async_ostore(ostore_object, properties):
+    """uploads, lists, stats and deletes several objects concurrently through
+    the asyncio interface
+    """
+    src_file = properties["test_file"]
+    dest_dir = "junky_async"
+    with open(src_file, "w") as fh:
+        fh.write("test 1 2 3\n")
+    dest_files = [f"{dest_dir}/{cnt}/{src_file}" for cnt in range(10)]
+
+    async def run():
+        async with NRUtil.async_ostore.AsyncObjectStoreUtil(
+            ostore=ostore_object, max_concurrency=4
+        ) as ostore:
+            await asyncio.gather(
+                *[ostore.put_object(dest_file, src_file) for dest_file in dest_files]
+            )
+            obj_names = [
+                name
+                async for name in ostore.iter_objects(
+                    dest_dir, return_file_names_only=True, batch_size=3
+                )
+            ]
+            stats = await asyncio.gather(
+                *[ostore.stat_object(dest_file) for dest_file in dest_files]
+            )
+            await asyncio.gather(
+                *[ostore.delete_remote_file(dest_file) for dest_file in dest_files]
+            )
+            remaining = await ostore.list_objects(dest_dir)
+        return obj_names, stats, remaining
+
+    obj_names, stats, remaining = asyncio.run(run())
+    os.remove(src_file)
+    assert sorted(obj_names) == sorted(dest_files)
+    assert [stat.size for stat in stats] == [len("test 1 2 3\n")] * len(dest_files)
+    assert remaining == []
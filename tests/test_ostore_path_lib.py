@@ -0,0 +1,93 @@
+import logging
+import os
+
+import pytest
+
+import NRUtil.NRObjStoreUtil
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="module")
+def path_lib():
+    yield NRUtil.NRObjStoreUtil.ObjectStoragePathLib(
+        obj_store_host="host",
+        obj_store_user="user",
+        obj_store_secret="secret",
+        obj_store_bucket="bucket",
+    )
+
+
+def test_get_local_path(path_lib):
+    local_path = path_lib.get_local_path(
+        ostore_path="backup/guy/roster/elite_habs2023.txt",
+        ostore_root_dir="backup/guy/",
+        local_root_dir="/home/glafleur/players",
+    )
+    assert local_path == os.path.join(
+        "/home/glafleur/players", "roster", "elite_habs2023.txt"
+    )
+
+    with pytest.raises(ValueError):
+        path_lib.get_local_path(
+            ostore_path="backup/guy1/roster.txt",
+            ostore_root_dir="backup/guy",
+            local_root_dir="/home/glafleur/players",
+        )
+    with pytest.raises(ValueError):
+        path_lib.get_local_path(
+            ostore_path="backup/guy/../../etc/passwd",
+            ostore_root_dir="backup/guy",
+            local_root_dir="/home/glafleur/players",
+        )
+
+
+@pytest.mark.parametrize("root_suffix", ["", "/", "//", "/."])
+@pytest.mark.parametrize("prepend_bucket", [True, False])
+@pytest.mark.parametrize("include_leading_slash", [True, False])
+def test_path_mapper(
+    path_lib, tmp_path, root_suffix, prepend_bucket, include_leading_slash
+):
+    root = tmp_path / "players"
+    os.makedirs(root / "roster" / "2023")
+    (root / "roster" / "elite_habs2023.txt").write_text("lafleur")
+    src_root_dir = str(root) + root_suffix
+    src_paths = [
+        (str(root / "roster" / "elite_habs2023.txt"), False),
+        (str(root / "roster"), True),
+        (str(root / "roster" / "2023"), True),
+        (src_root_dir + "/roster//./elite_habs2023.txt", False),
+        (str(root / "roster") + "/", True),
+    ]
+    kwargs = dict(
+        prepend_bucket=prepend_bucket, include_leading_slash=include_leading_slash
+    )
+    for ostore_path in ["backup/guy", "backup/guy/", ""]:
+        mapper = path_lib.mapper(src_root_dir, ostore_path, **kwargs)
+        expected = [
+            path_lib.get_obj_store_path(
+                src_path=src_path,
+                ostore_path=ostore_path,
+                src_root_dir=src_root_dir,
+                **kwargs,
+            )
+            for src_path, _ in src_paths
+        ]
+        assert list(mapper.map_entries(src_paths)) == expected
+        assert mapper.map(src_paths[0][0]) == expected[0]
+        assert list(mapper.map_paths([src_paths[1][0]], is_dir=True)) == expected[1:2]
+
+    mapper = path_lib.mapper(src_root_dir, "backup/guy", **kwargs)
+    for outside in [str(root), str(tmp_path / "players2" / "x.txt"), "roster/x.txt"]:
+        with pytest.raises(ValueError):
+            mapper.map(outside)
+
+
+def test_path_mapper_relative_root(path_lib):
+    mapper = path_lib.mapper("./players", "backup", prepend_bucket=False)
+    assert mapper.map("players/roster/x.txt") == "backup/roster/x.txt"
+    assert mapper.map("./players/roster/x.txt") == "backup/roster/x.txt"
+    mapper = NRUtil.NRObjStoreUtil.ObjectStoragePathMapper(".", "backup", "bucket")
+    assert mapper.map("roster/x.txt", is_dir=True) == "bucket/backup/roster/x.txt/"
+    with pytest.raises(ValueError):
+        NRUtil.NRObjStoreUtil.ObjectStoragePathMapper("players", "backup")
@@ -0,0 +1,136 @@
+import datetime
+import logging
+
+import minio
+import pytest
+
+import NRUtil.presign
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def minio_client():
+    # the region is provided so no requests are made to the server
+    return minio.Minio(
+        "localhost:9000", "access", "secret", secure=False, region="us-east-1"
+    )
+
+
+def test_presign_urls_match_minio(minio_client):
+    request_date = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    expires = datetime.timedelta(hours=2)
+    headers = {"response-content-type": "application/json"}
+    names = ["junky/a.txt", "junky/b c.txt", "junky/d+e.txt"]
+
+    urls, expires_at = NRUtil.presign.presign_urls(
+        minio_client,
+        "bucket",
+        names,
+        expires,
+        headers=headers,
+        request_date=request_date,
+    )
+    assert expires_at == request_date + expires
+    for name in names:
+        assert urls[name] == minio_client.get_presigned_url(
+            "GET",
+            "bucket",
+            name,
+            expires=expires,
+            response_headers=headers,
+            request_date=request_date,
+        )
+
+
+def test_presign_urls_session_token():
+    # the security token is part of the signed query
+    minio_client = minio.Minio(
+        "localhost:9000",
+        "access",
+        "secret",
+        session_token="token",
+        secure=False,
+        region="us-east-1",
+    )
+    request_date = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    urls, _ = NRUtil.presign.presign_urls(
+        minio_client, "bucket", ["a.txt"], 60, request_date=request_date
+    )
+    assert "X-Amz-Security-Token=token" in urls["a.txt"]
+    assert urls["a.txt"] == minio_client.get_presigned_url(
+        "GET",
+        "bucket",
+        "a.txt",
+        expires=datetime.timedelta(seconds=60),
+        request_date=request_date,
+    )
+
+
+def test_presign_urls_without_internals(minio_client, monkeypatch):
+    """a minio release without the signer internals falls back to signing
+    each url with get_presigned_url
+    """
+    request_date = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    expires = datetime.timedelta(hours=2)
+    names = ["a.txt", "b.txt"]
+    expected, _ = NRUtil.presign.presign_urls(
+        minio_client, "bucket", names, expires, request_date=request_date
+    )
+    assert NRUtil.presign.has_signer_internals(minio_client)
+
+    # minio's own signing still needs the real internals, so a renamed one
+    # is simulated
+    monkeypatch.setattr(
+        NRUtil.presign, "SIGNER_FUNCS", NRUtil.presign.SIGNER_FUNCS + ("_renamed",)
+    )
+    assert not NRUtil.presign.has_signer_internals(minio_client)
+    signed = []
+    get_presigned_url = minio_client.get_presigned_url
+
+    def counting_get_presigned_url(*args, **kwargs):
+        signed.append(args[2])
+        return get_presigned_url(*args, **kwargs)
+
+    monkeypatch.setattr(minio_client, "get_presigned_url", counting_get_presigned_url)
+    urls, expires_at = NRUtil.presign.presign_urls(
+        minio_client, "bucket", names, expires, request_date=request_date
+    )
+    assert signed == names
+    assert urls == expected
+    assert expires_at == request_date + expires
+
+
+def test_as_timedelta():
+    assert NRUtil.presign.as_timedelta(60) == datetime.timedelta(minutes=1)
+    assert NRUtil.presign.as_timedelta(
+        datetime.timedelta(days=1)
+    ) == datetime.timedelta(days=1)
+    for expires in [0, datetime.timedelta(days=8)]:
+        with pytest.raises(ValueError):
+            NRUtil.presign.as_timedelta(expires)
+
+
+def test_presigned_url_cache():
+    cache = NRUtil.presign.PresignedURLCache(max_entries=2)
+    expires = datetime.timedelta(hours=1)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    key_a = cache.key("bucket", "a", expires)
+    key_b = cache.key("bucket", "b", expires)
+    key_c = cache.key("bucket", "c", expires)
+    assert cache.key("bucket", "a", expires, {"x": "1"}) != key_a
+
+    cache.put(key_a, "url-a", now + expires)
+    assert cache.get(key_a, now=now) == "url-a"
+    # less than half of the validity left
+    assert cache.get(key_a, now=now + datetime.timedelta(minutes=31)) is None
+    assert len(cache) == 0
+
+    cache.put(key_a, "url-a", now + expires)
+    cache.put(key_b, "url-b", now + expires)
+    cache.get(key_a, now=now)
+    # b is the least recently used so is dropped
+    cache.put(key_c, "url-c", now + expires)
+    assert cache.get(key_b, now=now) is None
+    assert cache.get(key_a, now=now) == "url-a"
+    assert cache.stats() == {"hits": 3, "misses": 2, "entries": 2}
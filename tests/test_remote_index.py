@@ -0,0 +1,84 @@
+import datetime
+import logging
+
+import NRUtil.remote_index
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FakeObject:
+    """stand in for the minio Object returned by list_objects"""
+
+    def __init__(self, object_name, size=1, etag='"abc"', is_dir=False):
+        self.object_name = object_name
+        self.size = size
+        self.etag = etag
+        self.is_dir = is_dir
+        self.last_modified = datetime.datetime(
+            2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc
+        )
+
+
+def test_index_membership_and_metadata():
+    objs = [
+        FakeObject("junky/b.txt", size=20),
+        FakeObject("junky/a.txt", size=10, etag='"d41d8cd9-2"'),
+        FakeObject("junky/sub/", is_dir=True),
+    ]
+    index = NRUtil.remote_index.RemoteIndex(objs)
+
+    assert len(index) == 2
+    assert "junky/a.txt" in index
+    assert "junky/sub/" not in index
+    assert "junky/c.txt" not in index
+    assert index.keys() == ["junky/a.txt", "junky/b.txt"]
+
+    rec = index.get("junky/a.txt")
+    assert rec.size == 10
+    assert rec.etag == "d41d8cd9-2"
+    assert rec.last_modified == objs[0].last_modified
+    assert index.get("nope") is None
+
+
+def test_index_out_of_order_adds_and_replace():
+    index = NRUtil.remote_index.RemoteIndex()
+    index.add("c", size=3)
+    index.add("a", size=1)
+    index.add("c", size=30)
+    index.add("b")
+    assert index.keys() == ["a", "b", "c"]
+    assert index.get("c").size == 30
+    assert index.get("b").size is None
+    assert index.get("b").last_modified is None
+
+    index.discard("b")
+    index.discard("missing")
+    assert index.keys() == ["a", "c"]
+
+
+def test_index_prefix_and_range():
+    index = NRUtil.remote_index.RemoteIndex()
+    for key in ["d/2", "d/1", "da", "c/1", "d/sub/3", "e"]:
+        index.add(key)
+
+    assert [r.key for r in index.iter_prefix("d/")] == ["d/1", "d/2", "d/sub/3"]
+    assert [r.key for r in index.iter_prefix("x")] == []
+    assert [r.key for r in index.iter_range("d/", "d/sub")] == ["d/1", "d/2"]
+    assert [r.key for r in index.iter_range(end="d")] == ["c/1"]
+    assert [r.key for r in index.iter_range(start="da")] == ["da", "e"]
+
+
+def test_index_adds_after_query_keep_sort():
+    index = NRUtil.remote_index.RemoteIndex()
+    for key in ["d", "b", "f"]:
+        index.add(key, size=1)
+    assert index.keys() == ["b", "d", "f"]
+
+    # once sorted, adds are inserted in place rather than re-sorting
+    index.add("c", size=3)
+    index.add("a", size=0)
+    index.add("d", size=40)
+    index.add("g", size=7)
+    assert index._sorted
+    assert index.keys() == ["a", "b", "c", "d", "f", "g"]
+    assert [index.get(key).size for key in index.keys()] == [0, 1, 3, 40, 1, 7]
@@ -0,0 +1,49 @@
+import logging
+
+import NRUtil.stat_cache
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_stat_cache_ttl_and_lru(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(NRUtil.stat_cache.time, "monotonic", clock)
+    cache = NRUtil.stat_cache.StatCache(ttl=10, max_entries=2, negative_ttl=5)
+    assert cache.get("bucket", "a") == (False, None, None)
+
+    cache.put("bucket", "a", "stat-a")
+    assert cache.get("bucket", "a") == (True, "stat-a", None)
+    assert cache.get("other", "a") == (False, None, None)
+    clock.now += 11
+    assert cache.get("bucket", "a") == (False, None, None)
+
+    error = KeyError("missing")
+    cache.put_missing("bucket", "missing", error)
+    assert cache.get("bucket", "missing") == (True, None, error)
+    clock.now += 6
+    assert cache.get("bucket", "missing") == (False, None, None)
+
+    cache.put("bucket", "a", "stat-a")
+    cache.put("bucket", "b", "stat-b")
+    cache.get("bucket", "a")
+    # b is the least recently used so is dropped
+    cache.put("bucket", "c", "stat-c")
+    assert cache.get("bucket", "b") == (False, None, None)
+    cache.invalidate("bucket", ["a"])
+    assert cache.get("bucket", "a") == (False, None, None)
+    assert cache.get("bucket", "c") == (True, "stat-c", None)
+    assert cache.stats() == {"hits": 4, "misses": 6, "entries": 1}
+
+
+def test_stat_cache_no_negative_caching():
+    cache = NRUtil.stat_cache.StatCache(negative_ttl=0)
+    cache.put_missing("bucket", "missing", KeyError("missing"))
+    assert len(cache) == 0
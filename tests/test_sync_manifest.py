@@ -0,0 +1,50 @@
+import datetime
+import logging
+import os
+
+import NRUtil.remote_index
+import NRUtil.sync_manifest
+
+LOGGER = logging.getLogger(__name__)
+
+
+def test_manifest_record_and_reconcile(tmp_path):
+    manifest_path = os.path.join(tmp_path, "manifest.sqlite")
+    manifest = NRUtil.sync_manifest.SyncManifest(manifest_path)
+    assert manifest.needs_reconcile("bucket", "junky")
+
+    manifest.record("bucket", "junky/a.txt", 10, '"etag-a"', local_mtime=100.0)
+    manifest.record("bucket", "junky/b.txt", 20, "etag-b", local_mtime=200.0)
+    manifest.record("bucket", "junky1/c.txt", 30, "etag-c")
+    manifest.record("other", "junky/a.txt", 40, "etag-x")
+    manifest.flush()
+
+    rec = manifest.get("bucket", "junky/a.txt")
+    assert rec["size"] == 10
+    assert rec["etag"] == "etag-a"
+    assert rec["local_mtime"] == 100.0
+
+    # the listing shows a.txt unchanged, b.txt modified and a new d.txt
+    modified = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    listing = NRUtil.remote_index.RemoteIndex()
+    listing.add("junky/a.txt", 10, "etag-a", modified)
+    listing.add("junky/b.txt", 21, "etag-b2", modified)
+    listing.add("junky/d.txt", 5, "etag-d", modified)
+    assert manifest.reconcile("bucket", "junky/", listing) == 3
+    assert not manifest.needs_reconcile("bucket", "junky/")
+    assert manifest.needs_reconcile("bucket", "junky/", max_age=-1)
+    manifest.close()
+
+    # re-open to make sure everything was persisted
+    manifest = NRUtil.sync_manifest.SyncManifest(manifest_path)
+    assert manifest.get("bucket", "junky/a.txt")["local_mtime"] == 100.0
+    assert manifest.get("bucket", "junky/b.txt")["local_mtime"] is None
+    # outside of the reconciled prefix / bucket so left alone
+    assert manifest.get("bucket", "junky1/c.txt") is not None
+    assert manifest.get("other", "junky/a.txt") is not None
+
+    index = manifest.to_remote_index("bucket", "junky/")
+    assert index.keys() == ["junky/a.txt", "junky/b.txt", "junky/d.txt"]
+    assert index.get("junky/b.txt").size == 21
+    assert index.get("junky/d.txt").last_modified == modified
+    manifest.close()
@@ -0,0 +1,124 @@
+import logging
+import os
+
+import pytest
+
+import NRUtil.walker
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """creates a directory tree with hidden files and symbolic links"""
+    for name in [
+        "b.txt",
+        "a.nc",
+        ".hidden.txt",
+        "sub/c.nc",
+        "sub/d.txt",
+        "sub/deeper/e.nc",
+        ".git/config",
+        "tmp/junk.txt",
+    ]:
+        path = tmp_path / "root" / name
+        os.makedirs(path.parent, exist_ok=True)
+        path.write_bytes(name.encode())
+    root = tmp_path / "root"
+    os.symlink(root / "b.txt", root / "link.txt")
+    os.symlink(root / "sub", root / "linkdir")
+    # a loop back to the root and a link to nothing
+    os.symlink(root, root / "sub" / "loop")
+    os.symlink(root / "missing", root / "broken")
+    return str(root)
+
+
+def rel_paths(root, **kwargs):
+    return [
+        os.path.relpath(path, root)
+        for path, _ in NRUtil.walker.walk_files(root, **kwargs)
+    ]
+
+
+def test_walk_files(tree):
+    walked = list(NRUtil.walker.walk_files(tree, symlinks="skip"))
+    assert [os.path.relpath(path, tree) for path, _ in walked] == [
+        ".hidden.txt",
+        "a.nc",
+        "b.txt",
+        ".git/config",
+        "sub/c.nc",
+        "sub/d.txt",
+        "sub/deeper/e.nc",
+        "tmp/junk.txt",
+    ]
+    for path, stat in walked:
+        assert stat.st_size == os.path.getsize(path)
+
+    assert rel_paths(tree, symlinks="skip", hidden=False) == [
+        "a.nc",
+        "b.txt",
+        "sub/c.nc",
+        "sub/d.txt",
+        "sub/deeper/e.nc",
+        "tmp/junk.txt",
+    ]
+
+
+def test_walk_files_patterns(tree):
+    assert rel_paths(tree, symlinks="skip", include="*.nc") == [
+        "a.nc",
+        "sub/c.nc",
+        "sub/deeper/e.nc",
+    ]
+    assert rel_paths(tree, symlinks="skip", include=["sub/*.nc"]) == [
+        "sub/c.nc",
+        "sub/deeper/e.nc",
+    ]
+    assert rel_paths(tree, symlinks="skip", exclude=[".*", "tmp", "sub/deeper"]) == [
+        "a.nc",
+        "b.txt",
+        "sub/c.nc",
+        "sub/d.txt",
+    ]
+
+
+def test_walk_files_symlinks(tree):
+    # the link to sub and sub itself are both walked, the loop back to the
+    # root isn't
+    assert rel_paths(tree, hidden=False, exclude="tmp") == [
+        "a.nc",
+        "b.txt",
+        "link.txt",
+        "linkdir/c.nc",
+        "linkdir/d.txt",
+        "linkdir/deeper/e.nc",
+        "sub/c.nc",
+        "sub/d.txt",
+        "sub/deeper/e.nc",
+    ]
+    assert rel_paths(tree, symlinks="files", hidden=False, exclude="tmp") == [
+        "a.nc",
+        "b.txt",
+        "link.txt",
+        "sub/c.nc",
+        "sub/d.txt",
+        "sub/deeper/e.nc",
+    ]
+    with pytest.raises(ValueError):
+        list(NRUtil.walker.walk_files(tree, symlinks="always"))
+
+
+def test_path_filter(tree):
+    is_walked = NRUtil.walker.path_filter(exclude=["tmp", "sub/deeper"], hidden=False)
+    walked = rel_paths(
+        tree, symlinks="skip", exclude=["tmp", "sub/deeper"], hidden=False
+    )
+    assert walked == ["a.nc", "b.txt", "sub/c.nc", "sub/d.txt"]
+    assert all(is_walked(path) for path in walked)
+    for path in ["tmp/junk.txt", "sub/deeper/e.nc", ".git/config", "sub/.x.nc"]:
+        assert not is_walked(path)
+
+    is_walked = NRUtil.walker.path_filter(include="sub/*.nc")
+    assert is_walked("sub/c.nc") and is_walked("sub/deeper/e.nc")
+    assert not is_walked("a.nc") and not is_walked("sub/d.txt")